@@ -0,0 +1,30 @@
+import os
+
+from omegaconf import OmegaConf
+
+from adt_press.batch import load_manifest, run_batch
+from adt_press.utils.file import write_text_file
+
+
+def main() -> None:
+    # any options other than the manifest are applied to every book in the batch
+    cli_config = OmegaConf.from_cli()
+    if "manifest" not in cli_config:
+        raise ValueError("Usage: adt-batch.py manifest=path/to/batch.yaml [config overrides]")
+
+    manifest = load_manifest(str(cli_config.pop("manifest")))
+    result = run_batch(manifest, cli_config)
+
+    print(f"{'label':<30} {'status':<8} {'pages':>6} {'seconds':>10} {'pages/min':>10}")
+    for book in result.books:
+        status = "ok" if book.success else "failed"
+        print(f"{book.label:<30} {status:<8} {book.pages:>6} {book.seconds:>10.1f} {book.pages_per_minute:>10.2f}")
+    print(f"{'total':<30} {'':<8} {result.pages:>6} {result.seconds:>10.1f} {result.pages_per_minute:>10.2f}")
+
+    output_dir = str(OmegaConf.merge(OmegaConf.load("config/config.yaml"), cli_config)["output_dir"])
+    os.makedirs(output_dir, exist_ok=True)
+    write_text_file(os.path.join(output_dir, "batch_report.json"), result.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
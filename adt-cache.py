@@ -0,0 +1,33 @@
+from omegaconf import DictConfig, OmegaConf
+
+from adt_press.models.config import CacheConfig
+from adt_press.pipeline import cache_dir
+from adt_press.utils.cache import cache_usage, collect_garbage
+
+USAGE = "Usage: adt-cache.py label=mybook [action=usage|gc] [cache.max_bytes=N] [cache.keep_runs=N]"
+
+
+def main() -> None:
+    cli_config = OmegaConf.from_cli()
+    action = str(cli_config.pop("action", "usage"))
+    if "label" not in cli_config:
+        raise ValueError(USAGE)
+
+    config = DictConfig(OmegaConf.merge(OmegaConf.load("config/config.yaml"), cli_config))
+    cache_path = cache_dir(config)
+
+    if action == "gc":
+        collection = collect_garbage(cache_path, CacheConfig.model_validate(config["cache"]))
+        print(f"Removed {collection.removed_entries} results, {collection.removed_bytes / 1e6:.1f} MB")
+    elif action != "usage":
+        raise ValueError(USAGE)
+
+    usage = cache_usage(cache_path)
+    print(f"{'node':<50} {'entries':>8} {'MB':>10}")
+    for node in usage:
+        print(f"{node.node_name:<50} {node.entries:>8} {node.bytes / 1e6:>10.2f}")
+    print(f"{'total':<50} {sum(n.entries for n in usage):>8} {sum(n.bytes for n in usage) / 1e6:>10.2f}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
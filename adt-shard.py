@@ -0,0 +1,43 @@
+from omegaconf import OmegaConf
+
+from adt_press.shard import run_merge, run_shard, run_shards, shard_configs
+from adt_press.utils.config import load_run_config
+
+USAGE = "Usage: adt-shard.py label=mybook pdf_path=mybook.pdf shards=4 [workers=4] [action=run|plan|shard|merge] [shard=1] [overrides]"
+
+
+def main() -> None:
+    # any options other than our own are applied to every shard and the merge
+    cli_config = OmegaConf.from_cli()
+    if "shards" not in cli_config:
+        raise ValueError(USAGE)
+
+    shards = int(cli_config.pop("shards"))
+    workers = int(cli_config.pop("workers", shards))
+    action = str(cli_config.pop("action", "run"))
+    shard = int(cli_config.pop("shard", 0))
+
+    configs = shard_configs(cli_config, shards)
+
+    if action == "plan":
+        # print the commands to run each shard elsewhere, e.g. on other machines sharing the output directory
+        for i in range(len(configs)):
+            print(f"uv run adt-shard.py label={cli_config['label']} pdf_path={cli_config['pdf_path']} shards={shards} ", end="")
+            print(f"action=shard shard={i + 1}")
+        return
+    elif action == "shard":
+        if not 1 <= shard <= len(configs):
+            raise ValueError(f"shard must be between 1 and {len(configs)}")
+        run_shard(configs[shard - 1])
+        return
+    elif action == "run":
+        run_shards(configs, workers)
+    elif action != "merge":
+        raise ValueError(USAGE)
+
+    plate = run_merge(load_run_config(cli_config), configs)
+    print(f"Merged {len(configs)} shards into {len(plate.sections)} sections, {len(plate.texts)} texts, {len(plate.images)} images")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
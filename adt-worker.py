@@ -0,0 +1,30 @@
+import asyncio
+
+from omegaconf import OmegaConf
+
+from adt_press.llm.gateway import configure_backend
+from adt_press.models.config import FakeLLMConfig
+from adt_press.utils.queue import FileJobQueue
+from adt_press.worker import run_worker
+
+
+def main() -> None:
+    cli_config = OmegaConf.from_cli()
+    if "queue_dir" not in cli_config:
+        raise ValueError("Usage: adt-worker.py queue_dir=path/to/queue [concurrency=8] [idle_timeout=0] [llm_backend=litellm]")
+
+    configure_backend(str(cli_config.get("llm_backend", "litellm")), FakeLLMConfig.model_validate(cli_config.get("fake_llm", {})))
+
+    queue = FileJobQueue(str(cli_config["queue_dir"]), claim_timeout=float(cli_config.get("claim_timeout", 900)))
+    executed = asyncio.run(
+        run_worker(
+            queue,
+            concurrency=int(cli_config.get("concurrency", 8)),
+            idle_timeout=float(cli_config.get("idle_timeout", 0)),
+        )
+    )
+    print(f"Worker exiting after executing {executed} jobs")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,5 @@
+import os
+
+# hamilton loads plugins for every installed library it supports (mlflow, pandas, ...) on first import unless told not
+# to, this has to happen before any of our modules import hamilton
+os.environ.setdefault("HAMILTON_AUTOLOAD_EXTENSIONS", "0")
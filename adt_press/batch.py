@@ -0,0 +1,96 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import structlog
+from omegaconf import DictConfig, OmegaConf
+
+from adt_press.llm.gateway import configure_backend, configure_gateway, configure_queue
+from adt_press.models.batch import BatchManifest, BatchResult, BookResult
+from adt_press.models.config import FakeLLMConfig
+from adt_press.pipeline import run_pipeline
+from adt_press.utils.config import load_run_config
+from adt_press.utils.file import configure_hash_memo
+
+log = structlog.get_logger()
+
+
+def pages_per_minute(pages: int, seconds: float) -> float:
+    return pages / seconds * 60 if seconds > 0 else 0.0
+
+
+def extracted_page_count(run_output_dir: str) -> int:
+    """Returns the number of pages extracted for a run, 0 if extraction never completed."""
+    extract_path = os.path.join(run_output_dir, "extract", "pdf_extract.json")
+    if not os.path.exists(extract_path):
+        return 0
+
+    with open(extract_path, "r") as f:
+        return len(json.load(f)["pages"])
+
+
+def run_book(cli_config: DictConfig, book: dict[str, Any]) -> BookResult:
+    """Converts a single book of a batch, never raising so one failed book doesn't stop the others."""
+    label = str(book.get("label", "???"))
+
+    structlog.contextvars.clear_contextvars()
+    structlog.contextvars.bind_contextvars(label=label)
+
+    start = time.monotonic()
+    error = None
+    run_output_dir = None
+    try:
+        config = load_run_config(DictConfig(OmegaConf.merge(cli_config, book)))
+        run_output_dir = str(config["run_output_dir"])
+
+        # the batch configured the gateway shared by all books, so the book must leave it be
+        run_pipeline(config, shared_gateway=True)
+    except Exception as e:
+        log.exception("book failed", error=str(e))
+        error = f"{type(e).__name__}: {e}"
+
+    seconds = time.monotonic() - start
+    pages = extracted_page_count(run_output_dir) if run_output_dir else 0
+    result = BookResult(
+        label=label,
+        success=error is None,
+        error=error,
+        pages=pages,
+        seconds=seconds,
+        pages_per_minute=pages_per_minute(pages, seconds),
+    )
+    log.info("book complete", **result.model_dump())
+    return result
+
+
+def run_batch(manifest: BatchManifest, cli_config: DictConfig) -> BatchResult:
+    """
+    Converts all books in the manifest, running up to manifest.workers books concurrently in this process. The books
+    share the process wide LLM gateway, so rate limits and the response cache apply across the whole batch. The gateway
+    is configured once here, books starting later would otherwise swap it out from under those already running.
+    """
+    config = DictConfig(OmegaConf.merge(OmegaConf.load("config/config.yaml"), cli_config))
+
+    # responses are keyed by backend too, so fake and real batches can share a response_cache_path
+    configure_gateway(
+        rate_limits=manifest.rate_limits,
+        response_cache_path=manifest.response_cache_path if manifest.response_cache else None,
+    )
+    configure_queue(str(config.get("queue_dir", "")), float(config.get("queue_timeout", 3600)))
+    configure_backend(str(config.get("llm_backend", "litellm")), FakeLLMConfig.model_validate(config.get("fake_llm", {})))
+    configure_hash_memo(os.path.join(str(config["output_dir"]), "file_hashes.db"))
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, manifest.workers)) as pool:
+        books = list(pool.map(lambda book: run_book(cli_config, book), manifest.books))
+    seconds = time.monotonic() - start
+
+    pages = sum(b.pages for b in books)
+    return BatchResult(books=books, seconds=seconds, pages=pages, pages_per_minute=pages_per_minute(pages, seconds))
+
+
+def load_manifest(manifest_path: str) -> BatchManifest:
+    manifest = OmegaConf.to_container(OmegaConf.load(manifest_path), resolve=True)
+    return BatchManifest.model_validate(manifest)
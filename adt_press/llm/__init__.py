@@ -1,15 +1,18 @@
 import os
 
-import litellm
-import mlflow
+# tracing integrations are slow to import, so we only load them when they are configured
 
 # if langfuse is configured, set up callbacks for litellm
 if os.getenv("LANGFUSE_HOST"):
+    import litellm
+
     # set callbacks
     litellm.success_callback = ["langfuse"]
     litellm.failure_callback = ["langfuse"]
 
 # if mlflow is configured, set up autologging
 if os.getenv("MLFLOW_TRACKING_URI"):
+    import mlflow
+
     # Enable auto-tracing for LiteLLM
     mlflow.litellm.autolog()
@@ -0,0 +1,224 @@
+"""
+A local stand in for LLM providers, used to benchmark the pipeline without making requests.
+
+Responses are made up from the response model of each request, seeded by a hash of the request so the same request
+always gets the same response. Models whose validators check the response against the request's validation context,
+e.g. section part ids or web page data-ids, are built from that context so every response validates. Speech is
+silent MP3 audio.
+"""
+
+import asyncio
+import enum
+import hashlib
+import json
+import random
+import re
+import types
+from typing import Any, Callable, Literal, TypeVar, Union, get_args, get_origin
+
+from pydantic import BaseModel
+
+from adt_press.models.config import FakeLLMConfig
+from adt_press.models.telemetry import LLMCall
+
+T = TypeVar("T", bound=BaseModel)
+
+WORDS = "the a little fox ran over hill and river under bright moon while children sang songs of morning light".split()
+
+# items generated for each list field
+LIST_ITEMS = 2
+
+CHARS_PER_TOKEN = 4
+
+# an MPEG-1 layer III frame at 128kbps and 44.1kHz, 26ms of silence
+SILENT_MP3_FRAME = bytes.fromhex("fffb9064") + bytes(413)
+SECONDS_PER_WORD = 0.4
+
+
+class FakeLLMError(RuntimeError):
+    """Raised for requests the fake backend fails on purpose, see FakeLLMConfig.error_rate."""
+
+
+def fake_sentence(rng: random.Random, words: int = 8) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def fake_value(annotation: Any, rng: random.Random) -> Any:
+    """Returns a random value of the passed in type."""
+    origin = get_origin(annotation)
+    if origin is list:
+        return [fake_value(get_args(annotation)[0], rng) for _ in range(LIST_ITEMS)]
+    if origin is dict:
+        return {}
+    if origin in (Union, types.UnionType):
+        return fake_value(next(a for a in get_args(annotation) if a is not type(None)), rng)
+    if origin is Literal:
+        return get_args(annotation)[0]
+
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return fake_fields(annotation, rng)
+    if isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        return rng.choice(list(annotation)).value
+    # flags such as is_meaningful are set, so every optional step of the pipeline runs
+    if annotation is bool:
+        return True
+    if annotation is int:
+        return rng.randint(0, 100)
+    if annotation is float:
+        return rng.random()
+    return fake_sentence(rng)
+
+
+def fake_fields(model: type[BaseModel], rng: random.Random) -> dict[str, Any]:
+    return {name: fake_value(field.annotation, rng) for name, field in model.model_fields.items()}
+
+
+def message_text(messages: list[dict]) -> str:
+    """Returns the text parts of messages, leaving out images."""
+    texts = []
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, str):
+            texts.append(content)
+        else:
+            texts.extend(part.get("text", "") for part in content if part.get("type") == "text")
+    return "\n".join(texts)
+
+
+def fake_sections(context: dict, messages: list[dict], rng: random.Random) -> dict[str, Any]:
+    # everything on the page forms a single section
+    part_ids = context.get("text_ids", []) + context.get("image_ids", [])
+    return dict(reasoning=fake_sentence(rng), data=[dict(section_type="text_and_images", part_ids=part_ids)])
+
+
+def fake_metadata(context: dict, messages: list[dict], rng: random.Random) -> dict[str, Any]:
+    return dict(
+        background_color="#ffffff",
+        text_color="#000000",
+        layout_type=rng.choice(context.get("layout_types") or ["other"]),
+        reasoning=fake_sentence(rng),
+    )
+
+
+def fake_crop(context: dict, messages: list[dict], rng: random.Random) -> dict[str, Any]:
+    # the crop prompt tells us the size of the image, crop a little off each side
+    size = re.search(r"width: (\d+)px, height: (\d+)px", message_text(messages))
+    width, height = (int(size.group(1)), int(size.group(2))) if size else (100, 100)
+    return dict(top_left_x=width // 20, top_left_y=height // 20, bottom_right_x=width - width // 20, bottom_right_y=height - height // 20)
+
+
+def fake_analysis(context: dict, messages: list[dict], rng: random.Random) -> dict[str, Any]:
+    return dict(
+        meaningfulness_reasoning=fake_sentence(rng),
+        is_meaningful=True,
+        caption_reasoning=fake_sentence(rng),
+        caption=fake_sentence(rng),
+        **fake_crop(context, messages, rng),
+    )
+
+
+def fake_image_answers(context: dict, messages: list[dict], rng: random.Random) -> dict[str, Any]:
+    # batched image prompts answer for every image they were asked about
+    return dict(
+        images=[
+            dict(image_id=image_id, reasoning=fake_sentence(rng), is_meaningful=True, caption=fake_sentence(rng))
+            for image_id in context.get("image_ids", [])
+        ]
+    )
+
+
+def fake_html(context: dict, messages: list[dict], rng: random.Random) -> dict[str, Any]:
+    texts = "".join(f'<p data-id="{text_id}">{fake_sentence(rng)}</p>' for text_id in context.get("text_ids", []))
+    images = "".join(f'<img data-id="{image_id}" src="{image_id}">' for image_id in context.get("image_ids", []))
+    return dict(reasoning=fake_sentence(rng), content=f"<section>{images}{texts}</section>")
+
+
+def fake_rows(context: dict, messages: list[dict], rng: random.Random) -> dict[str, Any]:
+    # images on the left and texts on the right, or a single full width column if only one of them is present
+    text_ids, image_ids = context.get("text_ids", []), context.get("image_ids", [])
+    if text_ids and image_ids:
+        columns = [dict(span=3, parts=image_ids), dict(span=2, parts=text_ids)]
+    else:
+        columns = [dict(span=5, parts=text_ids or image_ids)]
+    return dict(reasoning=fake_sentence(rng), rows=[dict(columns=columns)] if text_ids or image_ids else [])
+
+
+# response models that can't be made up field by field, by import path
+FAKE_RESPONSES: dict[str, Callable[[dict, list[dict], random.Random], dict[str, Any]]] = {
+    "adt_press.llm.page_sectioning:SectionResponse": fake_sections,
+    "adt_press.llm.section_metadata:MetadataResponse": fake_metadata,
+    "adt_press.llm.image_crop:CropResponse": fake_crop,
+    "adt_press.llm.image_analysis:AnalysisResponse": fake_analysis,
+    "adt_press.llm.image_meaningfulness:BatchMeaningfulnessResponse": fake_image_answers,
+    "adt_press.llm.image_caption:BatchCaptionResponse": fake_image_answers,
+    "adt_press.llm.web_generation_html:GenerationResponse": fake_html,
+    "adt_press.llm.web_generation_rows:GenerationResponse": fake_rows,
+    "adt_press.llm.web_generation_two_column:GenerationResponse": fake_rows,
+}
+
+
+class FakeBackend:
+    """Answers completion and speech requests in place of litellm."""
+
+    def __init__(self, config: FakeLLMConfig):
+        self.config = config
+
+    def _request_hash(self, *parts: Any) -> str:
+        request = json.dumps([self.config.seed, *parts], sort_keys=True, default=str)
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+    async def _attempt(self, rng: random.Random) -> None:
+        """Waits as long as a request would take, failing at the configured error rate."""
+        if self.config.latency:
+            await asyncio.sleep(self.config.latency * rng.uniform(0.5, 1.5))
+        if rng.random() < self.config.error_rate:
+            raise FakeLLMError("fake backend failed the request")
+
+    async def completion(
+        self,
+        model: str,
+        max_retries: int,
+        response_model: type[T],
+        messages: list[dict],
+        telemetry: LLMCall | None = None,
+        **kwargs: Any,
+    ) -> T:
+        path = f"{response_model.__module__}:{response_model.__qualname__}"
+        context = kwargs.get("context") or {}
+        prompt_tokens = len(message_text(messages)) // CHARS_PER_TOKEN
+        request = self._request_hash(model, path, messages)
+
+        # failed attempts are retried like responses failing validation
+        attempt = 0
+        while True:
+            rng = random.Random(f"{request}:{attempt}")
+            try:
+                await self._attempt(rng)
+            except FakeLLMError as e:
+                if telemetry:
+                    telemetry.attempts += 1
+                    telemetry.prompt_tokens += prompt_tokens
+                    telemetry.validation_errors.append(f"{type(e).__name__}: {e}")
+                attempt += 1
+                if attempt > max_retries:
+                    raise
+                continue
+
+            fake = FAKE_RESPONSES.get(path)
+            fields = fake(context, messages, rng) if fake else fake_fields(response_model, rng)
+            response = response_model.model_validate(fields, context=context)
+
+            if telemetry:
+                telemetry.attempts += 1
+                telemetry.prompt_tokens += prompt_tokens
+                telemetry.completion_tokens += len(response.model_dump_json()) // CHARS_PER_TOKEN
+                telemetry.cost = 0.0
+            return response
+
+    async def speech(self, model: str, **kwargs: Any) -> bytes:
+        rng = random.Random(self._request_hash(model, kwargs))
+        await self._attempt(rng)
+
+        # as long as it would take to read the input out loud
+        seconds = max(len(str(kwargs.get("input", "")).split()), 1) * SECONDS_PER_WORD
+        return SILENT_MP3_FRAME * max(int(seconds / 0.026), 1)
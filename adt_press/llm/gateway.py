@@ -0,0 +1,486 @@
+import asyncio
+import hashlib
+import importlib
+import json
+import os
+import threading
+import time
+from functools import cache
+from typing import Any, TypeVar
+
+import fsspec
+from fsspec.implementations.local import LocalFileSystem
+from pydantic import BaseModel
+
+from adt_press.llm.fake import FakeBackend
+from adt_press.llm.image_profiles import has_image_profile, profiled_messages
+from adt_press.models.config import FakeLLMConfig, PromptConfig
+from adt_press.models.profile import LLMCallStats
+from adt_press.models.queue import Job, JobUsage
+from adt_press.models.telemetry import LLMCall
+from adt_press.utils.budget import Budget, BudgetExceeded
+from adt_press.utils.queue import FileJobQueue
+from adt_press.utils.sync import RateLimiter
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class ResponseCache:
+    """
+    Content addressed cache of LLM responses, keyed by a hash of the full request.
+
+    Responses are always kept in memory and, if a path is given, also written there so they survive the process. The
+    path may be a local directory or any fsspec URL, so the cache can be shared between machines.
+    """
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self._responses: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        if path:
+            self._fs, self._root = fsspec.core.url_to_fs(path)
+
+    def _entry_path(self, key: str) -> str:
+        return f"{self._root}/{key[:2]}/{key}"
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            if key in self._responses:
+                return self._responses[key]
+
+        if self.path:
+            try:
+                value = bytes(self._fs.cat_file(self._entry_path(key)))
+            except FileNotFoundError:
+                return None
+
+            # local caches are garbage collected least recently used first, see `adt_press.utils.cache`
+            if isinstance(self._fs, LocalFileSystem):
+                os.utime(self._entry_path(key))
+
+            with self._lock:
+                self._responses[key] = value
+            return value
+
+        return None
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._responses[key] = value
+
+        if self.path:
+            self._fs.makedirs(f"{self._root}/{key[:2]}", exist_ok=True)
+            self._fs.pipe_file(self._entry_path(key), value)
+
+
+class Gateway:
+    """
+    Single entry point for every LLM request made by adt-press.
+
+    A process holds one gateway, so books that are converted concurrently (see `adt_press.batch`) share its per model
+    rate limits and response cache. By default neither is configured and requests go straight to litellm.
+
+    If a queue is set, requests are not executed locally but queued as jobs for adt-press workers (see
+    `adt_press.worker`) and the gateway waits for their results. If a fake backend is set, requests are answered by it
+    instead of litellm (see `adt_press.llm.fake`).
+    """
+
+    def __init__(self) -> None:
+        self.rate_limiters: dict[str, RateLimiter] = {}
+        self.response_cache: ResponseCache | None = None
+        self.queue: FileJobQueue | None = None
+        self.fake_backend: FakeBackend | None = None
+        self.queue_poll_interval = 1.0
+        self.queue_timeout = 3600.0
+        self._last_requeue = 0.0
+
+    def configure(self, rate_limits: dict[str, int] | None = None, response_cache: ResponseCache | None = None) -> None:
+        """Sets the requests per minute allowed for each model and the response cache to use, replacing any previous setup."""
+        self.rate_limiters = {model: RateLimiter(limit) for model, limit in (rate_limits or {}).items()}
+        self.response_cache = response_cache
+
+    @property
+    def backend(self) -> str:
+        """Name of the backend answering requests, either litellm or fake."""
+        return "fake" if self.fake_backend else "litellm"
+
+    async def wait(self, model: str) -> None:
+        limiter = self.rate_limiters.get(model)
+        if limiter:
+            await limiter.wait()
+
+
+gateway = Gateway()
+
+
+class _CallStats(threading.local):
+    def __init__(self) -> None:
+        self.families: dict[str, LLMCallStats] = {}
+        self.calls: list[LLMCall] = []
+        self.budget: Budget | None = None
+        self.started_at = time.monotonic()
+        self.tokens = 0
+        self.cost = 0.0
+        self.stopped = 0
+        self.stop_reason: str | None = None
+
+
+# calls are counted per thread, each node runs all its requests on its own thread and event loop
+_call_stats = _CallStats()
+
+
+def reset_call_stats(budget: Budget | None = None) -> None:
+    """Starts counting the calls of a new node on this thread, stopping them once budget is exceeded if given."""
+    _call_stats.families = {}
+    _call_stats.calls = []
+    _call_stats.budget = budget
+    _call_stats.started_at = time.monotonic()
+    _call_stats.tokens = 0
+    _call_stats.cost = 0.0
+    _call_stats.stopped = 0
+    _call_stats.stop_reason = None
+
+
+def call_stats() -> list[LLMCallStats]:
+    """Returns the LLM calls made on this thread since the last reset, per prompt family."""
+    return sorted(_call_stats.families.values(), key=lambda s: s.family)
+
+
+def recorded_calls() -> list[LLMCall]:
+    """Returns each LLM call made on this thread since the last reset."""
+    return list(_call_stats.calls)
+
+
+def budget_stops() -> tuple[int, str | None]:
+    """Returns how many calls on this thread were stopped by the budget since the last reset, and why."""
+    return _call_stats.stopped, _call_stats.stop_reason
+
+
+def _check_budget() -> None:
+    budget = _call_stats.budget
+    if budget is None:
+        return
+
+    reason = budget.exceeded(_call_stats.tokens, _call_stats.cost, _call_stats.started_at)
+    if reason:
+        _call_stats.stopped += 1
+        _call_stats.stop_reason = reason
+        raise BudgetExceeded(reason)
+
+
+def _record_call(call: LLMCall, start: float) -> None:
+    call.latency_seconds = time.monotonic() - start
+    _call_stats.calls.append(call)
+
+    tokens = call.prompt_tokens + call.completion_tokens
+    _call_stats.tokens += tokens
+    _call_stats.cost += call.cost or 0
+    if _call_stats.budget:
+        _call_stats.budget.add(tokens, call.cost or 0)
+
+    stats = _call_stats.families.setdefault(call.family, LLMCallStats(family=call.family))
+    stats.calls += 1
+    stats.cached += int(call.cached)
+    stats.seconds += call.latency_seconds
+
+
+def configure_gateway(rate_limits: dict[str, int] | None = None, response_cache_path: str | None = None) -> None:
+    """
+    Configures the process wide gateway. Passing a response_cache_path of "" caches responses in memory only, None
+    disables the response cache.
+    """
+    response_cache = ResponseCache(response_cache_path) if response_cache_path is not None else None
+    gateway.configure(rate_limits=rate_limits, response_cache=response_cache)
+
+
+def configure_response_cache(response_cache_path: str | None) -> None:
+    """Persists responses at response_cache_path, keeping the configured rate limits. None disables the response cache."""
+    gateway.response_cache = ResponseCache(response_cache_path) if response_cache_path is not None else None
+
+
+def configure_queue(queue_path: str, timeout: float = 3600) -> None:
+    """
+    Sends all requests to the job queue at queue_path instead of executing them, an empty path executes locally. A
+    request not answered by a worker within timeout seconds fails, 0 waits forever.
+    """
+    gateway.queue = FileJobQueue(queue_path) if queue_path else None
+    gateway.queue_timeout = timeout
+
+
+def configure_backend(backend: str, fake_config: FakeLLMConfig | None = None) -> None:
+    """Sends requests to litellm, or to a fake backend answering them locally if backend is fake."""
+    if backend == "fake":
+        gateway.fake_backend = FakeBackend(fake_config or FakeLLMConfig())
+    elif backend == "litellm":
+        gateway.fake_backend = None
+    else:
+        raise ValueError(f"Unknown LLM backend '{backend}', must be litellm or fake")
+
+
+@cache
+def _instructor_client() -> Any:
+    # litellm and instructor take seconds to import, so only load them once we make a request
+    import instructor
+    from litellm import acompletion
+
+    return instructor.from_litellm(acompletion)
+
+
+def prompt_family(config: PromptConfig) -> str:
+    """Name of the prompt a config renders, e.g. image_caption, used to group requests."""
+    return os.path.splitext(os.path.basename(config.template_path))[0]
+
+
+def import_response_model(path: str) -> type[BaseModel]:
+    """
+    Imports the response model of a queued job. Job files may come from a shared filesystem, so only models defined by
+    adt-press are imported, never arbitrary modules.
+    """
+    module, _, name = path.partition(":")
+    if not module.startswith("adt_press."):
+        raise ValueError(f"Response model {path} is not part of adt_press")
+
+    response_model = getattr(importlib.import_module(module), name, None)
+    if not (isinstance(response_model, type) and issubclass(response_model, BaseModel)):
+        raise ValueError(f"Response model {path} is not a pydantic model")
+    return response_model
+
+
+@cache
+def _response_schema(response_model: type[BaseModel]) -> str:
+    return json.dumps(response_model.model_json_schema(), sort_keys=True)
+
+
+def request_key(model: str, response_model: type[BaseModel] | None, messages: list[dict], **kwargs: Any) -> str:
+    """
+    Returns a stable hash of everything that can influence the response to a request. The active backend is part of it,
+    so responses made up by the fake backend are never served to requests for real ones and vice versa.
+    """
+    request = dict(
+        backend=gateway.backend,
+        model=model,
+        response_model=f"{response_model.__module__}.{response_model.__qualname__}" if response_model else None,
+        schema=_response_schema(response_model) if response_model else None,
+        messages=messages,
+        kwargs=kwargs,
+    )
+    return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+async def create_completion(config: PromptConfig, response_model: type[T], messages: list[dict], **kwargs: Any) -> T:
+    """Requests a structured completion for the passed in messages, validated against response_model."""
+    start = time.monotonic()
+
+    # images are shrunk for the prompt before anything else, so cached responses and queued jobs match what is sent
+    if has_image_profile(config):
+        messages = await asyncio.to_thread(profiled_messages, messages, config)
+    call = LLMCall(family=prompt_family(config), model=config.model, kind="completion", started_at=time.time())
+    response_cache = gateway.response_cache
+    key = request_key(config.model, response_model, messages, **kwargs) if response_cache or gateway.queue else ""
+
+    if response_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            call.cached = True
+            _record_call(call, start)
+            return response_model.model_validate_json(cached, context=kwargs.get("context"))
+
+    # cached responses are free, but no new requests are made once over budget
+    _check_budget()
+
+    try:
+        if gateway.queue:
+            job = Job(
+                job_id=key,
+                kind="completion",
+                backend=gateway.backend,
+                family=prompt_family(config),
+                model=config.model,
+                max_retries=config.max_retries,
+                response_model=f"{response_model.__module__}:{response_model.__qualname__}",
+                messages=messages,
+                kwargs=kwargs,
+            )
+            # results of earlier runs are free like cached responses, only the usage of our own jobs counts
+            previous = gateway.queue.result(key)
+            result = previous if previous is not None else await queued_result(gateway.queue, job)
+            response = response_model.model_validate_json(result, context=kwargs.get("context"))
+
+            # the worker made the request and reports its tokens, retries and cost along with the result
+            if previous is not None:
+                call.cached = True
+            else:
+                usage = gateway.queue.usage(key) or JobUsage(attempts=1)
+                for name, value in usage.model_dump().items():
+                    setattr(call, name, value)
+        else:
+            await gateway.wait(config.model)
+            response = await litellm_completion(config.model, config.max_retries, response_model, messages, telemetry=call, **kwargs)
+    except Exception as e:
+        call.error = f"{type(e).__name__}: {e}"
+        _record_call(call, start)
+        raise
+
+    if response_cache:
+        response_cache.set(key, response.model_dump_json().encode("utf-8"))
+
+    _record_call(call, start)
+    return response
+
+
+def telemetry_hooks(call: LLMCall) -> Any:
+    """Returns instructor hooks adding the tokens, cost and validation errors of each attempt to call."""
+    from instructor.core.hooks import Hooks
+
+    def on_response(response: Any) -> None:
+        call.attempts += 1
+
+        usage = getattr(response, "usage", None)
+        if usage:
+            call.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            call.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+            call.cached_tokens += getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+
+        cost = response_cost(response)
+        if cost is not None:
+            call.cost = (call.cost or 0) + cost
+
+    def on_parse_error(error: Exception) -> None:
+        call.validation_errors.append(f"{type(error).__name__}: {error}")
+
+    hooks = Hooks()
+    hooks.on("completion:response", on_response)
+    hooks.on("parse:error", on_parse_error)
+    return hooks
+
+
+def speech_cost(model: str, text: str) -> float | None:
+    """Returns the cost of speaking text in USD, None if the price of the model isn't known."""
+    import litellm
+
+    try:
+        return float(litellm.completion_cost(model=model, prompt=text, call_type="speech"))
+    except Exception:
+        return None
+
+
+def response_cost(response: Any) -> float | None:
+    """Returns the cost of a litellm response in USD, None if the price of its model isn't known."""
+    import litellm
+
+    try:
+        return float(litellm.completion_cost(completion_response=response))
+    except Exception:
+        return None
+
+
+async def litellm_completion(
+    model: str, max_retries: int, response_model: type[T], messages: list[dict], telemetry: LLMCall | None = None, **kwargs: Any
+) -> T:
+    if gateway.fake_backend:
+        return await gateway.fake_backend.completion(model, max_retries, response_model, messages, telemetry=telemetry, **kwargs)
+
+    response: T = await _instructor_client().chat.completions.create(
+        model=model,
+        response_model=response_model,
+        messages=messages,
+        max_retries=max_retries,
+        hooks=telemetry_hooks(telemetry) if telemetry else None,
+        **kwargs,
+    )
+    return response
+
+
+async def litellm_speech(model: str, **kwargs: Any) -> bytes:
+    if gateway.fake_backend:
+        return await gateway.fake_backend.speech(model, **kwargs)
+
+    import litellm
+
+    response = await litellm.aspeech(model=model, **kwargs)
+    return bytes(response.content)
+
+
+async def queued_result(queue: FileJobQueue, job: Job) -> bytes:
+    """
+    Queues the job and waits for a worker to complete it, requeueing it if its worker appears to have died or its file
+    was lost. Raises a TimeoutError if no worker answers it within the gateway's queue_timeout, the job stays queued so
+    a later run picks up its result. A failure left by an earlier run is retried.
+    """
+    queue.enqueue(job, retry_failure=queue.error(job.job_id))
+    started = time.monotonic()
+    while True:
+        result = queue.result(job.job_id)
+        if result is not None:
+            return result
+
+        error = queue.error(job.job_id)
+        if error is not None:
+            raise RuntimeError(f"Queued {job.family} job {job.job_id} failed: {error}")
+
+        # e.g. removed by hand or by a worker failing before it could record the failure, a worker failing it right
+        # after we looked for an error above also releases the job, so we look again before queueing it
+        if not queue.is_queued(job.job_id):
+            error = queue.error(job.job_id)
+            if error is not None:
+                raise RuntimeError(f"Queued {job.family} job {job.job_id} failed: {error}")
+            queue.enqueue(job)
+
+        if gateway.queue_timeout and time.monotonic() - started > gateway.queue_timeout:
+            raise TimeoutError(
+                f"Queued {job.family} job {job.job_id} wasn't answered within {gateway.queue_timeout:g} seconds, are workers running?"
+            )
+
+        # only one of the waiting requests needs to look for dead workers each interval
+        if time.monotonic() - gateway._last_requeue > gateway.queue_poll_interval:
+            gateway._last_requeue = time.monotonic()
+            queue.requeue_stale()
+
+        await asyncio.sleep(gateway.queue_poll_interval)
+
+
+async def create_speech(config: PromptConfig, **kwargs: Any) -> bytes:
+    """Generates speech using the configured model, returning the audio bytes."""
+    start = time.monotonic()
+    call = LLMCall(family=prompt_family(config), model=config.model, kind="speech", started_at=time.time())
+    response_cache = gateway.response_cache
+    key = request_key(config.model, None, [], **kwargs) if response_cache or gateway.queue else ""
+
+    if response_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            call.cached = True
+            _record_call(call, start)
+            return cached
+
+    _check_budget()
+
+    # speech responses don't report usage, their cost only depends on the length of the text
+    call.attempts = 1
+    try:
+        if gateway.queue:
+            job = Job(
+                job_id=key,
+                kind="speech",
+                backend=gateway.backend,
+                family=prompt_family(config),
+                model=config.model,
+                kwargs=kwargs,
+            )
+            audio = await queued_result(gateway.queue, job)
+        else:
+            await gateway.wait(config.model)
+            audio = await litellm_speech(config.model, **kwargs)
+    except Exception as e:
+        call.error = f"{type(e).__name__}: {e}"
+        _record_call(call, start)
+        raise
+
+    if not gateway.fake_backend:
+        call.cost = speech_cost(config.model, str(kwargs.get("input", "")))
+
+    if response_cache:
+        response_cache.set(key, audio)
+
+    _record_call(call, start)
+    return audio
@@ -1,7 +1,6 @@
-import instructor
 from banks import Prompt
-from litellm import acompletion
 
+from adt_press.llm.gateway import create_completion
 from adt_press.models.config import PromptConfig
 from adt_press.models.section import GlossaryItem
 from adt_press.utils.encoding import CleanTextBaseModel
@@ -33,12 +32,10 @@ async def get_glossary_translation(
     )
 
     prompt = Prompt(cached_read_text_file(config.template_path))
-    client = instructor.from_litellm(acompletion)
-    response: TranslationResponse = await client.chat.completions.create(
-        model=config.model,
+    response: TranslationResponse = await create_completion(
+        config,
         response_model=TranslationResponse,
         messages=[m.model_dump(exclude_none=True) for m in prompt.chat_messages(context)],
-        max_retries=config.max_retries,
     )
 
     return GlossaryItem(word=response.word, definition=response.definition, variations=response.variants, emojis=glossary_item.emojis)
@@ -0,0 +1,60 @@
+from banks import Prompt
+
+from adt_press.llm.gateway import create_completion
+from adt_press.models.config import PromptConfig
+from adt_press.models.image import CropCoordinates, Image, ImageAnalysis, ImageCaption, ImageMeaningfulness
+from adt_press.models.pdf import Page
+from adt_press.utils.encoding import CleanTextBaseModel
+from adt_press.utils.file import cached_read_text_file
+from adt_press.utils.languages import LANGUAGE_MAP
+
+
+class AnalysisResponse(CleanTextBaseModel):
+    meaningfulness_reasoning: str
+    is_meaningful: bool
+    caption_reasoning: str
+    caption: str
+    top_left_x: int
+    top_left_y: int
+    bottom_right_x: int
+    bottom_right_y: int
+
+
+async def get_image_analysis(config: PromptConfig, page: Page, image: Image, language_code: str) -> ImageAnalysis:
+    """Asks the LLM whether the image is meaningful, for its caption and for its crop in a single request."""
+    language = LANGUAGE_MAP[language_code]
+
+    context = dict(
+        language_code=language_code,
+        language=language,
+        page=page,
+        image=image,
+        examples=config.examples,
+    )
+
+    prompt = Prompt(cached_read_text_file(config.template_path))
+    response: AnalysisResponse = await create_completion(
+        config,
+        response_model=AnalysisResponse,
+        messages=[m.model_dump(exclude_none=True) for m in prompt.chat_messages(context)],
+    )
+
+    return ImageAnalysis(
+        image_id=image.image_id,
+        meaningfulness=ImageMeaningfulness(
+            image_id=image.image_id,
+            is_meaningful=response.is_meaningful,
+            reasoning=response.meaningfulness_reasoning,
+        ),
+        caption=ImageCaption(
+            image_id=image.image_id,
+            caption=response.caption,
+            reasoning=response.caption_reasoning,
+        ),
+        crop_coordinates=CropCoordinates(
+            top_left_x=response.top_left_x,
+            top_left_y=response.top_left_y,
+            bottom_right_x=response.bottom_right_x,
+            bottom_right_y=response.bottom_right_y,
+        ),
+    )
@@ -0,0 +1,35 @@
+from pydantic import ValidationInfo
+
+from adt_press.models.config import BatchPromptConfig
+from adt_press.models.image import Image
+
+
+def image_batches(config: BatchPromptConfig, images: list[Image]) -> list[list[Image]]:
+    """
+    Groups the images of a page to be asked about in a single request. Pages with a single image, or too many images to
+    batch, are asked about one image at a time, as is every page when the prompt has no batch template.
+    """
+    if (
+        not config.batch_template_path
+        or len(images) < 2
+        or len(images) > config.max_batch_images
+        or sum(img.width * img.height for img in images) > config.max_batch_pixels
+    ):
+        return [[img] for img in images]
+    return [images]
+
+
+def validate_batch_image_ids(image_ids: list[str], info: ValidationInfo) -> None:
+    """Ensures a batched response answers for each image of the request exactly once."""
+    expected = info.context.get("image_ids", []) if info.context else []
+    if not expected:
+        return
+
+    missing = sorted(set(expected) - set(image_ids))
+    unexpected = sorted(set(image_ids) - set(expected))
+    repeated = sorted({image_id for image_id in image_ids if image_ids.count(image_id) > 1})
+    if missing or unexpected or repeated:
+        raise ValueError(
+            f"Each image must be answered for exactly once, missing: {', '.join(missing) or 'none'}, "
+            f"unexpected: {', '.join(unexpected) or 'none'}, repeated: {', '.join(repeated) or 'none'}"
+        )
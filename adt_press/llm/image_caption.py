@@ -1,8 +1,9 @@
-import instructor
 from banks import Prompt
-from litellm import acompletion
+from pydantic import ValidationInfo, field_validator
 
-from adt_press.models.config import PromptConfig
+from adt_press.llm.gateway import create_completion
+from adt_press.llm.image_batch import validate_batch_image_ids
+from adt_press.models.config import BatchPromptConfig, PromptConfig
 from adt_press.models.image import Image, ImageCaption
 from adt_press.models.pdf import Page
 from adt_press.utils.encoding import CleanTextBaseModel
@@ -27,12 +28,10 @@ async def get_image_caption(config: PromptConfig, page: Page, image: Image, lang
     )
 
     prompt = Prompt(cached_read_text_file(config.template_path))
-    client = instructor.from_litellm(acompletion)
-    response: CaptionResponse = await client.chat.completions.create(
-        model=config.model,
+    response: CaptionResponse = await create_completion(
+        config,
         response_model=CaptionResponse,
         messages=[m.model_dump(exclude_none=True) for m in prompt.chat_messages(context)],
-        max_retries=config.max_retries,
     )
 
     return ImageCaption(
@@ -40,3 +39,41 @@ async def get_image_caption(config: PromptConfig, page: Page, image: Image, lang
         caption=response.caption,
         reasoning=response.reasoning,
     )
+
+
+class ImageCaptionResponse(CaptionResponse):
+    image_id: str
+
+
+class BatchCaptionResponse(CleanTextBaseModel):
+    images: list[ImageCaptionResponse]
+
+    @field_validator("images")
+    @classmethod
+    def validate_image_ids(cls, v: list[ImageCaptionResponse], info: ValidationInfo) -> list[ImageCaptionResponse]:
+        validate_batch_image_ids([i.image_id for i in v], info)
+        return v
+
+
+async def get_image_captions(config: BatchPromptConfig, page: Page, images: list[Image], language_code: str) -> list[ImageCaption]:
+    """Captions all the images of a page in a single request."""
+    assert config.batch_template_path, "Batched requests need a batch template."
+    language = LANGUAGE_MAP[language_code]
+
+    context = dict(
+        language_code=language_code,
+        language=language,
+        page=page,
+        images=images,
+        examples=config.examples,
+    )
+
+    prompt = Prompt(cached_read_text_file(config.batch_template_path))
+    response: BatchCaptionResponse = await create_completion(
+        config,
+        response_model=BatchCaptionResponse,
+        messages=[m.model_dump(exclude_none=True) for m in prompt.chat_messages(context)],
+        context={"image_ids": [img.image_id for img in images]},
+    )
+
+    return [ImageCaption(image_id=i.image_id, caption=i.caption, reasoning=i.reasoning) for i in response.images]
@@ -1,13 +1,14 @@
-import instructor
+import asyncio
+
 from banks import Prompt
-from litellm import acompletion
 
+from adt_press.llm.gateway import create_completion
 from adt_press.models.config import CropPromptConfig
 from adt_press.models.image import CropCoordinates, Image
 from adt_press.models.pdf import Page
 from adt_press.utils.encoding import CleanTextBaseModel
-from adt_press.utils.file import cached_read_file, cached_read_text_file, write_file
-from adt_press.utils.image import visualize_crop_extents
+from adt_press.utils.file import cached_read_text_file, write_file
+from adt_press.utils.image import decoded_image, visualize_crop_extents
 
 
 class CropResponse(CleanTextBaseModel):
@@ -17,7 +18,14 @@ class CropResponse(CleanTextBaseModel):
     bottom_right_y: int
 
 
-async def get_image_crop_coordinates(config: CropPromptConfig, page: Page, image: Image) -> CropCoordinates:
+async def get_image_crop_coordinates(
+    config: CropPromptConfig, page: Page, image: Image, initial: CropCoordinates | None = None
+) -> CropCoordinates:
+    """
+    Asks the LLM where to crop the image, then shows it its crop for up to config.recrops rounds of corrections, stopping
+    early once it barely moves the crop. Given an initial crop, e.g. one proposed locally, the LLM corrects it from the
+    first round instead of proposing its own.
+    """
     context = dict(
         page=page,
         image=image,
@@ -27,13 +35,17 @@ async def get_image_crop_coordinates(config: CropPromptConfig, page: Page, image
     prompt = Prompt(cached_read_text_file(config.template_path))
     messages = [m.model_dump(exclude_none=True) for m in prompt.chat_messages(context)]
 
-    client = instructor.from_litellm(acompletion)
-    response: CropResponse = await client.chat.completions.create(
-        model=config.model,
-        response_model=CropResponse,
-        messages=messages,
-        max_retries=config.max_retries,
-    )
+    # an initial crop can only be corrected with a recrop template, without one the LLM proposes its own
+    recrops = config.recrops
+    if initial and config.recrop_template_path:
+        response = CropResponse(**initial.model_dump())
+        recrops = max(recrops, 1)
+    else:
+        response = await create_completion(
+            config,
+            response_model=CropResponse,
+            messages=messages,
+        )
 
     # if we have a recrop template
     if config.recrop_template_path:
@@ -41,33 +53,63 @@ async def get_image_crop_coordinates(config: CropPromptConfig, page: Page, image
         recrop = 0
 
         # and we want to recrop the image
-        while recrop < config.recrops:
-            cropped = visualize_crop_extents(
-                cached_read_file(image.image_path),
-                response.top_left_x,
-                response.top_left_y,
-                response.bottom_right_x,
-                response.bottom_right_y,
-            )
-            cropped_path = write_file(image.image_path, cropped, "recrop")
+        while recrop < recrops:
+            # drawing and encoding happen off the event loop so other images' requests aren't held up
+            cropped_path = await asyncio.to_thread(recrop_visualization, image, response)
 
             context = dict(
                 crop_coordinates=response.model_dump(),
                 cropped_path=cropped_path,
             )
             recrop_messages = [m.model_dump(exclude_none=True) for m in recrop_prompt.chat_messages(context)]
-            messages = messages + recrop_messages
-            response = await client.chat.completions.create(
-                model=config.model,
+
+            # the recrop image shows the latest crop, so earlier recrop turns are left out of the conversation
+            previous = response
+            response = await create_completion(
+                config,
                 response_model=CropResponse,
-                messages=messages,
-                max_retries=config.max_retries,
+                messages=messages + recrop_messages,
             )
             recrop += 1
 
+            # further rounds would only repeat a crop the LLM no longer moves
+            if crops_converged(previous, response, config.recrop_tolerance, config.recrop_min_iou):
+                break
+
     return CropCoordinates(
         top_left_x=response.top_left_x,
         top_left_y=response.top_left_y,
         bottom_right_x=response.bottom_right_x,
         bottom_right_y=response.bottom_right_y,
     )
+
+
+def crops_converged(a: CropResponse, b: CropResponse, tolerance: int, min_iou: float) -> bool:
+    """Whether no coordinate of b moved by more than tolerance pixels from a, or the two overlap by at least min_iou."""
+    coordinates = ["top_left_x", "top_left_y", "bottom_right_x", "bottom_right_y"]
+    if all(abs(getattr(a, c) - getattr(b, c)) <= tolerance for c in coordinates):
+        return True
+
+    def area(x0: int, y0: int, x1: int, y1: int) -> int:
+        return max(x1 - x0, 0) * max(y1 - y0, 0)
+
+    intersection = area(
+        max(a.top_left_x, b.top_left_x),
+        max(a.top_left_y, b.top_left_y),
+        min(a.bottom_right_x, b.bottom_right_x),
+        min(a.bottom_right_y, b.bottom_right_y),
+    )
+    union = area(*[getattr(a, c) for c in coordinates]) + area(*[getattr(b, c) for c in coordinates]) - intersection
+    return union > 0 and intersection / union >= min_iou
+
+
+def recrop_visualization(image: Image, crop: CropResponse) -> str:
+    """Writes the image with the crop drawn on it next to the image, returning its path."""
+    cropped = visualize_crop_extents(
+        decoded_image(image.image_path),
+        crop.top_left_x,
+        crop.top_left_y,
+        crop.bottom_right_x,
+        crop.bottom_right_y,
+    )
+    return write_file(image.image_path, cropped, "recrop")
@@ -1,8 +1,9 @@
-import instructor
 from banks import Prompt
-from litellm import acompletion
+from pydantic import ValidationInfo, field_validator
 
-from adt_press.models.config import PromptConfig
+from adt_press.llm.gateway import create_completion
+from adt_press.llm.image_batch import validate_batch_image_ids
+from adt_press.models.config import BatchPromptConfig, PromptConfig
 from adt_press.models.image import Image, ImageMeaningfulness
 from adt_press.models.pdf import Page
 from adt_press.utils.encoding import CleanTextBaseModel
@@ -22,12 +23,10 @@ async def get_image_meaningfulness(config: PromptConfig, page: Page, image: Imag
     )
 
     prompt = Prompt(cached_read_text_file(config.template_path))
-    client = instructor.from_litellm(acompletion)
-    response: MeaningfulnessResponse = await client.chat.completions.create(
-        model=config.model,
+    response: MeaningfulnessResponse = await create_completion(
+        config,
         response_model=MeaningfulnessResponse,
         messages=[m.model_dump(exclude_none=True) for m in prompt.chat_messages(context)],
-        max_retries=config.max_retries,
     )
 
     return ImageMeaningfulness(
@@ -35,3 +34,37 @@ async def get_image_meaningfulness(config: PromptConfig, page: Page, image: Imag
         is_meaningful=response.is_meaningful,
         reasoning=response.reasoning,
     )
+
+
+class ImageMeaningfulnessResponse(MeaningfulnessResponse):
+    image_id: str
+
+
+class BatchMeaningfulnessResponse(CleanTextBaseModel):
+    images: list[ImageMeaningfulnessResponse]
+
+    @field_validator("images")
+    @classmethod
+    def validate_image_ids(cls, v: list[ImageMeaningfulnessResponse], info: ValidationInfo) -> list[ImageMeaningfulnessResponse]:
+        validate_batch_image_ids([i.image_id for i in v], info)
+        return v
+
+
+async def get_images_meaningfulness(config: BatchPromptConfig, page: Page, images: list[Image]) -> list[ImageMeaningfulness]:
+    """Asks whether each of the images of a page is meaningful in a single request."""
+    assert config.batch_template_path, "Batched requests need a batch template."
+    context = dict(
+        page=page,
+        images=images,
+        examples=config.examples,
+    )
+
+    prompt = Prompt(cached_read_text_file(config.batch_template_path))
+    response: BatchMeaningfulnessResponse = await create_completion(
+        config,
+        response_model=BatchMeaningfulnessResponse,
+        messages=[m.model_dump(exclude_none=True) for m in prompt.chat_messages(context)],
+        context={"image_ids": [img.image_id for img in images]},
+    )
+
+    return [ImageMeaningfulness(image_id=i.image_id, is_meaningful=i.is_meaningful, reasoning=i.reasoning) for i in response.images]
@@ -0,0 +1,72 @@
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+
+from adt_press.models.config import PromptConfig
+from adt_press.utils.image import downscaled_image
+
+# bytes of derived images kept in memory, so images sent with several prompts or retried are only converted once
+DERIVATIVE_CACHE_BYTES = 256 * 1024 * 1024
+
+_derivatives: OrderedDict[tuple[str, int | None, str, int], str] = OrderedDict()
+_derivatives_size = 0
+_derivatives_lock = threading.Lock()
+
+
+def has_image_profile(config: PromptConfig) -> bool:
+    return config.max_image_side is not None or config.image_format != "png"
+
+
+def derived_image_url(url: str, config: PromptConfig) -> str:
+    """
+    Returns the data url of the image in url shrunk and encoded as the config asks, cached by the hash of the image.
+    Images that are already small enough and in the right format, and urls that aren't data urls, are returned as is.
+    """
+    global _derivatives_size
+    header, _, data = url.partition(",")
+    if not header.startswith("data:image/") or not header.endswith(";base64"):
+        return url
+
+    key = (hashlib.sha256(data.encode("ascii")).hexdigest(), config.max_image_side, config.image_format, config.image_quality)
+    with _derivatives_lock:
+        if key in _derivatives:
+            _derivatives.move_to_end(key)
+            return _derivatives[key]
+
+    original = base64.b64decode(data)
+    derived = downscaled_image(original, config.max_image_side, config.image_format, config.image_quality)
+
+    # converting can make small images bigger, in which case we send the original
+    derived_url = url
+    if len(derived) < len(original) or not header.startswith(f"data:image/{config.image_format};"):
+        derived_url = f"data:image/{config.image_format};base64,{base64.b64encode(derived).decode('ascii')}"
+
+    with _derivatives_lock:
+        if key not in _derivatives:
+            _derivatives[key] = derived_url
+            _derivatives_size += len(derived_url)
+        while _derivatives_size > DERIVATIVE_CACHE_BYTES and len(_derivatives) > 1:
+            _, evicted = _derivatives.popitem(last=False)
+            _derivatives_size -= len(evicted)
+    return derived_url
+
+
+def profiled_messages(messages: list[dict], config: PromptConfig) -> list[dict]:
+    """Returns the messages with their images shrunk and encoded as the prompt config asks."""
+    if not has_image_profile(config):
+        return messages
+
+    profiled = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = [
+                {**block, "image_url": {**block["image_url"], "url": derived_image_url(block["image_url"]["url"], config)}}
+                if block.get("type") == "image_url"
+                else block
+                for block in content
+            ]
+            message = {**message, "content": content}
+        profiled.append(message)
+    return profiled
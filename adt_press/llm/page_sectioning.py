@@ -1,8 +1,7 @@
-import instructor
 from banks import Prompt
-from litellm import acompletion
 from pydantic import BaseModel, ValidationInfo, field_validator
 
+from adt_press.llm.gateway import create_completion
 from adt_press.models.config import PromptConfig
 from adt_press.models.image import ProcessedImage
 from adt_press.models.pdf import Page
@@ -56,7 +55,6 @@ async def get_page_sections(config: PromptConfig, page: Page, images: list[Proce
     )
 
     prompt = Prompt(cached_read_text_file(config.template_path))
-    client = instructor.from_litellm(acompletion)
 
     # Create validation context
     validation_context = {
@@ -64,11 +62,10 @@ async def get_page_sections(config: PromptConfig, page: Page, images: list[Proce
         "image_ids": [i.image_id for i in images],
     }
 
-    response: SectionResponse = await client.chat.completions.create(
-        model=config.model,
+    response: SectionResponse = await create_completion(
+        config,
         response_model=SectionResponse,
         messages=[m.model_dump(exclude_none=True) for m in prompt.chat_messages(context)],
-        max_retries=config.max_retries,
         context=validation_context,
     )
 
@@ -1,7 +1,6 @@
-import instructor
 from banks import Prompt
-from litellm import acompletion
 
+from adt_press.llm.gateway import create_completion
 from adt_press.models.config import PromptConfig
 from adt_press.models.image import ProcessedImage
 from adt_press.models.pdf import Page
@@ -31,12 +30,10 @@ async def get_section_explanation(
     )
 
     prompt = Prompt(cached_read_text_file(config.template_path))
-    client = instructor.from_litellm(acompletion)
-    response: ExplanationResponse = await client.chat.completions.create(
-        model=config.model,
+    response: ExplanationResponse = await create_completion(
+        config,
         response_model=ExplanationResponse,
         messages=[m.model_dump(exclude_none=True) for m in prompt.chat_messages(context)],
-        max_retries=config.max_retries,
     )
 
     return SectionExplanation(
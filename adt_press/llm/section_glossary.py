@@ -1,7 +1,6 @@
-import instructor
 from banks import Prompt
-from litellm import acompletion
 
+from adt_press.llm.gateway import create_completion
 from adt_press.models.config import PromptConfig
 from adt_press.models.section import GlossaryItem, PageSection, SectionGlossary
 from adt_press.utils.encoding import CleanTextBaseModel
@@ -25,12 +24,10 @@ async def get_section_glossary(language_code: str, config: PromptConfig, section
     )
 
     prompt = Prompt(cached_read_text_file(config.template_path))
-    client = instructor.from_litellm(acompletion)
-    response: GlossaryResponse = await client.chat.completions.create(
-        model=config.model,
+    response: GlossaryResponse = await create_completion(
+        config,
         response_model=GlossaryResponse,
         messages=[m.model_dump(exclude_none=True) for m in prompt.chat_messages(context)],
-        max_retries=config.max_retries,
     )
 
     return SectionGlossary(
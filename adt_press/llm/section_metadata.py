@@ -1,9 +1,8 @@
 # mypy: ignore-errors
-import instructor
 from banks import Prompt
-from litellm import acompletion
 from pydantic import ValidationInfo, field_validator
 
+from adt_press.llm.gateway import create_completion
 from adt_press.models.config import LayoutType, PromptConfig
 from adt_press.models.pdf import Page
 from adt_press.models.section import PageSection, SectionMetadata
@@ -39,12 +38,10 @@ async def get_section_metadata(
     )
 
     prompt = Prompt(cached_read_text_file(config.template_path))
-    client = instructor.from_litellm(acompletion)
-    response: MetadataResponse = await client.chat.completions.create(
-        model=config.model,
+    response: MetadataResponse = await create_completion(
+        config,
         response_model=MetadataResponse,
         messages=[m.model_dump(exclude_none=True) for m in prompt.chat_messages(context)],
-        max_retries=config.max_retries,
         context={"layout_types": list(layout_types.keys())},
     )
 
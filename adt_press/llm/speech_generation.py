@@ -1,9 +1,9 @@
 import os
 
-import litellm
-
+from adt_press.llm.gateway import create_speech
 from adt_press.models.config import PromptConfig
 from adt_press.models.speech import SpeechFile
+from adt_press.utils.file import write_file
 from adt_press.utils.html import render_template_to_string
 from adt_press.utils.languages import LANGUAGE_MAP
 
@@ -27,14 +27,14 @@ async def generate_speech_file(run_output_dir: str, config: PromptConfig, langua
 
     speech_path = os.path.join(speech_dir, f"{speech_id}.mp3")
 
-    response = await litellm.aspeech(
-        model=config.model,
+    audio = await create_speech(
+        config,
         voice="alloy",
         input=text,
         instructions=prompt,
         response_format="mp3",
     )
-    response.write_to_file(speech_path)
+    write_file(speech_path, audio)
 
     speech_relative_path = os.path.join("audio", language_code, f"{speech_id}.mp3")
     return SpeechFile(speech_id=speech_id, speech_path=speech_relative_path, language_code=language_code, text_id=text_id)
@@ -1,7 +1,6 @@
-import instructor
 from banks import Prompt
-from litellm import acompletion
 
+from adt_press.llm.gateway import create_completion
 from adt_press.models.config import PromptConfig
 from adt_press.models.text import EasyReadText, PageText
 from adt_press.utils.encoding import CleanTextBaseModel
@@ -24,12 +23,10 @@ async def get_text_easy_read(language_code: str, config: PromptConfig, text: Pag
     )
 
     prompt = Prompt(cached_read_text_file(config.template_path))
-    client = instructor.from_litellm(acompletion)
-    response: EasyReadResponse = await client.chat.completions.create(
-        model=config.model,
+    response: EasyReadResponse = await create_completion(
+        config,
         response_model=EasyReadResponse,
         messages=[m.model_dump(exclude_none=True) for m in prompt.chat_messages(context)],
-        max_retries=config.max_retries,
     )
 
     return EasyReadText(
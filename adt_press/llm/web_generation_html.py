@@ -1,10 +1,8 @@
 # mypy: ignore-errors
-import instructor
 from banks import Prompt
-from bs4 import BeautifulSoup
-from litellm import acompletion
 from pydantic import ValidationInfo, field_validator
 
+from adt_press.llm.gateway import create_completion
 from adt_press.models.config import PromptConfig
 from adt_press.models.plate import PlateImage, PlateSection, PlateText
 from adt_press.models.web import RenderTextGroup, WebPage
@@ -21,6 +19,8 @@ class GenerationResponse(CleanTextBaseModel):
     @classmethod
     def validate_html_data_ids(cls, v: str, info: ValidationInfo) -> str:
         """Ensure all HTML nodes with text have data-id attributes that reference valid IDs."""
+        from bs4 import BeautifulSoup
+
         soup = BeautifulSoup(v, "html.parser")
 
         # Get valid IDs from context
@@ -85,19 +85,16 @@ async def generate_web_page_html(
     template_path = config.template_path
     prompt = Prompt(cached_read_text_file(template_path))
 
-    client = instructor.from_litellm(acompletion)
-
     # Create validation context for Pydantic
     validation_context = {
         "text_ids": [t.text_id for t in texts],
         "image_ids": [i.image_id for i in images],
     }
 
-    response: GenerationResponse = await client.chat.completions.create(
-        model=config.model,
+    response: GenerationResponse = await create_completion(
+        config,
         response_model=GenerationResponse,
         messages=[m.model_dump(exclude_none=True) for m in prompt.chat_messages(context)],
-        max_retries=config.max_retries,
         context=validation_context,
     )
 
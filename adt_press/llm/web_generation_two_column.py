@@ -1,9 +1,8 @@
 # mypy: ignore-errors
-import instructor
 from banks import Prompt
-from litellm import acompletion
 from pydantic import BaseModel, ValidationInfo, field_validator
 
+from adt_press.llm.gateway import create_completion
 from adt_press.models.config import RenderPromptConfig
 from adt_press.models.plate import PlateImage, PlateSection, PlateText
 from adt_press.models.web import RenderTextGroup, WebPage
@@ -110,8 +109,6 @@ async def generate_web_page_two_column(
     template_path = config.template_path
     prompt = Prompt(cached_read_text_file(template_path))
 
-    client = instructor.from_litellm(acompletion)
-
     # Create validation context for Pydantic
     validation_context = {
         "text_ids": [t.text_id for t in texts],
@@ -119,11 +116,10 @@ async def generate_web_page_two_column(
         "section_type": section.section_type.name,
     }
 
-    response: GenerationResponse = await client.chat.completions.create(
-        model=config.model,
+    response: GenerationResponse = await create_completion(
+        config,
         response_model=GenerationResponse,
         messages=[m.model_dump(exclude_none=True) for m in prompt.chat_messages(context)],
-        max_retries=config.max_retries,
         context=validation_context,
     )
 
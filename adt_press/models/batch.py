@@ -0,0 +1,52 @@
+from typing import Any, Self
+
+from pydantic import BaseModel, model_validator
+
+# settings of the process wide gateway, configured once by the batch so books can't override them
+SHARED_KEYS = ["queue_dir", "queue_timeout", "llm_backend", "fake_llm", "cache.responses"]
+
+
+class BatchManifest(BaseModel):
+    """A set of books to convert in a single process, sharing one LLM gateway."""
+
+    # number of books converted concurrently
+    workers: int = 2
+
+    # requests per minute allowed per model, shared across all books in the batch
+    rate_limits: dict[str, int] = {}
+
+    # whether identical LLM requests across books are answered from a shared cache
+    response_cache: bool = True
+
+    # if set, cached responses are also persisted here and reused by later batches
+    response_cache_path: str = ""
+
+    # config overrides for each book, at minimum a label and pdf_path
+    books: list[dict[str, Any]]
+
+    @model_validator(mode="after")
+    def check_shared_keys(self) -> Self:
+        """Rejects books overriding settings shared by the whole batch."""
+        for book in self.books:
+            for key in SHARED_KEYS:
+                section, _, name = key.rpartition(".")
+                values = book.get(section, {}) if section else book
+                if isinstance(values, dict) and name in values:
+                    raise ValueError(f"Book {book.get('label', '???')} can't override {key}, it is shared by the whole batch")
+        return self
+
+
+class BookResult(BaseModel):
+    label: str
+    success: bool
+    error: str | None = None
+    pages: int
+    seconds: float
+    pages_per_minute: float
+
+
+class BatchResult(BaseModel):
+    books: list[BookResult]
+    seconds: float
+    pages: int
+    pages_per_minute: float
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+
+
+class CacheNodeUsage(BaseModel):
+    node_name: str
+    entries: int
+    bytes: int
+
+
+class CacheCollection(BaseModel):
+    """The outcome of collecting garbage in a cache directory."""
+
+    removed_entries: int
+    removed_bytes: int
+    remaining_bytes: int
@@ -1,6 +1,6 @@
 import enum
 import os
-from typing import Self
+from typing import Literal, Self
 
 import yaml
 from pydantic import BaseModel, Field, model_validator
@@ -78,9 +78,16 @@ class PromptConfig(PathHashMixin):
     template_path: str
     examples: list[dict] = []
 
+    # requests per minute, and requests in flight at once, a node makes with this prompt
     rate_limit: int = 300
+    max_concurrency: int = 100
     max_retries: int = 10
 
+    # images are sent with their longest side shrunk to max_image_side pixels if set, and encoded as png or jpeg
+    max_image_side: int | None = None
+    image_format: Literal["png", "jpeg"] = "png"
+    image_quality: int = 85
+
 
 class HTMLPromptConfig(PromptConfig):
     example_dirs: list[str] = []
@@ -112,10 +119,24 @@ class HTMLPromptConfig(PromptConfig):
         return self
 
 
+class BatchPromptConfig(PromptConfig):
+    """Prompt config that can also ask about all the images of a page in a single request."""
+
+    batch_template_path: str | None = None
+
+    # pages with more images, or more pixels across their images, are asked about one image at a time
+    max_batch_images: int = 10
+    max_batch_pixels: int = 16_000_000
+
+
 class CropPromptConfig(PromptConfig):
     recrop_template_path: str | None = None
     recrops: int = 0
 
+    # recropping stops once no coordinate moves by more than this many pixels or the crop overlaps the previous one this much
+    recrop_tolerance: int = 4
+    recrop_min_iou: float = 0.98
+
 
 class RenderPromptConfig(PromptConfig):
     """Prompt config that also includes a template used to render the final output."""
@@ -134,5 +155,50 @@ class PageRangeConfig(BaseModel):
     end: int = 0
 
 
+class CacheConfig(BaseModel):
+    # local directory or fsspec URL holding the cache
+    dir: str = ""
+
+    # whether LLM responses are cached as well, they count towards max_bytes
+    responses: bool = True
+
+    # total size of cached results to keep, least recently used results are evicted beyond it, 0 for no limit
+    max_bytes: int = 0
+
+    # if set, results not used by one of the latest keep_runs runs are removed
+    keep_runs: int = 0
+
+
+class BudgetLimits(BaseModel):
+    """Limits on LLM usage, 0 disables a limit."""
+
+    max_tokens: int = 0
+
+    # in USD, calls to models litellm has no price for aren't counted
+    max_cost: float = 0
+    max_seconds: float = 0
+
+
+class BudgetConfig(BaseModel):
+    # limits for the whole run
+    run: BudgetLimits = BudgetLimits()
+
+    # limits applied to each node separately
+    node: BudgetLimits = BudgetLimits()
+
+
+class FakeLLMConfig(BaseModel):
+    """How the fake LLM backend behaves, see `adt_press.llm.fake`."""
+
+    # average seconds each request takes
+    latency: float = 0
+
+    # fraction of attempts that fail, failed attempts are retried up to the max_retries of the prompt
+    error_rate: float = 0
+
+    # changing the seed changes every response
+    seed: int = 0
+
+
 class TemplateConfig(BaseModel):
     output_dir: str
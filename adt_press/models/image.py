@@ -32,6 +32,12 @@ class ImageMeaningfulness(BaseModel):
     reasoning: str
 
 
+class ImageHeuristicScore(BaseModel):
+    image_id: str
+    score: float
+    reasoning: str
+
+
 class CropCoordinates(BaseModel):
     top_left_x: int
     top_left_y: int
@@ -45,6 +51,13 @@ class ImageCrop(BaseModel):
     image_path: str
 
 
+class ImageAnalysis(BaseModel):
+    image_id: str
+    meaningfulness: ImageMeaningfulness
+    caption: ImageCaption
+    crop_coordinates: CropCoordinates
+
+
 class PrunedImage(Image):
     failed_filters: list[ImageFilterFailure] = []
 
@@ -0,0 +1,44 @@
+from pydantic import BaseModel
+
+
+class NodePlan(BaseModel):
+    """Predicted LLM usage of a single node, see `adt_press.planner`."""
+
+    node_name: str
+
+    # name of the prompt the node renders, e.g. image_caption
+    prompt: str
+    model: str
+
+    # what the node issues one request for, e.g. page or meaningful_image
+    fanout: str
+    calls: int
+
+    # total over all calls
+    prompt_tokens: int
+    completion_tokens: int
+    audio_seconds: float = 0
+
+    # requests per minute the node is limited to
+    rate_limit: int
+    seconds: float
+
+    # in USD, None if the price of the model isn't known
+    cost: float | None = None
+
+
+class RunPlan(BaseModel):
+    pages: int
+
+    # pages that were extracted to make the estimate, counts are scaled up from these
+    sampled_pages: int
+
+    # estimates for the whole page range
+    images: int
+    words: int
+
+    nodes: list[NodePlan]
+
+    calls: int
+    seconds: float
+    cost: float | None = None
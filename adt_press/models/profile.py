@@ -0,0 +1,49 @@
+from pydantic import BaseModel
+
+
+class LLMCallStats(BaseModel):
+    """LLM requests made for a single prompt, e.g. image_caption, within a node."""
+
+    family: str
+    calls: int = 0
+
+    # calls answered from the response cache
+    cached: int = 0
+
+    # total time spent waiting on responses, summed over concurrent calls
+    seconds: float = 0
+
+
+class NodeProfile(BaseModel):
+    node_name: str
+    success: bool
+
+    # seconds since the start of the run
+    start: float
+    wall_seconds: float
+    cpu_seconds: float
+
+    # growth of the process' peak resident set size while the node ran
+    peak_rss_delta_bytes: int
+
+    # peak python allocations while the node ran, only recorded when profile_tracemalloc is set
+    tracemalloc_peak_bytes: int | None = None
+
+    # hit if the result was read from the cache, miss if the node was executed
+    cache: str = "miss"
+
+    # most tasks waiting on the node's rate or concurrency limit, and most in flight, at any one time
+    peak_queued: int = 0
+    peak_in_flight: int = 0
+
+    # why some of the node's LLM calls were skipped, if its budget ran out
+    budget_stop: str | None = None
+
+    llm_calls: list[LLMCallStats] = []
+
+
+class RunProfile(BaseModel):
+    run_id: str
+    started_at: float
+    wall_seconds: float
+    nodes: list[NodeProfile]
@@ -0,0 +1,40 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class Job(BaseModel):
+    """A single LLM request, queued by a pipeline run and executed by an adt-press worker."""
+
+    job_id: str
+
+    # either completion or speech
+    kind: str
+
+    # the backend the request is meant for, workers only execute jobs meant for their own backend
+    backend: str = "litellm"
+
+    # the prompt the request was rendered from, e.g. image_caption, so queues can be inspected per unit of work
+    family: str = ""
+
+    model: str
+    max_retries: int = 10
+
+    # import path of the response model for completions, e.g. adt_press.llm.image_caption:CaptionResponse
+    response_model: str = ""
+
+    messages: list[dict[str, Any]] = []
+    kwargs: dict[str, Any] = {}
+
+
+class JobUsage(BaseModel):
+    """What executing a job used, reported back by the worker so the queuing run counts it against its budget."""
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    attempts: int = 0
+    validation_errors: list[str] = []
+
+    # in USD, None if litellm doesn't know the price of the model
+    cost: float | None = None
@@ -0,0 +1,67 @@
+from pydantic import BaseModel
+
+
+class LLMCall(BaseModel):
+    """A single completion or speech request made through the gateway."""
+
+    node_name: str = ""
+
+    # name of the prompt, e.g. image_caption
+    family: str
+    model: str
+
+    # completion or speech
+    kind: str
+
+    # unix time the request was made
+    started_at: float
+    latency_seconds: float = 0
+
+    # whether the response was read from the response cache, using no tokens
+    cached: bool = False
+
+    # summed over all attempts, cached tokens are prompt tokens read from the provider's prompt cache
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+
+    # responses that fail validation are retried, each retry is another attempt
+    attempts: int = 0
+    validation_errors: list[str] = []
+
+    error: str | None = None
+
+    # in USD, None if litellm doesn't know the price of the model
+    cost: float | None = None
+
+
+class FamilyTelemetry(BaseModel):
+    """The calls made for a single prompt family during a run, latency percentiles are of the uncached calls."""
+
+    family: str
+    calls: int
+    cached: int
+    errors: int
+
+    p50_seconds: float
+    p95_seconds: float
+    p99_seconds: float
+
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+
+    # attempts beyond the first and the validation errors that caused them
+    retries: int
+    validation_errors: int
+
+    cost: float | None = None
+
+
+class RunTelemetry(BaseModel):
+    calls: int
+    families: list[FamilyTelemetry]
+
+    # of the families whose cost is known, None if none is
+    cost: float | None = None
+    unpriced_families: list[str] = []
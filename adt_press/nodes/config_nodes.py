@@ -5,6 +5,7 @@ from omegaconf import DictConfig
 from pydantic import BaseModel
 
 from adt_press.models.config import (
+    BatchPromptConfig,
     CropPromptConfig,
     HTMLPromptConfig,
     LayoutType,
@@ -104,8 +105,8 @@ def default_model_config(config: DictConfig) -> str:
 
 
 @cache(behavior="recompute")
-def caption_prompt_config(config: DictConfig) -> PromptConfig:
-    return PromptConfig.model_validate(prompt_config_with_model(config["prompts"]["caption"], config["default_model"]))
+def caption_prompt_config(config: DictConfig) -> BatchPromptConfig:
+    return BatchPromptConfig.model_validate(prompt_config_with_model(config["prompts"]["caption"], config["default_model"]))
 
 
 @cache(behavior="recompute")
@@ -114,8 +115,13 @@ def crop_prompt_config(config: DictConfig) -> CropPromptConfig:
 
 
 @cache(behavior="recompute")
-def meaningfulness_prompt_config(config: DictConfig) -> PromptConfig:
-    return PromptConfig.model_validate(prompt_config_with_model(config["prompts"]["meaningfulness"], config["default_model"]))
+def analysis_prompt_config(config: DictConfig) -> PromptConfig:
+    return PromptConfig.model_validate(prompt_config_with_model(config["prompts"]["analysis"], config["default_model"]))
+
+
+@cache(behavior="recompute")
+def meaningfulness_prompt_config(config: DictConfig) -> BatchPromptConfig:
+    return BatchPromptConfig.model_validate(prompt_config_with_model(config["prompts"]["meaningfulness"], config["default_model"]))
 
 
 @cache(behavior="recompute")
@@ -192,6 +198,9 @@ def strategy_config(config: DictConfig) -> dict[str, str]:
             "glossary_strategy": config["glossary_strategy"],
             "explanation_strategy": config["explanation_strategy"],
             "easy_read_strategy": config["easy_read_strategy"],
+            "dedup_strategy": config["dedup_strategy"],
+            "prefilter_strategy": config["prefilter_strategy"],
+            "image_analysis_strategy": config["image_analysis_strategy"],
         }
     )
 
@@ -213,6 +222,35 @@ def blank_image_filter_config(image_config: DictConfig) -> BlankImageFilterConfi
     return BlankImageFilterConfig.model_validate(image_config.get("blank", {}))
 
 
+class ImageDedupConfig(BaseModel):
+    max_distance: int = 4
+
+
+def image_dedup_config(image_config: DictConfig) -> ImageDedupConfig:
+    return ImageDedupConfig.model_validate(image_config.get("dedup", {}))
+
+
+class HeuristicImageFilterConfig(BaseModel):
+    prune_below: float = 0.25
+    accept_above: float = 0.8
+    strip_aspect: float = 4
+    repeated_on: int = 3
+
+
+def heuristic_image_filter_config(image_config: DictConfig) -> HeuristicImageFilterConfig:
+    return HeuristicImageFilterConfig.model_validate(image_config.get("heuristic", {}))
+
+
+class CVCropConfig(BaseModel):
+    tolerance: int = 16
+    padding: int = 4
+    min_confidence: float = 0.8
+
+
+def cv_crop_config(config: DictConfig) -> CVCropConfig:
+    return CVCropConfig.model_validate(config.get("cv_crop", {}))
+
+
 def pruned_text_types_config(config: DictConfig) -> list[str]:
     return list[str](config.get("text_filters", {}).get("pruned_text_types", []))
 
@@ -1,25 +1,46 @@
-from hamilton.function_modifiers import config
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
 
-from adt_press.llm.image_caption import get_image_caption
+from hamilton.function_modifiers import config, tag
+from pydantic import BaseModel
+
+from adt_press.llm.image_analysis import get_image_analysis
+from adt_press.llm.image_batch import image_batches
+from adt_press.llm.image_caption import get_image_caption, get_image_captions
 from adt_press.llm.image_crop import CropPromptConfig, get_image_crop_coordinates
-from adt_press.llm.image_meaningfulness import get_image_meaningfulness
-from adt_press.models.config import PromptConfig
+from adt_press.llm.image_meaningfulness import get_image_meaningfulness, get_images_meaningfulness
+from adt_press.models.config import BatchPromptConfig, PromptConfig
 from adt_press.models.image import (
     CropCoordinates,
     Image,
+    ImageAnalysis,
     ImageCaption,
     ImageCrop,
     ImageFilterFailure,
+    ImageHeuristicScore,
     ImageMeaningfulness,
     ProcessedImage,
     PrunedImage,
 )
-from adt_press.nodes.config_nodes import BlankImageFilterConfig, ImageSizeFilterConfig
+from adt_press.nodes.config_nodes import (
+    BlankImageFilterConfig,
+    CVCropConfig,
+    HeuristicImageFilterConfig,
+    ImageDedupConfig,
+    ImageSizeFilterConfig,
+)
+from adt_press.utils.budget import within_budget
+from adt_press.utils.cv_crop import content_crop
 from adt_press.utils.file import write_file
-from adt_press.utils.image import crop_image, image_bytes, is_blank_image
+from adt_press.utils.image import blank_images, crop_image, decoded_image, image_bytes
+from adt_press.utils.image_hash import near_duplicates, phashes
+from adt_press.utils.image_heuristics import heuristic_scores
 from adt_press.utils.pdf import Page
 from adt_press.utils.sync import gather_with_limit, run_async_task
 
+T = TypeVar("T", bound=BaseModel)
+
 
 def image_size_filter_failures(pdf_images: list[Image], image_size_filter_config: ImageSizeFilterConfig) -> dict[str, ImageFilterFailure]:
     failures = {}
@@ -43,31 +64,179 @@ def image_blank_filter_failures(
     pdf_images: list[Image], blank_image_filter_config: BlankImageFilterConfig
 ) -> dict[str, ImageFilterFailure]:
     failures = {}
-    for img in pdf_images:
-        img_bytes = image_bytes(img.image_path)
-        if is_blank_image(img_bytes, blank_image_filter_config.threshold):
+    blank = blank_images([img.image_path for img in pdf_images], blank_image_filter_config.threshold)
+    for img, is_blank in zip(pdf_images, blank):
+        if is_blank:
             failures[img.image_id] = ImageFilterFailure(image_id=img.image_id, filter="blank", reasoning="image is blank")
 
     return failures
 
 
-def image_meaningfulness(
-    meaningfulness_prompt_config: PromptConfig,
+@config.when(prefilter_strategy="heuristic")
+def image_heuristic_scores__heuristic(
+    pdf_images: list[Image],
+    image_blank_filter_failures: dict[str, ImageFilterFailure],
+    image_size_filter_failures: dict[str, ImageFilterFailure],
+    heuristic_image_filter_config: HeuristicImageFilterConfig,
+) -> dict[str, ImageHeuristicScore]:
+    images = [
+        img for img in pdf_images if img.image_id not in image_blank_filter_failures and img.image_id not in image_size_filter_failures
+    ]
+    scores = heuristic_scores(
+        [img.image_id for img in images],
+        [img.image_path for img in images],
+        [img.page_id for img in images],
+        heuristic_image_filter_config.strip_aspect,
+        heuristic_image_filter_config.repeated_on,
+    )
+    return {s.image_id: s for s in scores}
+
+
+@config.when(prefilter_strategy="none")
+def image_heuristic_scores__none(pdf_images: list[Image]) -> dict[str, ImageHeuristicScore]:
+    return {}
+
+
+def image_heuristic_filter_failures(
+    image_heuristic_scores: dict[str, ImageHeuristicScore], heuristic_image_filter_config: HeuristicImageFilterConfig
+) -> dict[str, ImageFilterFailure]:
+    return {
+        s.image_id: ImageFilterFailure(image_id=s.image_id, filter="heuristic", reasoning=f"score {s.score:.2f}: {s.reasoning}")
+        for s in image_heuristic_scores.values()
+        if s.score < heuristic_image_filter_config.prune_below
+    }
+
+
+@config.when(dedup_strategy="phash")
+def image_duplicates__phash(
+    pdf_images: list[Image],
+    image_blank_filter_failures: dict[str, ImageFilterFailure],
+    image_size_filter_failures: dict[str, ImageFilterFailure],
+    image_heuristic_filter_failures: dict[str, ImageFilterFailure],
+    image_dedup_config: ImageDedupConfig,
+) -> dict[str, str]:
+    # near duplicates of filtered images would be filtered themselves, so only the rest are hashed
+    filtered = {**image_blank_filter_failures, **image_size_filter_failures, **image_heuristic_filter_failures}
+    images = [img for img in pdf_images if img.image_id not in filtered]
+    hashes = phashes([img.image_path for img in images])
+    return near_duplicates([img.image_id for img in images], hashes, image_dedup_config.max_distance)
+
+
+@config.when(dedup_strategy="none")
+def image_duplicates__none(pdf_images: list[Image]) -> dict[str, str]:
+    return {}
+
+
+def shared_with_duplicates(results: dict[str, T], image_duplicates: dict[str, str]) -> dict[str, T]:
+    """Gives each near duplicate a copy of the result of the image it duplicates."""
+    shared = {
+        image_id: results[original_id].model_copy(update={"image_id": image_id})
+        for image_id, original_id in image_duplicates.items()
+        if original_id in results
+    }
+    return {**results, **shared}
+
+
+@tag(llm_fanout="image")
+@config.when(image_analysis_strategy="separate")
+def image_meaningfulness__separate(
+    meaningfulness_prompt_config: BatchPromptConfig,
     pdf_pages: list[Page],
     image_blank_filter_failures: dict[str, ImageFilterFailure],
     image_size_filter_failures: dict[str, ImageFilterFailure],
+    image_heuristic_filter_failures: dict[str, ImageFilterFailure],
+    image_heuristic_scores: dict[str, ImageHeuristicScore],
+    heuristic_image_filter_config: HeuristicImageFilterConfig,
+    image_duplicates: dict[str, str],
 ) -> dict[str, ImageMeaningfulness]:
+    accepted = heuristically_meaningful(image_heuristic_scores, heuristic_image_filter_config)
+    filtered = {**image_blank_filter_failures, **image_size_filter_failures, **image_heuristic_filter_failures}
+
+    async def batch_meaningfulness(page: Page, images: list[Image]) -> list[ImageMeaningfulness]:
+        if len(images) == 1:
+            return [await get_image_meaningfulness(meaningfulness_prompt_config, page, images[0])]
+        return await get_images_meaningfulness(meaningfulness_prompt_config, page, images)
+
+    batches = []
+    for page in pdf_pages:
+        # skip images that have already been filtered out or accepted, and near duplicates which share their original's result
+        images = [
+            image
+            for image in page.images
+            if image.image_id not in filtered and image.image_id not in accepted and image.image_id not in image_duplicates
+        ]
+        batches.extend((page, batch) for batch in image_batches(meaningfulness_prompt_config, images))
+
     async def generate_meaningfulness():
-        meaningfulness = []
-        for page in pdf_pages:
-            for image in page.images:
-                # skip images that have already been filtered out
-                if image.image_id not in image_blank_filter_failures and image.image_id not in image_size_filter_failures:
-                    meaningfulness.append(get_image_meaningfulness(meaningfulness_prompt_config, page, image))
+        meaningfulness = [within_budget(batch_meaningfulness(page, batch)) for page, batch in batches]
+        return await gather_with_limit(
+            meaningfulness, meaningfulness_prompt_config.rate_limit, meaningfulness_prompt_config.max_concurrency
+        )
+
+    results = {}
+    for (_, batch), meaningfulness in zip(batches, run_async_task(generate_meaningfulness)):
+        if meaningfulness is None:
+            meaningfulness = [unchecked_meaningfulness(image.image_id) for image in batch]
+        results.update({m.image_id: m for m in meaningfulness})
 
-        return await gather_with_limit(meaningfulness, meaningfulness_prompt_config.rate_limit)
+    return shared_with_duplicates({**results, **accepted}, image_duplicates)
 
-    return {m.image_id: m for m in run_async_task(generate_meaningfulness)}
+
+@config.when(image_analysis_strategy="combined")
+def image_meaningfulness__combined(
+    image_analyses: dict[str, ImageAnalysis | None],
+    image_heuristic_scores: dict[str, ImageHeuristicScore],
+    heuristic_image_filter_config: HeuristicImageFilterConfig,
+    image_duplicates: dict[str, str],
+) -> dict[str, ImageMeaningfulness]:
+    accepted = heuristically_meaningful(image_heuristic_scores, heuristic_image_filter_config)
+    results = {image_id: a.meaningfulness if a else unchecked_meaningfulness(image_id) for image_id, a in image_analyses.items()}
+    return shared_with_duplicates({**results, **accepted}, image_duplicates)
+
+
+def unchecked_meaningfulness(image_id: str) -> ImageMeaningfulness:
+    """Images the budget didn't allow checking are kept, as dropping a meaningful image is worse than keeping a decoration."""
+    return ImageMeaningfulness(image_id=image_id, is_meaningful=True, reasoning="not checked, the LLM budget was reached")
+
+
+def heuristically_meaningful(
+    image_heuristic_scores: dict[str, ImageHeuristicScore], heuristic_image_filter_config: HeuristicImageFilterConfig
+) -> dict[str, ImageMeaningfulness]:
+    """Images scoring high enough locally are meaningful without asking the LLM."""
+    return {
+        s.image_id: ImageMeaningfulness(image_id=s.image_id, is_meaningful=True, reasoning=f"heuristic score {s.score:.2f}: {s.reasoning}")
+        for s in image_heuristic_scores.values()
+        if s.score >= heuristic_image_filter_config.accept_above
+    }
+
+
+@tag(llm_fanout="image")
+@config.when(image_analysis_strategy="combined")
+def image_analyses(
+    plate_language_config: str,
+    analysis_prompt_config: PromptConfig,
+    pdf_pages: list[Page],
+    image_blank_filter_failures: dict[str, ImageFilterFailure],
+    image_size_filter_failures: dict[str, ImageFilterFailure],
+    image_heuristic_filter_failures: dict[str, ImageFilterFailure],
+    image_duplicates: dict[str, str],
+) -> dict[str, ImageAnalysis | None]:
+    filtered = {**image_blank_filter_failures, **image_size_filter_failures, **image_heuristic_filter_failures}
+
+    # images are analysed before we know if they are meaningful, so their captions and crops may go unused
+    images = [
+        (page, image)
+        for page in pdf_pages
+        for image in page.images
+        if image.image_id not in filtered and image.image_id not in image_duplicates
+    ]
+
+    async def generate_analyses():
+        analyses = [within_budget(get_image_analysis(analysis_prompt_config, page, image, plate_language_config)) for page, image in images]
+        return await gather_with_limit(analyses, analysis_prompt_config.rate_limit, analysis_prompt_config.max_concurrency)
+
+    # images the budget didn't allow analysing are None, they are kept without a caption or crop
+    return {image.image_id: a for (_, image), a in zip(images, run_async_task(generate_analyses))}
 
 
 def image_meaningfulness_failures(image_meaningfulness: dict[str, ImageMeaningfulness]) -> dict[str, ImageFilterFailure]:
@@ -89,6 +258,7 @@ def pruned_images(
     pdf_images: list[Image],
     image_size_filter_failures: dict[str, ImageFilterFailure],
     image_blank_filter_failures: dict[str, ImageFilterFailure],
+    image_heuristic_filter_failures: dict[str, ImageFilterFailure],
     image_meaningfulness_failures: dict[str, ImageFilterFailure],
 ) -> list[PrunedImage]:
     pruned_images = []
@@ -98,6 +268,8 @@ def pruned_images(
             failed_filters.append(image_size_filter_failures[img.image_id])
         if img.image_id in image_blank_filter_failures:
             failed_filters.append(image_blank_filter_failures[img.image_id])
+        if img.image_id in image_heuristic_filter_failures:
+            failed_filters.append(image_heuristic_filter_failures[img.image_id])
         if img.image_id in image_meaningfulness_failures:  # pragma: no cover
             failed_filters.append(image_meaningfulness_failures[img.image_id])
 
@@ -115,20 +287,47 @@ def filtered_images(pdf_images: list[Image], pruned_image_ids: set[str]) -> list
     return [img for img in pdf_images if img.image_id not in pruned_image_ids]
 
 
-@config.when(caption_strategy="llm")
+@tag(llm_fanout="meaningful_image")
+@config.when(caption_strategy="llm", image_analysis_strategy="separate")
 def image_captions_by_id__llm(
-    plate_language_config: str, caption_prompt_config: PromptConfig, pdf_pages: list[Page], pruned_image_ids: set[str]
+    plate_language_config: str,
+    caption_prompt_config: BatchPromptConfig,
+    pdf_pages: list[Page],
+    pruned_image_ids: set[str],
+    image_duplicates: dict[str, str],
 ) -> dict[str, ImageCaption]:
+    async def batch_captions(page: Page, images: list[Image]) -> list[ImageCaption]:
+        if len(images) == 1:
+            return [await get_image_caption(caption_prompt_config, page, images[0], plate_language_config)]
+        return await get_image_captions(caption_prompt_config, page, images, plate_language_config)
+
     async def generate_captions():
         captions = []
         for page in pdf_pages:
-            for image in page.images:
-                if image.image_id not in pruned_image_ids:
-                    captions.append(get_image_caption(caption_prompt_config, page, image, plate_language_config))
+            images = [image for image in page.images if image.image_id not in pruned_image_ids and image.image_id not in image_duplicates]
+            for batch in image_batches(caption_prompt_config, images):
+                captions.append(within_budget(batch_captions(page, batch)))
+
+        return await gather_with_limit(captions, caption_prompt_config.rate_limit, caption_prompt_config.max_concurrency)
 
-        return await gather_with_limit(captions, caption_prompt_config.rate_limit)
+    # images the budget didn't allow captioning are left without a caption, as if captions were disabled
+    captions = {c.image_id: c for batch in run_async_task(generate_captions) if batch for c in batch}
+    captions = shared_with_duplicates(captions, image_duplicates)
+    return {**image_captions_by_id__none(plate_language_config, caption_prompt_config, pdf_pages, pruned_image_ids), **captions}
 
-    return {c.image_id: c for c in run_async_task(generate_captions)}
+
+@config.when(caption_strategy="llm", image_analysis_strategy="combined")
+def image_captions_by_id__combined(
+    plate_language_config: str,
+    caption_prompt_config: PromptConfig,
+    pdf_pages: list[Page],
+    pruned_image_ids: set[str],
+    image_analyses: dict[str, ImageAnalysis | None],
+    image_duplicates: dict[str, str],
+) -> dict[str, ImageCaption]:
+    captions = shared_with_duplicates({a.image_id: a.caption for a in image_analyses.values() if a}, image_duplicates)
+    captions = {image_id: c for image_id, c in captions.items() if image_id not in pruned_image_ids}
+    return {**image_captions_by_id__none(plate_language_config, caption_prompt_config, pdf_pages, pruned_image_ids), **captions}
 
 
 @config.when(caption_strategy="none")
@@ -158,33 +357,136 @@ def image_crops__none(pdf_pages: list[Page], pruned_image_ids: set[str]) -> dict
     }
 
 
-@config.when(crop_strategy="llm")
-def image_crops__llm(crop_prompt_config: CropPromptConfig, pdf_pages: list[Page], pruned_image_ids: set[str]) -> dict[str, ImageCrop]:
+@tag(llm_fanout="meaningful_image")
+@config.when(crop_strategy="llm", image_analysis_strategy="separate")
+def image_crops__llm(
+    crop_prompt_config: CropPromptConfig, pdf_pages: list[Page], pruned_image_ids: set[str], image_duplicates: dict[str, str]
+) -> dict[str, ImageCrop]:
     async def generate_crop(page: Page, img: Image) -> ImageCrop:
         coord = await get_image_crop_coordinates(crop_prompt_config, page, img)
-
-        # create a cropped version of the image
-        cropped = crop_image(image_bytes(img.image_path), coord)
-
-        # add the coordinates to the image path so that we don't cache different crops of the same image
-        cropped_path = write_file(
-            img.image_path,
-            cropped,
-            f"cropped_{coord.top_left_x}_{coord.top_left_y}_{coord.bottom_right_x}_{coord.bottom_right_y}",
-        )
-
-        return ImageCrop(image_id=img.image_id, crop_coordinates=coord, image_path=str(cropped_path))
+        return await asyncio.to_thread(cropped_image, img, coord)
 
     async def generate_crops():
         crops = []
         for page in pdf_pages:
             for img in page.images:
-                if img.image_id not in pruned_image_ids:
-                    crops.append(generate_crop(page, img))
+                if img.image_id not in pruned_image_ids and img.image_id not in image_duplicates:
+                    crops.append(within_budget(generate_crop(page, img)))
+
+        return await gather_with_limit(crops, crop_prompt_config.rate_limit, crop_prompt_config.max_concurrency)
+
+    # images the budget didn't allow cropping are used whole, as if cropping was disabled
+    crops = {c.image_id: c for c in run_async_task(generate_crops) if c}
+    return crops_with_duplicates(crops, pdf_pages, pruned_image_ids, image_duplicates)
+
+
+@config.when(crop_strategy="llm", image_analysis_strategy="combined")
+def image_crops__combined(
+    pdf_pages: list[Page], pruned_image_ids: set[str], image_analyses: dict[str, ImageAnalysis | None], image_duplicates: dict[str, str]
+) -> dict[str, ImageCrop]:
+    images_by_id = {img.image_id: img for page in pdf_pages for img in page.images}
+    analyses = [a for a in image_analyses.values() if a and a.image_id not in pruned_image_ids]
+    with ThreadPoolExecutor() as executor:
+        crops = executor.map(lambda a: cropped_image(images_by_id[a.image_id], a.crop_coordinates), analyses)
+        return crops_with_duplicates({c.image_id: c for c in crops}, pdf_pages, pruned_image_ids, image_duplicates)
+
+
+@config.when(crop_strategy="cv")
+def image_crops__cv(pdf_pages: list[Page], pruned_image_ids: set[str], cv_crop_config: CVCropConfig) -> dict[str, ImageCrop]:
+    def crop(img: Image) -> ImageCrop:
+        coord, _ = content_crop(image_bytes(img.image_path), cv_crop_config.tolerance, cv_crop_config.padding)
+        return cropped_image(img, coord)
+
+    # cv2 releases the GIL, so images are cropped on a thread pool
+    images = [img for page in pdf_pages for img in page.images if img.image_id not in pruned_image_ids]
+    with ThreadPoolExecutor() as executor:
+        return {c.image_id: c for c in executor.map(crop, images)}
+
+
+@tag(llm_fanout="meaningful_image")
+@config.when(crop_strategy="hybrid")
+def image_crops__hybrid(
+    crop_prompt_config: CropPromptConfig,
+    pdf_pages: list[Page],
+    pruned_image_ids: set[str],
+    image_duplicates: dict[str, str],
+    cv_crop_config: CVCropConfig,
+) -> dict[str, ImageCrop]:
+    images = [
+        (page, img)
+        for page in pdf_pages
+        for img in page.images
+        if img.image_id not in pruned_image_ids and img.image_id not in image_duplicates
+    ]
+
+    def propose(img: Image) -> tuple[CropCoordinates, ImageCrop | None]:
+        coord, confidence = content_crop(image_bytes(img.image_path), cv_crop_config.tolerance, cv_crop_config.padding)
+        return coord, cropped_image(img, coord) if confidence >= cv_crop_config.min_confidence else None
+
+    # crops are proposed locally first, on a thread pool as cv2 releases the GIL
+    with ThreadPoolExecutor() as executor:
+        proposals = list(executor.map(propose, [img for _, img in images]))
+
+    crops = {}
+    uncertain = []
+    for (page, img), (coord, crop) in zip(images, proposals):
+        if crop:
+            crops[img.image_id] = crop
+        else:
+            uncertain.append((page, img, coord))
+
+    # only the proposals we aren't confident in are corrected by the LLM, starting from the proposal
+    async def refine_crop(page: Page, img: Image, coord: CropCoordinates) -> ImageCrop:
+        refined = await get_image_crop_coordinates(crop_prompt_config, page, img, initial=coord)
+        return await asyncio.to_thread(cropped_image, img, refined)
+
+    async def refine_crops():
+        refined = [within_budget(refine_crop(page, img, coord)) for page, img, coord in uncertain]
+        return await gather_with_limit(refined, crop_prompt_config.rate_limit, crop_prompt_config.max_concurrency)
+
+    # images the budget didn't allow refining keep their proposal
+    for (_, img, coord), crop in zip(uncertain, run_async_task(refine_crops)):
+        crops[img.image_id] = crop or cropped_image(img, coord)
+
+    return crops_with_duplicates(crops, pdf_pages, pruned_image_ids, image_duplicates)
+
+
+def crops_with_duplicates(
+    crops: dict[str, ImageCrop], pdf_pages: list[Page], pruned_image_ids: set[str], image_duplicates: dict[str, str]
+) -> dict[str, ImageCrop]:
+    """Adds the crops of near duplicates, and the whole image for any other image left without a crop."""
+
+    # near duplicates are cropped at the same place as the image they duplicate, scaled to their size
+    crops = dict(crops)
+    images_by_id = {img.image_id: img for page in pdf_pages for img in page.images}
+    for image_id, original_id in image_duplicates.items():
+        if image_id not in pruned_image_ids and original_id in crops:
+            img, original = images_by_id[image_id], images_by_id[original_id]
+            coord = crops[original_id].crop_coordinates
+            scale_x, scale_y = img.width / original.width, img.height / original.height
+            scaled = CropCoordinates(
+                top_left_x=round(coord.top_left_x * scale_x),
+                top_left_y=round(coord.top_left_y * scale_y),
+                bottom_right_x=round(coord.bottom_right_x * scale_x),
+                bottom_right_y=round(coord.bottom_right_y * scale_y),
+            )
+            crops[image_id] = cropped_image(img, scaled)
+
+    return {**image_crops__none(pdf_pages, pruned_image_ids), **crops}
+
+
+def cropped_image(img: Image, coord: CropCoordinates) -> ImageCrop:
+    """Writes the crop of the image next to it."""
+    cropped = crop_image(decoded_image(img.image_path), coord)
 
-        return await gather_with_limit(crops, crop_prompt_config.rate_limit)
+    # add the coordinates to the image path so that we don't cache different crops of the same image
+    cropped_path = write_file(
+        img.image_path,
+        cropped,
+        f"cropped_{coord.top_left_x}_{coord.top_left_y}_{coord.bottom_right_x}_{coord.bottom_right_y}",
+    )
 
-    return {c.image_id: c for c in run_async_task(generate_crops)}
+    return ImageCrop(image_id=img.image_id, crop_coordinates=coord, image_path=str(cropped_path))
 
 
 def processed_images_by_page(pdf_pages: list[Page], processed_images: list[ProcessedImage]) -> dict[str, list[ProcessedImage]]:
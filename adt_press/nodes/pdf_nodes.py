@@ -1,4 +1,4 @@
-from hamilton.function_modifiers import config
+from hamilton.function_modifiers import config, tag
 
 from adt_press.llm.text_easy_read import get_text_easy_read
 from adt_press.llm.text_extraction import get_page_text
@@ -7,6 +7,7 @@ from adt_press.models.image import Image
 from adt_press.models.pdf import Page
 from adt_press.models.text import EasyReadText, PageText, PageTextGroup, PageTexts
 from adt_press.nodes.config_nodes import PageRangeConfig
+from adt_press.utils.budget import within_budget
 from adt_press.utils.pdf import pages_for_pdf
 from adt_press.utils.sync import gather_with_limit, run_async_task
 
@@ -22,6 +23,7 @@ def pdf_images(pdf_pages: list[Page]) -> list[Image]:
     return pdf_images
 
 
+@tag(llm_fanout="page")
 def pdf_texts(
     run_output_dir_config: str,
     pdf_pages: list[Page],
@@ -32,12 +34,13 @@ def pdf_texts(
         for page in pdf_pages:
             text.append(get_page_text(run_output_dir_config, f"page_{page.page_id}", text_extraction_prompt_config, page))
 
-        return await gather_with_limit(text, text_extraction_prompt_config.rate_limit)
+        return await gather_with_limit(text, text_extraction_prompt_config.rate_limit, text_extraction_prompt_config.max_concurrency)
 
     texts = {pt.page_id: pt for pt in run_async_task(extract_text)}
     return texts
 
 
+@tag(llm_fanout="text")
 @config.when(easy_read_strategy="llm")
 def easy_reads_by_text_id__llm(
     input_language_config: str,
@@ -49,12 +52,13 @@ def easy_reads_by_text_id__llm(
         for page_texts in processed_pdf_texts.values():
             for group in page_texts.groups:
                 for text in group.texts:
-                    tasks.append(get_text_easy_read(input_language_config, text_easy_read_prompt_config, text))
+                    tasks.append(within_budget(get_text_easy_read(input_language_config, text_easy_read_prompt_config, text)))
 
-        return await gather_with_limit(tasks, text_easy_read_prompt_config.rate_limit)
+        return await gather_with_limit(tasks, text_easy_read_prompt_config.rate_limit, text_easy_read_prompt_config.max_concurrency)
 
+    # texts the budget didn't allow are left without an easy read
     results = run_async_task(get_easy_reads)
-    return {easy_read.text_id: easy_read for easy_read in results}
+    return {easy_read.text_id: easy_read for easy_read in results if easy_read}
 
 
 @config.when(easy_read_strategy="none")
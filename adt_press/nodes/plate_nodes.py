@@ -1,6 +1,6 @@
 import json
 
-from hamilton.function_modifiers import cache
+from hamilton.function_modifiers import cache, tag
 
 from adt_press.llm.glossary_translation import get_glossary_translation
 from adt_press.llm.text_translation import get_text_translation
@@ -110,6 +110,7 @@ def plate_glossary(
     return list(sorted(glossary_items.values(), key=lambda x: x.word))
 
 
+@tag(llm_fanout="translated_glossary_item")
 def plate_glossary_translations(
     glossary_translation_prompt_config: PromptConfig,
     plate_language_config: str,
@@ -131,7 +132,9 @@ def plate_glossary_translations(
                     )
                 )
 
-            return await gather_with_limit(tasks, glossary_translation_prompt_config.rate_limit)
+            return await gather_with_limit(
+                tasks, glossary_translation_prompt_config.rate_limit, glossary_translation_prompt_config.max_concurrency
+            )
 
         return translate_glossary
 
@@ -153,6 +156,7 @@ def plate_groups(processed_pdf_texts: dict[str, PageTexts]) -> list[PlateGroup]:
     return groups
 
 
+@tag(llm_fanout="output_text")
 def plate_output_texts_by_id(
     text_translation_prompt_config: PromptConfig,
     processed_pdf_texts: dict[str, PageTexts],
@@ -210,12 +214,13 @@ def plate_output_texts_by_id(
             )
             for text_id, text_type, text_content in texts_to_process
         ]
-        return await gather_with_limit(tasks, text_translation_prompt_config.rate_limit)
+        return await gather_with_limit(tasks, text_translation_prompt_config.rate_limit, text_translation_prompt_config.max_concurrency)
 
     texts = run_async_task(translate_texts)
     return {t.text_id: t for t in texts}
 
 
+@tag(llm_fanout="translated_text")
 def plate_translations(
     text_translation_prompt_config: PromptConfig,
     plate_language_config: str,
@@ -244,7 +249,7 @@ def plate_translations(
                     )
                 )
 
-        return await gather_with_limit(tasks, text_translation_prompt_config.rate_limit)
+        return await gather_with_limit(tasks, text_translation_prompt_config.rate_limit, text_translation_prompt_config.max_concurrency)
 
     texts = run_async_task(translate_texts)
     for text in texts:
@@ -1,4 +1,4 @@
-from hamilton.function_modifiers import config
+from hamilton.function_modifiers import config, tag
 
 from adt_press.llm.page_sectioning import get_page_sections
 from adt_press.llm.section_explanations import get_section_explanation
@@ -9,9 +9,11 @@ from adt_press.models.image import ProcessedImage
 from adt_press.models.pdf import Page
 from adt_press.models.section import PageSection, PageSections, SectionExplanation, SectionGlossary, SectionMetadata
 from adt_press.models.text import PageText, PageTextGroup, PageTexts
+from adt_press.utils.budget import within_budget
 from adt_press.utils.sync import gather_with_limit, run_async_task
 
 
+@tag(llm_fanout="content_page")
 def sections_by_page_id(
     pdf_pages: list[Page],
     processed_images_by_page: dict[str, list[ProcessedImage]],
@@ -32,7 +34,7 @@ def sections_by_page_id(
             else:
                 sections.append(get_page_sections(page_sectioning_prompt_config, page, page_images, page_texts.groups))
 
-        return await gather_with_limit(sections, page_sectioning_prompt_config.rate_limit)
+        return await gather_with_limit(sections, page_sectioning_prompt_config.rate_limit, page_sectioning_prompt_config.max_concurrency)
 
     sections = run_async_task(section_pages)
     for p in sections:
@@ -61,6 +63,7 @@ def filtered_sections_by_page_id(
     return filtered_sections
 
 
+@tag(llm_fanout="section")
 def section_metadata_by_id(
     section_metadata_prompt_config: PromptConfig,
     layout_types_config: dict[str, LayoutType],
@@ -76,12 +79,13 @@ def section_metadata_by_id(
                 texts = [processed_pdf_texts_by_id[part_id].text for part_id in section.part_ids if part_id.startswith("txt_")]
                 tasks.append(get_section_metadata(section_metadata_prompt_config, layout_types_config, page, section, texts))
 
-        return await gather_with_limit(tasks, section_metadata_prompt_config.rate_limit)
+        return await gather_with_limit(tasks, section_metadata_prompt_config.rate_limit, section_metadata_prompt_config.max_concurrency)
 
     results = run_async_task(get_metadata)
     return {metadata.section_id: metadata for metadata in results}
 
 
+@tag(llm_fanout="section")
 @config.when(explanation_strategy="llm")
 def explanations_by_section_id__llm(
     plate_language_config: str,
@@ -106,15 +110,21 @@ def explanations_by_section_id__llm(
                     images.extend([image] if image else [])
 
                 explanations.append(
-                    get_section_explanation(section_explanation_prompt_config, page, section, texts, images, plate_language_config)
+                    within_budget(
+                        get_section_explanation(section_explanation_prompt_config, page, section, texts, images, plate_language_config)
+                    )
                 )
 
-        return await gather_with_limit(explanations, section_explanation_prompt_config.rate_limit)
+        return await gather_with_limit(
+            explanations, section_explanation_prompt_config.rate_limit, section_explanation_prompt_config.max_concurrency
+        )
 
+    # sections the budget didn't allow are left without an explanation
     explanations: dict[str, SectionExplanation] = {}
     results = run_async_task(explain_sections)
     for explanation in results:
-        explanations[explanation.section_id] = explanation
+        if explanation:
+            explanations[explanation.section_id] = explanation
 
     return explanations
 
@@ -131,6 +141,7 @@ def explanations_by_section_id__none(
     return {}
 
 
+@tag(llm_fanout="section")
 @config.when(glossary_strategy="llm")
 def section_glossaries_by_id__llm(
     plate_language_config: str,
@@ -147,12 +158,13 @@ def section_glossaries_by_id__llm(
                     if part_id.startswith("grp_"):
                         group = pdf_text_groups_by_id[part_id]
                         texts.extend([t.text for t in group.texts])
-                tasks.append(get_section_glossary(plate_language_config, section_glossary_prompt_config, section, texts))
+                tasks.append(within_budget(get_section_glossary(plate_language_config, section_glossary_prompt_config, section, texts)))
 
-        return await gather_with_limit(tasks, section_glossary_prompt_config.rate_limit)
+        return await gather_with_limit(tasks, section_glossary_prompt_config.rate_limit, section_glossary_prompt_config.max_concurrency)
 
+    # sections the budget didn't allow are left without a glossary
     results = run_async_task(get_glossaries)
-    return {glossary.section_id: glossary for glossary in results}
+    return {glossary.section_id: glossary for glossary in results if glossary}
 
 
 @config.when(glossary_strategy="none")
@@ -1,4 +1,4 @@
-from hamilton.function_modifiers import config
+from hamilton.function_modifiers import config, tag
 
 from adt_press.llm.speech_generation import generate_speech_file
 from adt_press.models.config import PromptConfig
@@ -6,6 +6,7 @@ from adt_press.models.speech import SpeechFile
 from adt_press.utils.sync import gather_with_limit, run_async_task
 
 
+@tag(llm_fanout="spoken_text")
 @config.when(speech_strategy="tts")
 def speech_files__tts(
     run_output_dir_config: str, speech_prompt_config: PromptConfig, plate_translations: dict[str, dict[str, str]]
@@ -16,7 +17,7 @@ def speech_files__tts(
             for text_id, text in texts.items():
                 tts.append(generate_speech_file(run_output_dir_config, speech_prompt_config, language, text_id, text))
 
-        return await gather_with_limit(tts, speech_prompt_config.rate_limit)
+        return await gather_with_limit(tts, speech_prompt_config.rate_limit, speech_prompt_config.max_concurrency)
 
     lang_to_tts = {lang: dict[str, SpeechFile]() for lang in plate_translations.keys()}
     files = run_async_task(generate_speech_files)
@@ -1,24 +1,34 @@
+import asyncio
 import json
 import os
 import shutil
 from typing import Any
 
-from hamilton.function_modifiers import cache
+from hamilton.function_modifiers import cache, tag
 
 from adt_press.llm.web_generation_html import generate_web_page_html
 from adt_press.llm.web_generation_rows import generate_web_page_rows
 from adt_press.llm.web_generation_template import generate_web_page_template
 from adt_press.llm.web_generation_two_column import generate_web_page_two_column
-from adt_press.models.config import HTMLPromptConfig, LayoutType, RenderPromptConfig, RenderStrategy, TemplateConfig, TemplateRenderConfig
+from adt_press.models.config import (
+    HTMLPromptConfig,
+    LayoutType,
+    PromptConfig,
+    RenderPromptConfig,
+    RenderStrategy,
+    TemplateConfig,
+    TemplateRenderConfig,
+)
 from adt_press.models.plate import Plate, PlateImage, PlateText
 from adt_press.models.section import GlossaryItem
 from adt_press.models.speech import SpeechFile
 from adt_press.models.web import RenderTextGroup, WebPage
 from adt_press.utils.html import render_template, replace_images, replace_texts
-from adt_press.utils.sync import gather_with_limit, run_async_task
+from adt_press.utils.sync import TaskLimiter, run_async_task
 from adt_press.utils.web_assets import build_web_assets
 
 
+@tag(llm_fanout="web_page")
 def web_pages(
     plate_language_config: str,
     plate: Plate,
@@ -35,6 +45,7 @@ def web_pages(
 
     async def generate_pages():
         web_pages = []
+        limiters: dict[str, TaskLimiter] = {}
         for section in plate.sections:
             texts: list[PlateText] = []
             images: list[PlateImage] = []
@@ -83,17 +94,22 @@ def web_pages(
                 cached_configs[strategy_name] = config
 
             if strategy.render_type == "html":
-                web_pages.append(
-                    generate_web_page_html(strategy_name, config, config.examples, section, groups, texts, images, plate_language_config)
-                )
+                page = generate_web_page_html(strategy_name, config, config.examples, section, groups, texts, images, plate_language_config)
             elif strategy.render_type == "rows":
-                web_pages.append(generate_web_page_rows(strategy_name, config, section, groups, texts, images, plate_language_config))
+                page = generate_web_page_rows(strategy_name, config, section, groups, texts, images, plate_language_config)
             elif strategy.render_type == "two_column":
-                web_pages.append(generate_web_page_two_column(strategy_name, config, section, groups, texts, images, plate_language_config))
+                page = generate_web_page_two_column(strategy_name, config, section, groups, texts, images, plate_language_config)
             elif strategy.render_type == "template":
-                web_pages.append(generate_web_page_template(strategy_name, config, section, groups, texts, images, plate_language_config))
+                page = generate_web_page_template(strategy_name, config, section, groups, texts, images, plate_language_config)
 
-        return await gather_with_limit(web_pages, 300)
+            # each strategy has its own limits, long html generations need far fewer requests in flight than short ones
+            if isinstance(config, PromptConfig) and strategy_name not in limiters:
+                limiters[strategy_name] = TaskLimiter(config.rate_limit, config.max_concurrency)
+
+            limiter = limiters.get(strategy_name)
+            web_pages.append(limiter.run(page) if limiter else page)
+
+        return await asyncio.gather(*web_pages)
 
     pages: list[WebPage] = run_async_task(generate_pages)
 
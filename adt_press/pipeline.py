@@ -1,14 +1,38 @@
 import os
-import shutil
+import resource
+import sys
+import time
+import tracemalloc
 from typing import Any, Dict
 
-import litellm
 import structlog
 from hamilton import driver, registry, telemetry
+from hamilton.caching.adapter import CachingEventType
 from hamilton.lifecycle import NodeExecutionHook
 from omegaconf import DictConfig
 
+from adt_press.llm.gateway import (
+    budget_stops,
+    call_stats,
+    configure_backend,
+    configure_queue,
+    configure_response_cache,
+    recorded_calls,
+    reset_call_stats,
+)
+from adt_press.models.config import BudgetConfig, CacheConfig, FakeLLMConfig, TemplateConfig
+from adt_press.models.profile import NodeProfile, RunProfile
+from adt_press.models.section import GlossaryItem
+from adt_press.models.telemetry import LLMCall
 from adt_press.nodes import config_nodes, image_nodes, pdf_nodes, plate_nodes, report_nodes, section_nodes, speech_nodes, web_nodes
+from adt_press.utils.budget import Budget
+from adt_press.utils.cache import collect_garbage, record_run
+from adt_press.utils.cache_store import FsspecMetadataStore, FsspecResultStore, is_url, remove_cache
+from adt_press.utils.file import configure_hash_memo, write_text_file
+from adt_press.utils.html import render_template
+from adt_press.utils.logging import summarize_value
+from adt_press.utils.sync import peak_gauges, reset_gauges
+from adt_press.utils.telemetry import summarize_calls
 
 registry.disable_autoload()
 telemetry.disable_telemetry()
@@ -27,8 +51,32 @@ modules = [
     speech_nodes,
 ]
 
+# nodes executed by a run, in order, so reports are generated even if later steps fail
+pipeline_nodes = ["report_pages", "plate_report", "glossary_report", "web_report", "report_index"]
+
+# nodes executed by each shard of a book, translations, speech, web pages and packaging run once over the merged plate
+shard_nodes = ["report_pages", "plate_report"]
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # linux reports kilobytes, macos bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
 
 class NodeHook(NodeExecutionHook):
+    """Logs each node as it runs, profiles its time and memory and collects its LLM calls, limiting them to budget."""
+
+    def __init__(self, trace_memory: bool = False, log_full_results: bool = False, budget: Budget | None = None) -> None:
+        self.trace_memory = trace_memory
+        self.log_full_results = log_full_results
+        self.budget = budget
+        self.started_at = time.time()
+        self.nodes: list[NodeProfile] = []
+        self.llm_calls: list[LLMCall] = []
+        self._node_start: dict[str, tuple[float, float, int]] = {}
+
     def run_before_node_execution(
         self,
         *,
@@ -43,6 +91,15 @@ class NodeHook(NodeExecutionHook):
     ):
         log.info("node evaluating", node=node_name)
 
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+        reset_call_stats(self.budget)
+        reset_gauges()
+        self._node_start[node_name] = (time.time(), time.thread_time(), peak_rss_bytes())
+
     def run_after_node_execution(
         self,
         *,
@@ -57,40 +114,201 @@ class NodeHook(NodeExecutionHook):
         run_id: str,
         **future_kwargs: Any,
     ):
-        log.info("node result", node=node_name, success=success, result=result, error=error)
+        # results can be huge, e.g. every page of a book, so by default we only log a summary of them
+        summary = result if self.log_full_results else summarize_value(result)
+        log.info("node result", node=node_name, success=success, result=summary, error=error)
+
+        calls = recorded_calls()
+        for call in calls:
+            call.node_name = node_name
+        self.llm_calls.extend(calls)
+
+        stopped, reason = budget_stops()
+        if stopped:
+            log.warning("node over budget", node=node_name, skipped_calls=stopped, reason=reason)
+
+        start, cpu_start, rss_start = self._node_start.pop(node_name)
+        peak_queued, peak_in_flight = peak_gauges()
+        self.nodes.append(
+            NodeProfile(
+                node_name=node_name,
+                success=success,
+                start=start - self.started_at,
+                wall_seconds=time.time() - start,
+                cpu_seconds=time.thread_time() - cpu_start,
+                peak_rss_delta_bytes=peak_rss_bytes() - rss_start,
+                tracemalloc_peak_bytes=tracemalloc.get_traced_memory()[1] if self.trace_memory else None,
+                peak_queued=peak_queued,
+                peak_in_flight=peak_in_flight,
+                llm_calls=call_stats(),
+                budget_stop=f"{stopped} LLM calls skipped, {reason}" if stopped else None,
+            )
+        )
+
+    def profile(self, dr: driver.Driver) -> RunProfile:
+        """Returns the profile of the run, marking the nodes whose results were read from the cache."""
+        run_id = dr.cache.last_run_id
+        logs = dr.cache.logs(run_id)
+        for node in self.nodes:
+            events = logs.get(node.node_name, [])
+            if any(e.event_type == CachingEventType.GET_RESULT and e.msg == "hit" for e in events):
+                node.cache = "hit"
+
+        return RunProfile(run_id=run_id, started_at=self.started_at, wall_seconds=time.time() - self.started_at, nodes=self.nodes)
+
+
+def cache_dir(config: DictConfig) -> str:
+    path = str(config.get("cache", {}).get("dir", "") or os.path.join(config["run_output_dir"], "cache"))
+
+    # results made from fake responses are kept apart, so real runs never reuse them
+    if config.get("llm_backend", "litellm") == "fake":
+        return f"{path}/fake"
+    return path
+
+
+def node_hook(config: DictConfig) -> NodeHook:
+    budget_config = BudgetConfig.model_validate(config.get("budget", {}))
+    return NodeHook(
+        trace_memory=config.get("profile_tracemalloc", False),
+        log_full_results=config.get("debug_log_results", False),
+        budget=Budget(budget_config) if budget_config != BudgetConfig() else None,
+    )
+
+
+def driver_config(config: DictConfig) -> dict[str, Any]:
+    # we pass through all strategies as configs to the driver
+    return {key: value for key, value in config.items() if str(key).endswith("_strategy")}
+
+
+def configure_process(config: DictConfig) -> None:
+    """Configures the process wide LLM gateway and file hash memo for a run."""
+    # LLM responses are cached next to our results, their keys only depend on the request so they can be shared, a run
+    # without them must not keep using those of a previous run in this process
+    responses = CacheConfig.model_validate(config.get("cache", {})).responses
+    configure_response_cache(f"{cache_dir(config)}/responses" if responses else None)
+
+    # remember file hashes across runs so unchanged pdfs and templates aren't read again
+    configure_hash_memo(os.path.join(config["run_output_dir"], "file_hashes.db"))
+
+    # requests are either executed here or by workers reading from the queue
+    configure_queue(str(config.get("queue_dir", "")), float(config.get("queue_timeout", 3600)))
+    configure_backend(str(config.get("llm_backend", "litellm")), FakeLLMConfig.model_validate(config.get("fake_llm", {})))
 
 
-def run_pipeline(config: DictConfig) -> None:
-    cache_path = os.path.join(config["run_output_dir"], "cache")
+def build_driver(config: DictConfig, hook: NodeHook, shared_gateway: bool = False) -> driver.Driver:
+    """
+    Builds the driver for a run. Unless shared_gateway is set, e.g. by a batch that configured the gateway once for all
+    of its books, the process wide gateway is configured for this run first.
+    """
+    cache_path = cache_dir(config)
     clear_cache = config.get("clear_cache", False)
     if clear_cache:
-        shutil.rmtree(cache_path, ignore_errors=True)
+        remove_cache(cache_path)
 
-    # we pass through all strategies as configs to the driver
-    driver_config = {}
-    for key, value in config.items():
-        if str(key).endswith("_strategy"):
-            driver_config[key] = value
-
-    dr = (
-        driver.Builder()
-        .with_config(driver_config)
-        .with_modules(*modules)
-        .with_cache(path=cache_path)
-        .with_adapters(NodeHook())
-        .build()
-    )  # fmt: off
+    if not shared_gateway:
+        configure_process(config)
+
+    builder = driver.Builder().with_config(driver_config(config)).with_modules(*modules)
+
+    # urls are cached using fsspec, so the cache can live on an object store
+    if is_url(cache_path):
+        builder = builder.with_cache(metadata_store=FsspecMetadataStore(cache_path), result_store=FsspecResultStore(cache_path))
+    else:
+        builder = builder.with_cache(path=cache_path)
+
+    return builder.with_adapters(hook).build()
+
+
+def manage_cache(dr: driver.Driver, config: DictConfig) -> None:
+    """Records which cached results the last run used, then applies the configured limits to the cache."""
+    # size limits are only supported for local caches
+    if is_url(cache_dir(config)) or not os.path.isdir(cache_dir(config)):
+        return
+
+    run_id = dr.cache.last_run_id
+    record_run(cache_dir(config), run_id, dr.cache.data_versions.get(run_id, {}))
+
+    cache_config = CacheConfig.model_validate(config.get("cache", {}))
+    if cache_config.max_bytes > 0 or cache_config.keep_runs > 0:
+        collection = collect_garbage(cache_dir(config), cache_config)
+        log.info("cache collected", **collection.model_dump())
+
+
+def forget_budget_stops(dr: driver.Driver, hook: NodeHook) -> None:
+    """Removes the cached results of nodes that were cut short by the budget, so the next run executes them in full."""
+    stopped = [node.node_name for node in hook.nodes if node.budget_stop]
+    if not stopped:
+        return
+
+    run_id = dr.cache.last_run_id
+    for node_name in stopped:
+        data_version = dr.cache.data_versions.get(run_id, {}).get(node_name)
+        if data_version:
+            dr.cache.result_store.delete(data_version)
+
+
+def write_profile(dr: driver.Driver, hook: NodeHook, config: DictConfig) -> None:
+    """Writes the profile of the run to profile.json and renders it as a timeline."""
+    if hook.trace_memory:
+        tracemalloc.stop()
+
+    if not hook.nodes:
+        return
+
+    profile = hook.profile(dr)
+    write_text_file(os.path.join(config["run_output_dir"], "profile.json"), profile.model_dump_json(indent=2))
+    render_template(TemplateConfig(output_dir=config["run_output_dir"]), "templates/profile.html", dict(profile=profile))
+
+
+def write_telemetry(hook: NodeHook, config: DictConfig) -> None:
+    """Writes each LLM call of the run to telemetry.jsonl and renders their latency, tokens and cost per prompt."""
+    if not hook.nodes:
+        return
+
+    lines = "".join(call.model_dump_json() + "\n" for call in hook.llm_calls)
+    write_text_file(os.path.join(config["run_output_dir"], "telemetry.jsonl"), lines)
+    telemetry = summarize_calls(hook.llm_calls)
+    render_template(TemplateConfig(output_dir=config["run_output_dir"]), "templates/telemetry.html", dict(telemetry=telemetry))
+
+
+def run_pipeline(config: DictConfig, nodes: list[str] = pipeline_nodes, shared_gateway: bool = False) -> None:
+    hook = node_hook(config)
+    dr = build_driver(config, hook, shared_gateway)
 
     # print available models
     if config.get("print_available_models", False):
+        import litellm
+
         print("Available models:")
         for model in litellm.get_valid_models():
             print(f"- {model}")
 
-    # Execute nodes in sequence to ensure reports are generated even if later steps fail
-    nodes_to_execute = ["report_pages", "plate_report", "glossary_report", "web_report", "report_index"]
-
-    dr.execute(nodes_to_execute, overrides={"config": config})
+    try:
+        dr.execute(nodes, overrides={"config": config})
+    finally:
+        forget_budget_stops(dr, hook)
+        manage_cache(dr, config)
+        write_profile(dr, hook, config)
+        write_telemetry(hook, config)
 
     # output our run graph as a png
     dr.cache.view_run(output_file_path=f"{config['run_output_dir']}/run.png")
+
+
+def run_merged_pipeline(config: DictConfig, plate_path: str, glossary: list[GlossaryItem]) -> None:
+    """
+    Runs the web and packaging stages over a plate merged from several shards, see `adt_press.shard`. The plate and its
+    glossary are passed in as overrides, so none of the per page stages are run again.
+    """
+    hook = node_hook(config)
+    dr = build_driver(config, hook)
+
+    nodes_to_execute = ["plate_report", "glossary_report", "translation_report", "web_report", "package_adt_web"]
+
+    try:
+        dr.execute(nodes_to_execute, overrides={"config": config, "plate_path": plate_path, "plate_glossary": glossary})
+    finally:
+        forget_budget_stops(dr, hook)
+        manage_cache(dr, config)
+        write_profile(dr, hook, config)
+        write_telemetry(hook, config)
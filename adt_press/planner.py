@@ -0,0 +1,401 @@
+import math
+import os
+import re
+import tempfile
+from typing import Any
+
+import structlog
+from hamilton import driver
+from hamilton.node import Node
+from omegaconf import DictConfig
+
+from adt_press.models.config import (
+    BatchPromptConfig,
+    CropPromptConfig,
+    HTMLPromptConfig,
+    PageRangeConfig,
+    PromptConfig,
+    RenderStrategy,
+    RenderType,
+)
+from adt_press.models.pdf import Page
+from adt_press.models.plan import NodePlan, RunPlan
+from adt_press.models.section import GlossaryItem
+from adt_press.nodes.config_nodes import BlankImageFilterConfig, ImageSizeFilterConfig
+from adt_press.pipeline import driver_config, modules, pipeline_nodes
+from adt_press.utils.file import cached_read_text_file, write_text_file
+from adt_press.utils.image import image_bytes, is_blank_image
+from adt_press.utils.pdf import pages_for_pdf, pdf_page_count
+
+log = structlog.get_logger()
+
+# counts that depend on LLM responses can't be known without making them, these are typical values across our books
+MEANINGFUL_IMAGE_RATIO = 0.8
+SECTIONS_PER_PAGE = 1.5
+WORDS_PER_TEXT = 40
+GLOSSARY_ITEMS_PER_SECTION = 2
+
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS = 800
+
+# images shrunk below this side take fewer tokens in proportion to their area, down to MIN_IMAGE_TOKENS
+IMAGE_TOKENS_SIDE = 1024
+MIN_IMAGE_TOKENS = 85
+SPOKEN_WORDS_PER_SECOND = 2.5
+
+# expected length of responses per prompt, in tokens
+COMPLETION_TOKENS = {
+    "text_extraction": 1000,
+    "page_sectioning": 400,
+    "image_meaningfulness": 150,
+    "image_crop": 150,
+    "image_caption": 150,
+    "section_metadata": 150,
+    "section_explanation": 300,
+    "section_glossary": 400,
+    "text_easy_read": 150,
+    "text_translation": 150,
+    "glossary_translation": 150,
+    "web_generation": 2000,
+}
+DEFAULT_COMPLETION_TOKENS = 300
+
+# time to first token and generation speed used to estimate request latency
+REQUEST_OVERHEAD_SECONDS = 2.0
+OUTPUT_TOKENS_PER_SECOND = 50
+
+_IMAGE_MARKER = "\x00image\x00"
+_CHAT_TAG = re.compile(r"{%-?\s*(end)?chat\b.*?-?%}")
+
+
+def completion_tokens(prompt: str) -> int:
+    for name, tokens in COMPLETION_TOKENS.items():
+        if prompt.startswith(name):
+            return tokens
+    return DEFAULT_COMPLETION_TOKENS
+
+
+def prompt_name(template_path: str) -> str:
+    return os.path.splitext(os.path.basename(template_path))[0]
+
+
+def text_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class SampleText(str):
+    """A sample text, templates either render it directly or use its text attribute like a PageText."""
+
+    @property
+    def text(self) -> str:
+        return str(self)
+
+
+def image_tokens(config: PromptConfig) -> int:
+    """Estimates the tokens of each image sent with a prompt, after shrinking it to the prompt's max_image_side."""
+    if config.max_image_side is None:
+        return IMAGE_TOKENS
+    return max(round(IMAGE_TOKENS * min(config.max_image_side / IMAGE_TOKENS_SIDE, 1) ** 2), MIN_IMAGE_TOKENS)
+
+
+def rendered_prompt_tokens(template_path: str, context: dict[str, Any], tokens_per_image: int = IMAGE_TOKENS) -> int:
+    """
+    Estimates the tokens of a prompt by rendering its template. Images are counted as tokens_per_image rather than read
+    and anything missing from the context renders as empty.
+    """
+    from jinja2 import ChainableUndefined, Environment, TemplateError
+
+    env = Environment(undefined=ChainableUndefined)
+    env.filters["image"] = lambda _: _IMAGE_MARKER
+
+    # the chat blocks only split the prompt into messages, so we drop them
+    source = _CHAT_TAG.sub("", cached_read_text_file(template_path))
+    try:
+        rendered = env.from_string(source).render(context)
+    except TemplateError:
+        # fall back to the size of the template itself
+        rendered = source
+    images = rendered.count(_IMAGE_MARKER)
+    return images * tokens_per_image + text_tokens(rendered.replace(_IMAGE_MARKER, ""))
+
+
+def sample_page_numbers(start: int, end: int, samples: int) -> list[int]:
+    """Returns samples page numbers spread evenly from start to end (1-based, inclusive), all of them if samples is 0."""
+    pages = list(range(start, end + 1))
+    if samples <= 0 or samples >= len(pages):
+        return pages
+    return [pages[(len(pages) * i) // samples] for i in range(samples)]
+
+
+def extract_sample(config: DictConfig, output_dir: str) -> tuple[list[Page], int]:
+    """
+    Extracts the pages the estimate is based on into output_dir, returning them and the number of pages in the
+    configured range.
+    """
+    page_range = PageRangeConfig.model_validate(config.get("page_range", {}))
+    start = max(page_range.start, 1)
+    end = page_range.end if page_range.end > 0 else pdf_page_count(str(config["pdf_path"]))
+
+    numbers = sample_page_numbers(start, end, int(config.get("dry_run_pages", 0)))
+    if len(numbers) == end - start + 1:
+        return pages_for_pdf(output_dir, str(config["pdf_path"]), start, end), len(numbers)
+
+    pages = []
+    for number in numbers:
+        pages.extend(pages_for_pdf(output_dir, str(config["pdf_path"]), number, number))
+    return pages, end - start + 1
+
+
+def llm_nodes(config: DictConfig, final_vars: list[str]) -> tuple[driver.Driver, list[Node]]:
+    """Returns the nodes that would make LLM requests computing final_vars with the configured strategies."""
+    dr = driver.Builder().with_config(driver_config(config)).with_modules(*modules).build()
+    nodes, _ = dr.graph.get_upstream_nodes(final_vars)
+    return dr, sorted([n for n in nodes if "llm_fanout" in n.tags], key=lambda n: n.name)
+
+
+class BookSample:
+    """Counts and sample prompt contexts for the extracted pages, scaled to the whole page range."""
+
+    def __init__(self, config: DictConfig, pages: list[Page], total_pages: int, llm_node_names: set[str], layout_types: dict[str, Any]):
+        self.pages = pages
+        self.layout_types = layout_types
+        self.scale = total_pages / len(pages) if pages else 0
+
+        size_filter = ImageSizeFilterConfig.model_validate(config.get("image_filters", {}).get("size", {}))
+        blank_filter = BlankImageFilterConfig.model_validate(config.get("image_filters", {}).get("blank", {}))
+        self.images_by_page = {
+            page.page_id: [
+                img
+                for img in page.images
+                if size_filter.min_side <= min(img.width, img.height)
+                and max(img.width, img.height) <= size_filter.max_side
+                and not is_blank_image(image_bytes(img.image_path), blank_filter.threshold)
+            ]
+            for page in pages
+        }
+
+        words = [len(page.text.split()) for page in pages]
+        images = sum(len(imgs) for imgs in self.images_by_page.values())
+        content_pages = sum(1 for page, w in zip(pages, words) if w or self.images_by_page[page.page_id])
+        texts = sum(math.ceil(w / WORDS_PER_TEXT) for w in words)
+        meaningful_images = images * MEANINGFUL_IMAGE_RATIO
+        sections = content_pages * SECTIONS_PER_PAGE
+
+        # every text and any generated easy read, caption and explanation ends up on the plate
+        output_texts = texts
+        output_texts += texts if "easy_reads_by_text_id" in llm_node_names else 0
+        output_texts += meaningful_images if "image_captions_by_id" in llm_node_names else 0
+        output_texts += sections if "explanations_by_section_id" in llm_node_names else 0
+        glossary_items = sections * GLOSSARY_ITEMS_PER_SECTION if "section_glossaries_by_id" in llm_node_names else 0
+
+        plate_language = str(config["plate_language"])
+        languages = list(config["output_languages"])
+        translated = [lang for lang in languages if lang != plate_language]
+
+        self.words = round(sum(words) * self.scale)
+        self.images = round(images * self.scale)
+        self.counts = {
+            "page": len(pages),
+            "content_page": content_pages,
+            "image": images,
+            "image_page": sum(1 for imgs in self.images_by_page.values() if imgs),
+            "meaningful_image": meaningful_images,
+            "section": sections,
+            "text": texts,
+            "output_text": output_texts if str(config["input_language"]) != plate_language else 0,
+            "translated_text": output_texts * len(translated),
+            "translated_glossary_item": glossary_items * len(translated),
+            "spoken_text": output_texts * len(languages),
+            "web_page": sections,
+        }
+
+    def calls(self, fanout: str) -> int:
+        return round(self.counts[fanout] * self.scale)
+
+    def contexts(self, config: PromptConfig) -> list[dict[str, Any]]:
+        """Returns a context per sampled page, holding anything our prompt templates may render for it."""
+        contexts = []
+        for page in self.pages:
+            images = self.images_by_page[page.page_id]
+            words = page.text.split()
+            text = SampleText(" ".join(words[:WORDS_PER_TEXT]))
+            contexts.append(
+                dict(
+                    page=page,
+                    image=images[0] if images else None,
+                    images=images,
+                    texts=[text],
+                    text=text,
+                    glossary_item=GlossaryItem(word=words[0] if words else "", definition=text, variations=[], emojis=[]),
+                    examples=config.examples,
+                    section=dict(page_image_path=page.page_image_path),
+                    layout_types=self.layout_types,
+                    language="English",
+                    output_language="English",
+                    base_language="English",
+                    target_language="English",
+                )
+            )
+        return contexts
+
+
+def estimate_node(node_name: str, fanout: str, config: PromptConfig, sample: BookSample) -> NodePlan:
+    """Estimates the requests, tokens and wall clock time of a node rendering the prompt of config once per fanout."""
+    contexts = sample.contexts(config)
+    calls = sample.calls(fanout)
+    template_path = config.template_path
+    answers_per_call = 1.0
+
+    # batched prompts ask about all the images of a page at once, we plan for every page being small enough to batch
+    if isinstance(config, BatchPromptConfig) and config.batch_template_path and fanout in ("image", "meaningful_image"):
+        template_path = config.batch_template_path
+        answers_per_call = calls / max(sample.calls("image_page"), 1)
+        calls = min(calls, sample.calls("image_page"))
+
+    prompt = prompt_name(template_path)
+    tokens_per_image = image_tokens(config)
+    prompt_tokens = sum(rendered_prompt_tokens(template_path, c, tokens_per_image) for c in contexts) / max(len(contexts), 1)
+    completion = round(completion_tokens(prompt) * answers_per_call)
+    audio_seconds = 0.0
+
+    # speech renders instructions, the text itself is passed as input and returned as audio
+    if fanout == "spoken_text":
+        prompt_tokens += sum(text_tokens(c["text"]) for c in contexts) / max(len(contexts), 1)
+        audio_seconds = WORDS_PER_TEXT / SPOKEN_WORDS_PER_SECOND * calls
+        completion = 0
+
+    # recrops are follow up requests sending the prompt again with the latest crop, we plan for them never stopping early
+    requests_per_call = 1
+    total_prompt_tokens = prompt_tokens
+    if isinstance(config, CropPromptConfig) and config.recrop_template_path:
+        recrop_tokens = sum(rendered_prompt_tokens(config.recrop_template_path, c, tokens_per_image) for c in contexts) / max(
+            len(contexts), 1
+        )
+        requests_per_call += config.recrops
+        total_prompt_tokens += config.recrops * (prompt_tokens + recrop_tokens)
+
+    requests = calls * requests_per_call
+    latency = REQUEST_OVERHEAD_SECONDS + completion / OUTPUT_TOKENS_PER_SECOND
+    seconds = 0.0
+    if requests:
+        seconds = max(requests * 60 / config.rate_limit, requests * latency / config.max_concurrency) + latency * requests_per_call
+
+    return NodePlan(
+        node_name=node_name,
+        prompt=prompt,
+        model=config.model,
+        fanout=fanout,
+        calls=requests,
+        prompt_tokens=round(total_prompt_tokens * calls),
+        completion_tokens=completion * requests,
+        audio_seconds=audio_seconds,
+        rate_limit=config.rate_limit,
+        seconds=seconds,
+    )
+
+
+def render_prompt_configs(
+    render_strategy: str, render_strategies: dict[str, RenderStrategy], layout_types: dict[str, Any], default_model: str
+) -> list[PromptConfig]:
+    """Returns the prompt configs of the LLM render strategies web pages may be generated with."""
+    names = {lt.render_strategy for lt in layout_types.values()} if render_strategy == "dynamic" else {render_strategy}
+
+    configs: list[PromptConfig] = []
+    for name in sorted(names):
+        strategy = render_strategies[name]
+        if strategy.render_type == RenderType.template:
+            continue
+
+        strategy_config = dict(strategy.config)
+        if strategy_config.get("model") == "default":
+            strategy_config["model"] = default_model
+
+        if strategy.render_type == RenderType.html:
+            configs.append(HTMLPromptConfig.model_validate(strategy_config))
+        else:
+            configs.append(PromptConfig.model_validate(strategy_config))
+    return configs
+
+
+def model_cost(plan: NodePlan) -> float | None:
+    # litellm ships with a price list, we only look prices up so never make requests or fetch the latest list
+    os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+    import litellm
+
+    prices = litellm.model_cost.get(plan.model)
+    if not prices:
+        return None
+
+    cost = plan.prompt_tokens * prices.get("input_cost_per_token", 0)
+    cost += plan.prompt_tokens * CHARS_PER_TOKEN * prices.get("input_cost_per_character", 0)
+    cost += plan.completion_tokens * prices.get("output_cost_per_token", 0)
+    cost += plan.audio_seconds * prices.get("output_cost_per_second", 0)
+    return float(cost)
+
+
+def plan_pages(config: DictConfig, pages: list[Page], total_pages: int, final_vars: list[str] = pipeline_nodes) -> RunPlan:
+    """Predicts the LLM requests computing final_vars would make for a book, estimated from its extracted pages."""
+    dr, nodes = llm_nodes(config, final_vars)
+
+    # the prompt configs each node renders are nodes themselves
+    prompt_config_names = sorted({d.name for n in nodes for d in n.dependencies if d.name.endswith("_prompt_config")})
+    render_config_names = ["render_strategy_config", "render_strategies_config", "layout_types_config", "default_model_config"]
+    configs = dr.execute(prompt_config_names + render_config_names, overrides={"config": config})
+
+    sample = BookSample(config, pages, total_pages, {n.name for n in nodes}, configs["layout_types_config"])
+
+    plans = []
+    for n in nodes:
+        fanout = n.tags["llm_fanout"]
+        prompt_configs = [configs[d.name] for d in n.dependencies if d.name.endswith("_prompt_config")]
+
+        # web pages are rendered with the strategy of their layout, which we can't know, so we plan for the priciest
+        if not prompt_configs:
+            prompt_configs = render_prompt_configs(*[configs[name] for name in render_config_names])
+
+        estimates = [estimate_node(n.name, fanout, c, sample) for c in prompt_configs]
+        for estimate in estimates:
+            estimate.cost = model_cost(estimate)
+        if estimates:
+            plans.append(max(estimates, key=lambda e: (e.cost or 0, e.prompt_tokens)))
+
+    costs = [p.cost for p in plans]
+    return RunPlan(
+        pages=total_pages,
+        sampled_pages=len(pages),
+        images=sample.images,
+        words=sample.words,
+        nodes=plans,
+        calls=sum(p.calls for p in plans),
+        # nodes are executed one after another
+        seconds=sum(p.seconds for p in plans),
+        cost=None if None in costs else sum(c or 0 for c in costs),
+    )
+
+
+def print_plan(plan: RunPlan) -> None:
+    print(f"{plan.pages} pages, {plan.images} images and {plan.words} words, estimated from {plan.sampled_pages} pages")
+    print(f"{'node':<30} {'prompt':<30} {'model':<18} {'calls':>7} {'prompt tok':>11} {'compl tok':>10} {'minutes':>8} {'cost':>9}")
+    for p in plan.nodes:
+        cost = f"{p.cost:.2f}" if p.cost is not None else "?"
+        print(
+            f"{p.node_name:<30} {p.prompt:<30} {p.model:<18} {p.calls:>7} {p.prompt_tokens:>11} "
+            f"{p.completion_tokens:>10} {p.seconds / 60:>8.1f} {cost:>9}"
+        )
+    cost = f"{plan.cost:.2f}" if plan.cost is not None else "?"
+    print(f"{'total':<30} {'':<30} {'':<18} {plan.calls:>7} {'':>11} {'':>10} {plan.seconds / 60:>8.1f} {cost:>9}")
+
+
+def run_dry_run(config: DictConfig) -> RunPlan:
+    """
+    Predicts the requests, wall clock time and cost of a run without making any LLM requests. Only the pdf is
+    extracted, or a sample of dry_run_pages of its pages, and the plan written to plan.json.
+    """
+    # the sample is extracted apart from the run's output and removed once planned, so a later run never mixes the
+    # partial extraction into its own
+    with tempfile.TemporaryDirectory(prefix="adt_dry_run_") as sample_dir:
+        pages, total_pages = extract_sample(config, sample_dir)
+        plan = plan_pages(config, pages, total_pages)
+    write_text_file(os.path.join(config["run_output_dir"], "plan.json"), plan.model_dump_json(indent=2))
+    log.info("run planned", calls=plan.calls, seconds=plan.seconds, cost=plan.cost)
+    return plan
@@ -0,0 +1,110 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import structlog
+from omegaconf import DictConfig, OmegaConf
+
+from adt_press.models.config import PageRangeConfig
+from adt_press.models.plate import Plate
+from adt_press.models.section import GlossaryItem
+from adt_press.pipeline import run_merged_pipeline, run_pipeline, shard_nodes
+from adt_press.utils.config import load_run_config
+from adt_press.utils.file import read_text_file, write_text_file
+from adt_press.utils.pdf import pdf_page_count
+
+log = structlog.get_logger()
+
+
+def shard_page_ranges(start: int, end: int, shards: int) -> list[PageRangeConfig]:
+    """Splits the pages start to end (1-based, inclusive) into at most shards contiguous ranges of near equal size."""
+    start = max(start, 1)
+    pages = end - start + 1
+    if pages < 1:
+        raise ValueError(f"Invalid page range {start}-{end}")
+
+    shards = max(1, min(shards, pages))
+    ranges = []
+    for i in range(shards):
+        shard_start = start + (pages * i) // shards
+        shard_end = start + (pages * (i + 1)) // shards - 1
+        ranges.append(PageRangeConfig(start=shard_start, end=shard_end))
+    return ranges
+
+
+def shard_label(label: str, index: int) -> str:
+    return f"{label}_shard{index + 1}"
+
+
+def shard_configs(cli_config: DictConfig, shards: int) -> list[DictConfig]:
+    """Returns the run config for each shard of the book described by cli_config, each under its own label."""
+    config = load_run_config(cli_config)
+    page_range = PageRangeConfig.model_validate(OmegaConf.to_container(config["page_range"]))
+    end = page_range.end if page_range.end > 0 else pdf_page_count(str(config["pdf_path"]))
+
+    configs = []
+    for i, shard_range in enumerate(shard_page_ranges(page_range.start, end, shards)):
+        shard_config = OmegaConf.merge(
+            cli_config,
+            dict(label=shard_label(str(config["label"]), i), page_range=shard_range.model_dump()),
+        )
+        configs.append(load_run_config(DictConfig(shard_config)))
+    return configs
+
+
+def merge_plates(plates: list[Plate]) -> Plate:
+    """
+    Merges the plates of several shards, passed in page order, into a single plate. Ids are page based so are unique
+    across shards, should shards overlap the first occurrence of an id wins. The glossary keeps the first definition of
+    each word and is sorted, the same as a single run.
+    """
+    if not plates:
+        raise ValueError("No plates to merge")
+
+    def unique(items: list, key: str) -> list:
+        seen: dict[str, object] = {}
+        for item in items:
+            seen.setdefault(getattr(item, key), item)
+        return list(seen.values())
+
+    glossary: dict[str, GlossaryItem] = {}
+    for plate in plates:
+        for item in plate.glossary:
+            glossary.setdefault(item.word, item)
+
+    return Plate(
+        title=plates[0].title,
+        language_code=plates[0].language_code,
+        sections=unique([s for p in plates for s in p.sections], "section_id"),
+        images=unique([i for p in plates for i in p.images], "image_id"),
+        groups=unique([g for p in plates for g in p.groups], "group_id"),
+        texts=unique([t for p in plates for t in p.texts], "text_id"),
+        glossary=sorted(glossary.values(), key=lambda x: x.word),
+    )
+
+
+def run_shard(config: DictConfig) -> None:
+    """Runs a shard up to its plate, translations, speech, web pages and packaging are left to the merge."""
+    run_pipeline(config, shard_nodes)
+
+
+def run_shards(configs: list[DictConfig], workers: int) -> None:
+    """Runs each shard as an independent pipeline in its own process."""
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        for config, _ in zip(configs, pool.map(run_shard, configs)):
+            log.info("shard complete", label=config["label"], page_range=OmegaConf.to_container(config["page_range"]))
+
+
+def run_merge(config: DictConfig, shards: list[DictConfig]) -> Plate:
+    """Merges the plates written by the shards into the book's own plate, then generates its web pages and package once."""
+    plates = []
+    for shard_config in shards:
+        plate_path = os.path.join(str(shard_config["run_output_dir"]), "plate.json")
+        if not os.path.exists(plate_path):
+            raise ValueError(f"Shard {shard_config['label']} has no plate at {plate_path}, has it been run?")
+        plates.append(Plate.model_validate_json(read_text_file(plate_path)))
+
+    plate = merge_plates(plates)
+    plate_path = write_text_file(os.path.join(str(config["run_output_dir"]), "plate.json"), plate.model_dump_json(indent=2))
+
+    run_merged_pipeline(config, plate_path, plate.glossary)
+    return plate
@@ -0,0 +1,56 @@
+import threading
+import time
+from typing import Awaitable, TypeVar
+
+from adt_press.models.config import BudgetConfig, BudgetLimits
+
+T = TypeVar("T")
+
+
+class BudgetExceeded(RuntimeError):
+    """Raised instead of making an LLM request once a budget limit has been reached."""
+
+
+def exceeded_limit(scope: str, limits: BudgetLimits, tokens: int, cost: float, seconds: float) -> str | None:
+    """Returns which of the limits has been reached, None if none have."""
+    if limits.max_tokens and tokens >= limits.max_tokens:
+        return f"{scope} budget of {limits.max_tokens} tokens reached"
+    if limits.max_cost and cost >= limits.max_cost:
+        return f"{scope} budget of ${limits.max_cost:.2f} reached"
+    if limits.max_seconds and seconds >= limits.max_seconds:
+        return f"{scope} budget of {limits.max_seconds:.0f} seconds reached"
+    return None
+
+
+class Budget:
+    """
+    Tracks the LLM usage of a run against its budget. Nodes run on their own threads and books of a batch share the
+    process, so each run has its own budget which is safe to update from any thread.
+    """
+
+    def __init__(self, config: BudgetConfig):
+        self.config = config
+        self.started_at = time.monotonic()
+        self.tokens = 0
+        self.cost = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, tokens: int, cost: float) -> None:
+        with self._lock:
+            self.tokens += tokens
+            self.cost += cost
+
+    def exceeded(self, node_tokens: int, node_cost: float, node_started_at: float) -> str | None:
+        """Returns why no more requests may be made by the run or the current node, None if they may."""
+        now = time.monotonic()
+        with self._lock:
+            run = exceeded_limit("run", self.config.run, self.tokens, self.cost, now - self.started_at)
+        return run or exceeded_limit("node", self.config.node, node_tokens, node_cost, now - node_started_at)
+
+
+async def within_budget(f: Awaitable[T]) -> T | None:
+    """Awaits f, returning None if it was stopped by the budget so the caller can fall back to not using an LLM."""
+    try:
+        return await f
+    except BudgetExceeded:
+        return None
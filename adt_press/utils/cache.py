@@ -0,0 +1,167 @@
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+from adt_press.models.cache import CacheCollection, CacheNodeUsage
+from adt_press.models.config import CacheConfig
+
+# Hamilton stores each result in a file named by its data version next to this sqlite database, which maps the cache
+# keys of node executions to those data versions. We only go through the public API of its metadata and result stores,
+# so a change to their schema can't corrupt the cache. Hamilton only records which results a run produced, not which
+# ones it read back, so we track when each result was last used in a database of our own.
+METADATA_DB = "metadata_store.db"
+ACCESS_DB = "access.db"
+
+# LLM responses cached by the gateway next to the results (see `adt_press.llm.gateway.ResponseCache`), one file per
+# response whose modification time is updated whenever it is read, so it doubles as its last access
+RESPONSES_DIR = "responses"
+
+
+def _connect(cache_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(os.path.join(cache_path, ACCESS_DB))
+    conn.execute("CREATE TABLE IF NOT EXISTS access (data_version TEXT PRIMARY KEY, accessed_at REAL NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS runs (run_id TEXT, data_version TEXT, finished_at REAL NOT NULL)")
+    conn.execute("CREATE INDEX IF NOT EXISTS runs_run_id ON runs (run_id)")
+    return conn
+
+
+def _cache_keys(cache_path: str) -> dict[str, tuple[str, set[str]]]:
+    """Returns the node name and the cache keys of every result recorded by Hamilton, by data version."""
+    from hamilton.caching.stores.sqlite import SQLiteMetadataStore
+
+    if not os.path.exists(os.path.join(cache_path, METADATA_DB)):
+        return {}
+
+    store = SQLiteMetadataStore(cache_path)
+    keys: dict[str, tuple[str, set[str]]] = {}
+    for run_id in store.get_run_ids():
+        for node in store.get_run(run_id):
+            keys.setdefault(node["data_version"], (node["node_name"], set()))[1].add(node["cache_key"])
+    return keys
+
+
+def _cached_results(cache_path: str) -> dict[str, tuple[str, int, float]]:
+    """Returns the node name, size and creation time of every result stored in the cache, by data version."""
+    results = {}
+    for data_version, (node_name, _) in _cache_keys(cache_path).items():
+        try:
+            stat = os.stat(os.path.join(cache_path, data_version))
+        except FileNotFoundError:
+            continue
+        results[data_version] = (node_name, stat.st_size, stat.st_mtime)
+    return results
+
+
+def _cached_responses(cache_path: str) -> dict[str, tuple[str, int, float]]:
+    """Returns "responses", the size and last access of every cached LLM response, by its path within the cache."""
+    responses = {}
+    for root, _, files in os.walk(os.path.join(cache_path, RESPONSES_DIR)):
+        for name in files:
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            responses[os.path.relpath(path, cache_path)] = (RESPONSES_DIR, stat.st_size, stat.st_mtime)
+    return responses
+
+
+def record_run(cache_path: str, run_id: str, data_versions: dict[str, str]) -> None:
+    """Records that the run used the passed in results, whether it computed them or read them from the cache."""
+    now = time.time()
+    with closing(_connect(cache_path)) as conn, conn:
+        conn.executemany(
+            "INSERT INTO access (data_version, accessed_at) VALUES (?, ?) "
+            "ON CONFLICT(data_version) DO UPDATE SET accessed_at = excluded.accessed_at",
+            [(v, now) for v in data_versions.values()],
+        )
+        conn.executemany(
+            "INSERT INTO runs (run_id, data_version, finished_at) VALUES (?, ?, ?)", [(run_id, v, now) for v in data_versions.values()]
+        )
+
+
+def cache_usage(cache_path: str) -> list[CacheNodeUsage]:
+    """Returns the number and size of cached results per node, largest first."""
+    usage: dict[str, CacheNodeUsage] = {}
+    for node_name, size, _ in [*_cached_results(cache_path).values(), *_cached_responses(cache_path).values()]:
+        node = usage.setdefault(node_name, CacheNodeUsage(node_name=node_name, entries=0, bytes=0))
+        node.entries += 1
+        node.bytes += size
+    return sorted(usage.values(), key=lambda u: (-u.bytes, u.node_name))
+
+
+def _remove_results(cache_path: str, data_versions: list[str]) -> None:
+    from hamilton.caching.stores.file import FileResultStore
+    from hamilton.caching.stores.sqlite import SQLiteMetadataStore
+
+    keys = _cache_keys(cache_path)
+    metadata_store = SQLiteMetadataStore(cache_path)
+    for data_version in data_versions:
+        for cache_key in keys.get(data_version, ("", set()))[1]:
+            metadata_store.delete(cache_key)
+
+    with closing(_connect(cache_path)) as conn, conn:
+        conn.executemany("DELETE FROM access WHERE data_version = ?", [(v,) for v in data_versions])
+        conn.executemany("DELETE FROM runs WHERE data_version = ?", [(v,) for v in data_versions])
+
+    # remove the results last, a result without metadata is never read, but metadata without a result fails the run
+    result_store = FileResultStore(cache_path, create_dir=False)
+    for data_version in data_versions:
+        result_store.delete(data_version)
+
+
+def _remove_responses(cache_path: str, paths: list[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(os.path.join(cache_path, path))
+        except FileNotFoundError:  # pragma: no cover
+            pass
+
+
+def collect_garbage(cache_path: str, cache_config: CacheConfig) -> CacheCollection:
+    """
+    Removes results not used by any of the latest keep_runs runs, then evicts the least recently used results and LLM
+    responses until the cache fits in max_bytes. Results of the latest runs are evicted last, so the warm cache survives
+    as long as possible. Responses aren't tied to runs, so only max_bytes applies to them.
+    """
+    responses = _cached_responses(cache_path)
+    results = _cached_results(cache_path)
+    if not results and not responses:
+        return CacheCollection(removed_entries=0, removed_bytes=0, remaining_bytes=0)
+
+    with closing(_connect(cache_path)) as conn:
+        accessed = dict(conn.execute("SELECT data_version, accessed_at FROM access").fetchall())
+
+        recent: set[str] = set()
+        if cache_config.keep_runs > 0:
+            run_ids = conn.execute(
+                "SELECT run_id FROM runs GROUP BY run_id ORDER BY MAX(finished_at) DESC LIMIT ?", (cache_config.keep_runs,)
+            ).fetchall()
+            for (run_id,) in run_ids:
+                recent.update(v for (v,) in conn.execute("SELECT data_version FROM runs WHERE run_id = ?", (run_id,)))
+
+    remove = [v for v in results if v not in recent] if cache_config.keep_runs > 0 else []
+
+    # responses are keyed by their path, which never clashes with the data version of a result
+    entries = {**results, **responses}
+    total = sum(size for _, size, _ in entries.values()) - sum(results[v][1] for v in remove)
+    if cache_config.max_bytes > 0 and total > cache_config.max_bytes:
+        # results never accessed since we started tracking fall back to their creation time
+        candidates = sorted(
+            (v for v in entries if v not in remove),
+            key=lambda v: (v in recent, accessed.get(v, entries[v][2])),
+        )
+        for key in candidates:
+            if total <= cache_config.max_bytes:
+                break
+            remove.append(key)
+            total -= entries[key][1]
+
+    removed_results = [v for v in remove if v in results]
+    if removed_results:
+        _remove_results(cache_path, removed_results)
+    _remove_responses(cache_path, [v for v in remove if v in responses])
+
+    return CacheCollection(
+        removed_entries=len(remove),
+        removed_bytes=sum(entries[v][1] for v in remove),
+        remaining_bytes=total,
+    )
@@ -0,0 +1,134 @@
+import hashlib
+import json
+from typing import Any
+
+import fsspec
+from hamilton.caching.cache_key import decode_key
+from hamilton.caching.stores.base import MetadataStore, ResultStore, StoredResult
+
+
+def is_url(path: str) -> bool:
+    return "://" in path
+
+
+class FsspecResultStore(ResultStore):
+    """
+    Stores Hamilton results as pickles under any fsspec URL, e.g. s3://bucket/cache or file:///mnt/shared/cache, laid out
+    the same as Hamilton's own file store, one file per data version.
+    """
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.fs, self.path = fsspec.core.url_to_fs(url)
+        self.fs.makedirs(self.path, exist_ok=True)
+
+    def __getstate__(self) -> dict:
+        return {"url": self.url}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["url"])  # type: ignore[misc]
+
+    def _path(self, data_version: str) -> str:
+        return f"{self.path}/{data_version}"
+
+    def set(self, data_version: str, result: Any, **kwargs: Any) -> None:
+        # results are always pickled, materializers are not supported
+        self.fs.pipe_file(self._path(data_version), StoredResult.new(value=result).save())
+
+    def get(self, data_version: str, **kwargs: Any) -> Any | None:
+        try:
+            return StoredResult.load(self.fs.cat_file(self._path(data_version))).value
+        except FileNotFoundError:
+            return None
+
+    def delete(self, data_version: str) -> None:
+        if self.fs.exists(self._path(data_version)):
+            self.fs.rm_file(self._path(data_version))
+
+    def delete_all(self) -> None:
+        self.fs.rm(self.path, recursive=True)
+        self.fs.makedirs(self.path, exist_ok=True)
+
+    def exists(self, data_version: str) -> bool:
+        return bool(self.fs.exists(self._path(data_version)))
+
+
+class FsspecMetadataStore(MetadataStore):
+    """
+    Stores the mapping of Hamilton cache keys to data versions under any fsspec URL, one small JSON file per cache key,
+    so it can live on object stores where SQLite can't. Runs are only tracked for the current process.
+    """
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.fs, root = fsspec.core.url_to_fs(url)
+        self.path = f"{root}/metadata"
+        self.fs.makedirs(self.path, exist_ok=True)
+        self._runs: dict[str, list[dict]] = {}
+
+    def __getstate__(self) -> dict:
+        return {"url": self.url}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["url"])  # type: ignore[misc]
+
+    def _path(self, cache_key: str) -> str:
+        # cache keys contain characters that aren't safe in paths
+        return f"{self.path}/{hashlib.sha256(cache_key.encode('utf-8')).hexdigest()}.json"
+
+    def __len__(self) -> int:
+        return len(self.fs.ls(self.path, detail=False))
+
+    def initialize(self, run_id: str) -> None:
+        self._runs.setdefault(run_id, [])
+
+    def set(
+        self,
+        *,
+        cache_key: str,
+        data_version: str,
+        run_id: str,
+        node_name: str | None = None,
+        code_version: str | None = None,
+        **kwargs: Any,
+    ) -> None:
+        if node_name is None or code_version is None:
+            decoded_key = decode_key(cache_key)
+            node_name = decoded_key["node_name"]
+            code_version = decoded_key["code_version"]
+
+        entry = dict(cache_key=cache_key, data_version=data_version, node_name=node_name, code_version=code_version)
+        self.fs.pipe_file(self._path(cache_key), json.dumps(entry).encode("utf-8"))
+        self._runs.setdefault(run_id, []).append(entry)
+
+    def get(self, cache_key: str, **kwargs: Any) -> str | None:
+        try:
+            return str(json.loads(self.fs.cat_file(self._path(cache_key)))["data_version"])
+        except FileNotFoundError:
+            return None
+
+    def delete(self, cache_key: str) -> None:
+        if self.fs.exists(self._path(cache_key)):
+            self.fs.rm_file(self._path(cache_key))
+
+    def delete_all(self) -> None:
+        self.fs.rm(self.path, recursive=True)
+        self.fs.makedirs(self.path, exist_ok=True)
+
+    def exists(self, cache_key: str) -> bool:
+        return bool(self.fs.exists(self._path(cache_key)))
+
+    def get_run_ids(self) -> list[str]:
+        return list(self._runs.keys())
+
+    def get_run(self, run_id: str) -> list[dict]:
+        if run_id not in self._runs:
+            raise IndexError(f"`run_id` not found: {run_id}")
+        return self._runs[run_id]
+
+
+def remove_cache(path: str) -> None:
+    """Deletes the cache at path, which may be a local directory or an fsspec URL."""
+    fs, fs_path = fsspec.core.url_to_fs(path)
+    if fs.exists(fs_path):
+        fs.rm(fs_path, recursive=True)
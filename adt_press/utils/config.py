@@ -1,8 +1,21 @@
+import os
 from enum import Enum
 from typing import Any
 
 from omegaconf import DictConfig, ListConfig, OmegaConf
 
+# never write these flags to our config file
+TEMP_FLAGS = [
+    "clear_cache",
+    "print_available_models",
+    "profile_tracemalloc",
+    "debug_log_results",
+    "dry_run",
+    "dry_run_pages",
+    "llm_backend",
+    "fake_llm",
+]
+
 
 def conf_to_object(value: DictConfig | ListConfig) -> dict[str | bytes | int | Enum | float | bool, Any] | list[Any] | str | Any | None:
     return {} if value is None else OmegaConf.to_container(value, resolve=True)
@@ -14,3 +27,36 @@ def prompt_config_with_model(
     if value["model"] == "default":
         value["model"] = default_model
     return conf_to_object(value)
+
+
+def load_run_config(cli_config: DictConfig, default_config_path: str = "config/config.yaml") -> DictConfig:
+    """
+    Builds the config for a single run by merging the default config, the run's own config file and the passed in
+    overrides. Overrides are validated against the default config and persisted to the run's config file.
+    """
+    default_config = OmegaConf.load(default_config_path)
+
+    # Enable struct mode to validate CLI parameters against config schema
+    OmegaConf.set_struct(default_config, True)
+    default_config = DictConfig(OmegaConf.merge(default_config, cli_config))
+
+    run_output_dir = default_config["run_output_dir"]
+    os.makedirs(run_output_dir, exist_ok=True)
+
+    config_path = os.path.join(run_output_dir, "config.yaml")
+    if not os.path.exists(config_path):
+        # create an empty config file to hold our merged config
+        with open(config_path, "w") as f:  # pragma: no cover
+            f.write("# Configuration overrides\n")
+
+    file_config = OmegaConf.load(config_path)
+
+    # write our config file out, merging in any new cli options
+    output_config = DictConfig(OmegaConf.merge(file_config, cli_config))
+    for flag in TEMP_FLAGS:
+        if flag in output_config:
+            del output_config[flag]
+    OmegaConf.save(output_config, config_path)
+
+    # our final config is the merging of the default config, file config and cli config
+    return DictConfig(OmegaConf.merge(default_config, file_config, cli_config))
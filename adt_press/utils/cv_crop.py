@@ -0,0 +1,60 @@
+import numpy as np
+
+from adt_press.models.image import CropCoordinates
+
+# images are analysed with their longest side shrunk to this many pixels
+ANALYSIS_SIDE = 512
+
+
+def content_crop(image_bytes: bytes, tolerance: int, padding: int) -> tuple[CropCoordinates, float]:
+    """
+    Proposes a crop of an image trimming its uniform margins, along with how confident we are in it from 0 to 1.
+
+    The background is the median color of the image's outermost pixels, pixels differing from it by more than tolerance
+    in any channel are content. The crop is the bounding box of all content, leaving out specks, grown by padding
+    pixels. We are confident when the border is uniform and the content forms one main region, scanned pages with
+    textured margins or images made of scattered parts are better left to the LLM.
+    """
+    import cv2
+
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    assert image is not None, "Image could not be decoded from bytes."
+    height, width = image.shape[:2]
+
+    scale = min(ANALYSIS_SIDE / max(width, height), 1.0)
+    small = cv2.resize(image, (max(round(width * scale), 1), max(round(height * scale), 1)), interpolation=cv2.INTER_AREA)
+
+    border = np.concatenate([small[0], small[-1], small[:, 0], small[:, -1]])
+    background = np.median(border, axis=0)
+    border_uniformity = float(np.mean(np.max(np.abs(border - background), axis=1) <= tolerance))
+
+    mask = (np.max(np.abs(small.astype(np.int16) - background.astype(np.int16)), axis=2) > tolerance).astype(np.uint8)
+
+    # remove specks of noise, then join content that's close together such as the letters of a word
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((9, 9), np.uint8))
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    min_area = 0.001 * mask.shape[0] * mask.shape[1]
+    boxes = [cv2.boundingRect(c) for c in contours if cv2.contourArea(c) >= min_area]
+
+    full = CropCoordinates(top_left_x=0, top_left_y=0, bottom_right_x=width, bottom_right_y=height)
+    if not boxes:
+        # nothing stands out from the background, the image is kept whole
+        return full, border_uniformity
+
+    x0 = min(x for x, _, _, _ in boxes)
+    y0 = min(y for _, y, _, _ in boxes)
+    x1 = max(x + w for x, _, w, _ in boxes)
+    y1 = max(y + h for _, y, _, h in boxes)
+
+    # how much of the crop is taken up by its largest region
+    coverage = max(w * h for _, _, w, h in boxes) / ((x1 - x0) * (y1 - y0))
+
+    crop = CropCoordinates(
+        top_left_x=max(int(x0 / scale) - padding, 0),
+        top_left_y=max(int(y0 / scale) - padding, 0),
+        bottom_right_x=min(int(np.ceil(x1 / scale)) + padding, width),
+        bottom_right_y=min(int(np.ceil(y1 / scale)) + padding, height),
+    )
+    return crop, min(border_uniformity, coverage)
@@ -1,4 +1,9 @@
 import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
 from functools import cache
 
 from fsspec import open
@@ -47,9 +52,86 @@ def cached_read_text_file(file_path: str) -> str:
     return read_text_file(file_path)
 
 
-def calculate_file_hash(file_path: str) -> str:
-    """Calculate the hash of a file."""
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# files modified this recently aren't memoized, on filesystems with coarse timestamps (e.g. NFS) a rewrite of the same
+# size could otherwise keep the mtime, and with it the stale hash, like git's racily clean entries
+RACY_SECONDS = 2
+
+# hashes of local files by (path, size, mtime_ns, inode), so unchanged files are never read twice
+_hash_memo: dict[tuple[str, int, int, int], str] = {}
+_hash_memo_lock = threading.Lock()
+_hash_memo_path = ""
+
+
+def configure_hash_memo(path: str) -> None:
+    """Persists file hashes to a sqlite database at path so they are remembered across runs, an empty path disables it."""
+    global _hash_memo_path
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(sqlite3.connect(path)) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS file_hashes "
+                "(path TEXT, size INTEGER, mtime_ns INTEGER, inode INTEGER, hash TEXT, PRIMARY KEY (path, size, mtime_ns, inode))"
+            )
+    _hash_memo_path = path
+
+
+def _memo_key(file_path: str) -> tuple[str, int, int, int] | None:
+    """Returns the key a file's hash is memoized by, None if it can't be memoized."""
+    try:
+        stat = os.stat(file_path)
+    except (OSError, ValueError):
+        # not a local file, e.g. a url
+        return None
+
+    if time.time_ns() - stat.st_mtime_ns < RACY_SECONDS * 1_000_000_000:
+        return None
+
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+def _stream_file_hash(file_path: str) -> str:
     hasher = hashlib.sha256()
     with open(file_path, "rb") as f:
-        hasher.update(f.read())
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            hasher.update(chunk)
     return hasher.hexdigest()
+
+
+def calculate_file_hash(file_path: str) -> str:
+    """Calculate the hash of a file, reading it in chunks and only if it changed since it was last hashed."""
+    key = _memo_key(file_path)
+    if key is None:
+        return _stream_file_hash(file_path)
+
+    with _hash_memo_lock:
+        if key in _hash_memo:
+            return _hash_memo[key]
+
+    # the persistent memo is only an optimization, so we carry on without it if it can't be used
+    memo_path = _hash_memo_path
+    if memo_path:
+        try:
+            with closing(sqlite3.connect(memo_path)) as conn:
+                query = "SELECT hash FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?"
+                row = conn.execute(query, key).fetchone()
+            if row:
+                with _hash_memo_lock:
+                    _hash_memo[key] = row[0]
+                return str(row[0])
+        except sqlite3.Error:
+            memo_path = ""
+
+    file_hash = _stream_file_hash(file_path)
+    with _hash_memo_lock:
+        _hash_memo[key] = file_hash
+
+    if memo_path:
+        try:
+            with closing(sqlite3.connect(memo_path)) as conn, conn:
+                conn.execute("INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?, ?)", (*key, file_hash))
+        except sqlite3.Error:  # pragma: no cover
+            pass
+
+    return file_hash
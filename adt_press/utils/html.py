@@ -1,13 +1,13 @@
 # mypy: ignore-errors
 import os
 
-from bs4 import BeautifulSoup
-
 from adt_press.models.config import TemplateConfig
 from adt_press.models.plate import PlateImage, PlateText
 
 
 def replace_images(html_content: str, image_replacements: dict[str, PlateImage], text_replacements: dict[str, PlateText]) -> str:
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html_content, "html.parser")
 
     for tag in soup.find_all("img"):
@@ -22,6 +22,8 @@ def replace_images(html_content: str, image_replacements: dict[str, PlateImage],
 
 
 def replace_texts(html_content: str, text_replacements: dict[str, PlateText]) -> str:
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html_content, "html.parser")
 
     # NOTE: setting tag.string overwrites child nodes.
@@ -1,8 +1,11 @@
 import io
+import threading
 import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from typing import Any
 
-import cv2
-import matplotlib.pyplot as plt
 import numpy as np
 import PIL
 import PIL.ImageDraw
@@ -10,11 +13,25 @@ from fsspec import open
 
 from adt_press.models.image import CropCoordinates
 
-plt.switch_backend("Agg")
 warnings.filterwarnings("ignore", category=RuntimeWarning)
 
-# Set the figure.max_open_warning to a high number to suppress the warning
-plt.rcParams.update({"figure.max_open_warning": 100})
+# images whose pixels deviate more than this many times the blank threshold at reduced size are never blank
+REDUCED_MARGIN = 2
+
+# bytes of decoded pixels kept in memory, enough for a few dozen full page images
+DECODED_CACHE_BYTES = 512 * 1024 * 1024
+
+
+@cache
+def _pyplot() -> Any:
+    # matplotlib is slow to import and only needed for charts, so we load and configure it on first use
+    import matplotlib.pyplot as plt
+
+    plt.switch_backend("Agg")
+
+    # Set the figure.max_open_warning to a high number to suppress the warning
+    plt.rcParams.update({"figure.max_open_warning": 100})
+    return plt
 
 
 def image_bytes(image_path: str) -> bytes:
@@ -33,19 +50,35 @@ def is_blank_image(image_bytes: bytes, threshold: int) -> bool:
     :return: True if the image is blank, False otherwise.
     """
 
-    # Convert the image data to a numpy array
-    image_array = np.frombuffer(image_bytes, np.uint8)
-    image = cv2.imdecode(image_array, cv2.IMREAD_GRAYSCALE)
+    import cv2
+
+    # decoding at an eighth of the size samples or averages pixels, so their deviation is close to that at full size,
+    # only images that come near the threshold are decoded in full to decide
+    if pixel_std(image_bytes, cv2.IMREAD_REDUCED_GRAYSCALE_8) >= REDUCED_MARGIN * threshold:
+        return False
+    return pixel_std(image_bytes, cv2.IMREAD_GRAYSCALE) < threshold
+
+
+def pixel_std(image_bytes: bytes, mode: int) -> float:
+    """Returns the standard deviation of the grayscale pixel values of an image decoded with the passed in cv2 mode."""
+    import cv2
+
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), mode)
     assert image is not None, "Image could not be decoded from bytes."
-    # Compute the standard deviation of the pixel values
-    std_dev = np.std(image)
-    # Check if the standard deviation is below the threshold
-    return bool(std_dev < threshold)
+    _, std_dev = cv2.meanStdDev(image)
+    return float(std_dev[0][0])
+
+
+def blank_images(image_paths: list[str], threshold: int) -> list[bool]:
+    """Checks which of the images are blank, reading and decoding them on a thread pool as cv2 releases the GIL."""
+    with ThreadPoolExecutor() as executor:
+        return list(executor.map(lambda path: is_blank_image(image_bytes(path), threshold), image_paths))
 
 
 def matplotlib_chart(img_bytes: bytes) -> bytes:
     """Generates a matplotlib chart from the image bytes and returns it as PNG bytes."""
 
+    plt = _pyplot()
     image = PIL.Image.open(io.BytesIO(img_bytes))
     fig, ax = plt.subplots(figsize=(10, 6), dpi=200)
 
@@ -65,28 +98,114 @@ def matplotlib_chart(img_bytes: bytes) -> bytes:
     return buffer.getvalue()
 
 
-def crop_image(img_bytes: bytes, crop: CropCoordinates) -> bytes:
-    """Crops the image bytes according to the provided coordinates and returns the cropped image as bytes."""
+class DecodedImageCache:
+    """
+    Least recently used cache of decoded images by path, holding at most max_bytes of pixels. Images are cropped and
+    drawn on several times while their crop is worked out, this way they are only read and decoded once.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.images: OrderedDict[str, np.ndarray] = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, image_path: str) -> np.ndarray:
+        with self.lock:
+            if image_path in self.images:
+                self.images.move_to_end(image_path)
+                return self.images[image_path]
+
+        # decoding happens outside the lock, two threads may decode the same image but neither waits on the other
+        image = decode_image(image_bytes(image_path))
+        image.flags.writeable = False
+
+        with self.lock:
+            if image_path not in self.images:
+                self.images[image_path] = image
+                self.size += image.nbytes
+            while self.size > self.max_bytes and len(self.images) > 1:
+                _, evicted = self.images.popitem(last=False)
+                self.size -= evicted.nbytes
+        return image
 
-    image = PIL.Image.open(io.BytesIO(img_bytes))
-    cropped_image = image.crop((crop.top_left_x, crop.top_left_y, crop.bottom_right_x, crop.bottom_right_y))
-    buffer = io.BytesIO()
-    cropped_image.save(buffer, format="png")
-    buffer.seek(0)
-    return buffer.getvalue()
 
+_decoded_images = DecodedImageCache(DECODED_CACHE_BYTES)
 
-def visualize_crop_extents(image_bytes: bytes, top_left_x, top_left_y, bottom_right_x, bottom_right_y) -> bytes:
+
+def decoded_image(image_path: str) -> np.ndarray:
+    """Returns the decoded pixels of the image at the path, read-only as they are shared through a cache."""
+    return _decoded_images.get(image_path)
+
+
+def decode_image(image_bytes: bytes) -> np.ndarray:
+    """Decodes image bytes keeping their channels, including any alpha."""
+    import cv2
+
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_UNCHANGED)
+    assert image is not None, "Image could not be decoded from bytes."
+    return image
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    import cv2
+
+    return bytes(cv2.imencode(".png", image)[1])
+
+
+def downscaled_image(image_bytes: bytes, max_side: int | None, image_format: str, quality: int) -> bytes:
     """
-    Draws a transparent rectangle on the image to visualize the crop coordinates.
+    Shrinks an image so its longest side is at most max_side pixels, never enlarging it, and encodes it as png or jpeg
+    at the given quality. Transparent pixels are flattened onto white for jpeg.
     """
-    im = PIL.Image.open(io.BytesIO(image_bytes))
-    draw = PIL.ImageDraw.Draw(im)
+    import cv2
 
-    # Draw a semi-transparent rectangle
-    draw.rectangle([top_left_x, top_left_y, bottom_right_x, bottom_right_y], outline="red", width=2)
+    image = decode_image(image_bytes)
+    height, width = image.shape[:2]
+    if max_side and max(width, height) > max_side:
+        scale = max_side / max(width, height)
+        size = (max(round(width * scale), 1), max(round(height * scale), 1))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
 
-    buf = io.BytesIO()
-    im.save(buf, format="PNG")
-    buf.seek(0)
-    return buf.read()
+    if image_format == "png":
+        return encode_png(image)
+
+    if image.ndim == 3 and image.shape[2] == 4:
+        alpha = image[..., 3:].astype(np.float32) / 255
+        image = (image[..., :3] * alpha + 255 * (1 - alpha)).astype(np.uint8)
+    return bytes(cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1])
+
+
+def crop_image(image: np.ndarray, crop: CropCoordinates) -> bytes:
+    """
+    Crops the decoded image to the coordinates and returns the crop as PNG bytes. As with PIL, which we used to crop
+    with, any part of the crop outside the image is filled with zeros, i.e. black or transparent. A box whose bottom
+    right is above or left of its top left, which PIL refused, is cropped as a single pixel.
+    """
+    height, width = image.shape[:2]
+    x0, y0 = crop.top_left_x, crop.top_left_y
+    x1, y1 = max(crop.bottom_right_x, x0 + 1), max(crop.bottom_right_y, y0 + 1)
+
+    cropped = np.zeros((y1 - y0, x1 - x0, *image.shape[2:]), dtype=image.dtype)
+    left, top, right, bottom = max(x0, 0), max(y0, 0), min(x1, width), min(y1, height)
+    if left < right and top < bottom:
+        cropped[top - y0 : bottom - y0, left - x0 : right - x0] = image[top:bottom, left:right]
+    return encode_png(cropped)
+
+
+def visualize_crop_extents(image: np.ndarray, top_left_x, top_left_y, bottom_right_x, bottom_right_y) -> bytes:
+    """
+    Draws a red rectangle on a copy of the decoded image to visualize the crop coordinates.
+    """
+    import cv2
+
+    # colors are drawn in BGR order, grayscale images are converted so the rectangle stands out
+    if image.ndim == 2:
+        im = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        red: tuple[int, ...] = (0, 0, 255)
+    else:
+        im = image.copy()
+        red = (0, 0, 255, 255) if image.shape[2] == 4 else (0, 0, 255)
+
+    cv2.rectangle(im, (top_left_x, top_left_y), (bottom_right_x, bottom_right_y), red, 2)
+    return encode_png(im)
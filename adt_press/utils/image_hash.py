@@ -0,0 +1,95 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Generic, TypeVar
+
+import numpy as np
+
+from adt_press.utils.image import image_bytes
+
+T = TypeVar("T")
+
+# images are shrunk to HASH_SIZE * 4 pixels a side and the lowest HASH_SIZE frequencies of each direction are kept
+HASH_SIZE = 8
+
+
+def phash(image_bytes: bytes) -> int:
+    """
+    Returns the 64 bit perceptual hash of an image. Each bit is whether one of the lowest frequencies of the image is
+    above their median, so images that only differ in small details, compression or scale get the same or close hashes.
+    """
+    import cv2
+
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    assert image is not None, "Image could not be decoded from bytes."
+
+    small = cv2.resize(image, (HASH_SIZE * 4, HASH_SIZE * 4), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:HASH_SIZE, :HASH_SIZE].flatten()
+
+    # the first coefficient is the average brightness, which would otherwise dominate the median
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def phashes(image_paths: list[str]) -> list[int]:
+    """Hashes the images on a thread pool, as cv2 releases the GIL while decoding."""
+    with ThreadPoolExecutor() as executor:
+        return list(executor.map(lambda path: phash(image_bytes(path)), image_paths))
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree(Generic[T]):
+    """
+    Burkhard-Keller tree of hashes, finding all hashes within a hamming distance of another without comparing it to
+    every hash. Each child of a node is at a different distance from it, and by the triangle inequality a search only
+    needs to visit children whose distance is within max_distance of the query's distance to their parent.
+    """
+
+    def __init__(self) -> None:
+        self.root: tuple[int, T, dict[int, tuple]] | None = None
+
+    def add(self, item_hash: int, item: T) -> None:
+        if self.root is None:
+            self.root = (item_hash, item, {})
+            return
+
+        node = self.root
+        while True:
+            distance = hamming(item_hash, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (item_hash, item, {})
+                return
+            node = child
+
+    def search(self, item_hash: int, max_distance: int) -> list[tuple[int, T]]:
+        """Returns the distance and item of every hash within max_distance of item_hash."""
+        found: list[tuple[int, T]] = []
+        nodes = [self.root] if self.root else []
+        while nodes:
+            node_hash, item, children = nodes.pop()
+            distance = hamming(item_hash, node_hash)
+            if distance <= max_distance:
+                found.append((distance, item))
+
+            nodes.extend(child for d, child in children.items() if distance - max_distance <= d <= distance + max_distance)
+        return found
+
+
+def near_duplicates(ids: list[str], hashes: list[int], max_distance: int) -> dict[str, str]:
+    """
+    Returns the id of each near duplicate mapped to the id it duplicates, the closest earlier id within max_distance
+    that isn't a duplicate itself. Duplicates of duplicates aren't followed, so ids never drift further than max_distance.
+    """
+    tree: BKTree[int] = BKTree()
+    duplicates = {}
+    for index, (item_id, item_hash) in enumerate(zip(ids, hashes)):
+        found = tree.search(item_hash, max_distance)
+        if found:
+            # the earliest id wins ties
+            _, original = min(found)
+            duplicates[item_id] = ids[original]
+        else:
+            tree.add(item_hash, index)
+    return duplicates
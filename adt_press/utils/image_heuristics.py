@@ -0,0 +1,113 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from pydantic import BaseModel
+
+from adt_press.models.image import ImageHeuristicScore
+from adt_press.utils.image import image_bytes
+from adt_press.utils.image_hash import BKTree, phash
+
+# images are scored on thumbnails with their longest side shrunk to this many pixels
+THUMBNAIL_SIDE = 256
+
+# edge density at which an image counts as fully detailed, photos and illustrations are usually well above it
+DETAILED_EDGE_DENSITY = 0.08
+
+# number of colors, quantized to 4 bits per channel, at which an image counts as fully colorful
+COLORFUL_COLORS = 512
+
+# images repeated this close across pages are the same ornament, not a similar looking illustration
+REPEAT_DISTANCE = 2
+
+
+class ImageFeatures(BaseModel):
+    entropy: float
+    edge_density: float
+    colors: int
+    aspect_ratio: float
+    phash: int
+
+
+def image_features(image_bytes: bytes) -> ImageFeatures:
+    """Measures how rich an image is on a thumbnail of it."""
+    import cv2
+
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_REDUCED_COLOR_2)
+    assert image is not None, "Image could not be decoded from bytes."
+    height, width = image.shape[:2]
+
+    scale = min(THUMBNAIL_SIDE / max(width, height), 1.0)
+    thumbnail = cv2.resize(image, (max(round(width * scale), 1), max(round(height * scale), 1)), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+
+    histogram = np.bincount(gray.flatten(), minlength=256) / gray.size
+    histogram = histogram[histogram > 0]
+    entropy = float(-np.sum(histogram * np.log2(histogram)))
+
+    edges = cv2.Canny(gray, 100, 200)
+    quantized = (thumbnail >> 4).astype(np.int32)
+    colors = np.unique(quantized[..., 0] << 8 | quantized[..., 1] << 4 | quantized[..., 2]).size
+
+    return ImageFeatures(
+        entropy=entropy,
+        edge_density=float(np.count_nonzero(edges) / edges.size),
+        colors=int(colors),
+        aspect_ratio=max(width, height) / min(width, height),
+        phash=phash(image_bytes),
+    )
+
+
+def repeated_pages(page_ids: list[str], hashes: list[int]) -> list[int]:
+    """Counts the pages each image appears on, as images with hashes within REPEAT_DISTANCE of each other."""
+    tree: BKTree[int] = BKTree()
+    for index, image_hash in enumerate(hashes):
+        tree.add(image_hash, index)
+
+    return [len({page_ids[i] for _, i in tree.search(image_hash, REPEAT_DISTANCE)}) for image_hash in hashes]
+
+
+def heuristic_score(features: ImageFeatures, pages: int, strip_aspect: float, repeated_on: int) -> tuple[float, str]:
+    """
+    Scores from 0 to 1 how much an image looks like a photo or illustration rather than a decoration, with the reasoning.
+
+    The score is the geometric mean of the image's entropy, edge density and colors, each scaled from 0 to 1, so an image
+    lacking any of them, like a smooth gradient without edges or a two color ornament, scores low. Thin strips such as
+    rules and images repeated on many pages such as page ornaments are scored lower still.
+    """
+    richness = [
+        features.entropy / 8,
+        min(features.edge_density / DETAILED_EDGE_DENSITY, 1.0),
+        min(math.log(features.colors) / math.log(COLORFUL_COLORS), 1.0),
+    ]
+    score = math.prod(max(r, 0.01) for r in richness) ** (1 / len(richness))
+
+    reasons = [
+        f"entropy {features.entropy:.1f} bits",
+        f"edge density {features.edge_density:.3f}",
+        f"{features.colors} colors",
+        f"aspect ratio {features.aspect_ratio:.1f}",
+    ]
+    if features.aspect_ratio > strip_aspect:
+        score *= strip_aspect / features.aspect_ratio
+        reasons.append("thin strip")
+    if pages >= repeated_on:
+        score /= 2
+        reasons.append(f"repeated on {pages} pages")
+
+    return score, ", ".join(reasons)
+
+
+def heuristic_scores(
+    image_ids: list[str], image_paths: list[str], page_ids: list[str], strip_aspect: float, repeated_on: int
+) -> list[ImageHeuristicScore]:
+    """Scores the images, measuring them on a thread pool as cv2 releases the GIL."""
+    with ThreadPoolExecutor() as executor:
+        features = list(executor.map(lambda path: image_features(image_bytes(path)), image_paths))
+
+    pages = repeated_pages(page_ids, [f.phash for f in features])
+    scores = []
+    for image_id, f, p in zip(image_ids, features, pages):
+        score, reasoning = heuristic_score(f, p, strip_aspect, repeated_on)
+        scores.append(ImageHeuristicScore(image_id=image_id, score=score, reasoning=reasoning))
+    return scores
@@ -1,10 +1,12 @@
 import functools
+import hashlib
 import json
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Callable, TypeVar, cast
 
 from pydantic import BaseModel
+from pydantic_core import to_json
 
 F = TypeVar("F", bound=Callable[..., Any])
 
@@ -23,6 +25,31 @@ def json_serializer(obj: Any) -> Any:
         return str(obj)
 
 
+def type_name(value: Any) -> str:
+    """Short description of a value's type, including the type of its first item for dicts and lists."""
+    name = type(value).__name__
+    if isinstance(value, dict) and value:
+        key, item = next(iter(value.items()))
+        return f"{name}[{type(key).__name__}, {type(item).__name__}]"
+    elif isinstance(value, (list, tuple, set, frozenset)) and value:
+        return f"{name}[{type(next(iter(value))).__name__}]"
+    return name
+
+
+def summarize_value(value: Any) -> dict[str, Any]:
+    """
+    Compact description of a value for logging: its type, number of items, approximate size in bytes when serialized
+    to JSON and a hash of that serialization, so large results can be told apart without writing them out.
+    """
+    serialized = to_json(value, fallback=str)
+    summary: dict[str, Any] = dict(type=type_name(value))
+    if isinstance(value, (dict, list, tuple, set, frozenset, str, bytes)):
+        summary["count"] = len(value)
+    summary["bytes"] = len(serialized)
+    summary["hash"] = hashlib.sha256(serialized).hexdigest()[:16]
+    return summary
+
+
 def io_logger(
     label: str,
 ) -> Callable[[F], F]:
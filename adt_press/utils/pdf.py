@@ -32,6 +32,14 @@ def _copy_image(extract_dir: str, images_dir: str, relative_path: str) -> str:
     return os.path.relpath(new_path)
 
 
+def pdf_page_count(pdf_path: str) -> int:
+    # pymupdf is otherwise only used by the standalone extractor, so only import it when needed
+    import pymupdf
+
+    with pymupdf.open(pdf_path) as doc:
+        return len(doc)
+
+
 def pages_for_pdf(output_dir: str, pdf_path: str, start_page: int, end_page: int) -> list[Page]:
     """
     Extract pages from PDF using the standalone pdf_extractor tool.
@@ -0,0 +1,139 @@
+import json
+import os
+import time
+
+from adt_press.models.queue import Job, JobUsage
+from adt_press.utils.file import read_file, read_text_file, write_file, write_text_file
+
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+FAILED = "failed"
+USAGE = "usage"
+
+
+class FileJobQueue:
+    """
+    Job queue backed by a plain directory, with one file per job moved between state directories:
+
+        pending/<job_id>.json   queued, waiting for a worker
+        claimed/<job_id>.json   being executed by a worker
+        done/<job_id>           the result, which doubles as a per item cache
+        failed/<job_id>.json    the error of the last attempt
+        usage/<job_id>.json     the tokens and cost the worker used for the result, if known
+
+    Claims rely on rename being atomic, so the directory can be on a shared filesystem (e.g. NFS) used by workers on
+    several machines, standing in for a real broker.
+    """
+
+    def __init__(self, path: str, claim_timeout: float = 900):
+        self.path = path
+        self.claim_timeout = claim_timeout
+        for state in (PENDING, CLAIMED, DONE, FAILED, USAGE):
+            os.makedirs(os.path.join(path, state), exist_ok=True)
+
+    def _path(self, state: str, job_id: str) -> str:
+        suffix = "" if state == DONE else ".json"
+        return os.path.join(self.path, state, f"{job_id}{suffix}")
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        write_file(tmp_path, data)
+        os.replace(tmp_path, path)
+
+    def enqueue(self, job: Job, retry_failure: str | None = None) -> None:
+        """
+        Queues the job unless it is already queued, running, done or failed. A failure is only cleared, and the job
+        queued again, if its error is retry_failure, so a failure recorded after the caller last looked is never hidden.
+        """
+        if os.path.exists(self._path(DONE, job.job_id)) or os.path.exists(self._path(CLAIMED, job.job_id)):
+            return
+
+        if os.path.exists(self._path(FAILED, job.job_id)):
+            if retry_failure is None or self.error(job.job_id) != retry_failure:
+                return
+            os.remove(self._path(FAILED, job.job_id))
+
+        if not os.path.exists(self._path(PENDING, job.job_id)):
+            self._write_atomic(self._path(PENDING, job.job_id), job.model_dump_json().encode("utf-8"))
+
+    def claim(self) -> Job | None:
+        """Claims the oldest pending job, returning None if there is nothing to do."""
+        entries = []
+        for entry in os.scandir(os.path.join(self.path, PENDING)):
+            try:
+                if entry.name.endswith(".json"):
+                    entries.append((entry.stat().st_mtime, entry))
+            except FileNotFoundError:  # pragma: no cover
+                continue
+
+        for _, entry in sorted(entries, key=lambda e: e[0]):
+            job_id = entry.name.removesuffix(".json")
+            claimed_path = self._path(CLAIMED, job_id)
+            try:
+                os.rename(entry.path, claimed_path)
+            except FileNotFoundError:
+                # another worker got there first
+                continue
+
+            # the claim time is used to detect workers that died
+            os.utime(claimed_path)
+            return Job.model_validate_json(read_file(claimed_path))
+
+        return None
+
+    def refresh_claim(self, job_id: str) -> None:
+        """Marks a claimed job as still being executed, so it isn't requeued as stale."""
+        try:
+            os.utime(self._path(CLAIMED, job_id))
+        except FileNotFoundError:  # pragma: no cover
+            pass
+
+    def complete(self, job_id: str, result: bytes, usage: JobUsage | None = None) -> None:
+        # the usage is written first, so it is there once the result is
+        if usage:
+            self._write_atomic(self._path(USAGE, job_id), usage.model_dump_json().encode("utf-8"))
+        self._write_atomic(self._path(DONE, job_id), result)
+        self._release(job_id)
+
+    def fail(self, job_id: str, error: str) -> None:
+        write_text_file(self._path(FAILED, job_id), json.dumps(dict(job_id=job_id, error=error)))
+        self._release(job_id)
+
+    def _release(self, job_id: str) -> None:
+        try:
+            os.remove(self._path(CLAIMED, job_id))
+        except FileNotFoundError:  # pragma: no cover
+            pass
+
+    def is_queued(self, job_id: str) -> bool:
+        """Returns whether the job is waiting for or being executed by a worker."""
+        return os.path.exists(self._path(PENDING, job_id)) or os.path.exists(self._path(CLAIMED, job_id))
+
+    def result(self, job_id: str) -> bytes | None:
+        path = self._path(DONE, job_id)
+        return read_file(path) if os.path.exists(path) else None
+
+    def usage(self, job_id: str) -> JobUsage | None:
+        path = self._path(USAGE, job_id)
+        return JobUsage.model_validate_json(read_file(path)) if os.path.exists(path) else None
+
+    def error(self, job_id: str) -> str | None:
+        path = self._path(FAILED, job_id)
+        return str(json.loads(read_text_file(path))["error"]) if os.path.exists(path) else None
+
+    def requeue_stale(self) -> int:
+        """Moves jobs claimed longer than claim_timeout ago back to pending, returning how many were requeued."""
+        requeued = 0
+        now = time.time()
+        for entry in os.scandir(os.path.join(self.path, CLAIMED)):
+            if now - entry.stat().st_mtime > self.claim_timeout:
+                try:
+                    os.rename(entry.path, os.path.join(self.path, PENDING, entry.name))
+                    requeued += 1
+                except FileNotFoundError:  # pragma: no cover
+                    continue
+        return requeued
+
+    def counts(self) -> dict[str, int]:
+        return {state: len(os.listdir(os.path.join(self.path, state))) for state in (PENDING, CLAIMED, DONE, FAILED)}
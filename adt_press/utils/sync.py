@@ -1,4 +1,6 @@
 import asyncio
+import threading
+import time
 from typing import Any, Awaitable, Callable, Coroutine, List, Never, TypeVar
 
 from asynciolimiter import Limiter
@@ -12,14 +14,77 @@ def run_async_task(task: Callable[[], Coroutine[Any, Any, T]]) -> T:
     return asyncio.run(task())
 
 
-async def gather_with_limit(fs: List[Awaitable[Never]], rate_limit: int) -> List[T]:
-    """Gather async tasks with a rate limit."""
-    rate_limiter = Limiter(rate_limit / 60)  # ops/sec
-    concurrency_limiter = asyncio.Semaphore(100)  # max concurrent tasks
+class _Gauges(threading.local):
+    def __init__(self) -> None:
+        self.queued = 0
+        self.in_flight = 0
+        self.peak_queued = 0
+        self.peak_in_flight = 0
 
-    async def run_task(f: Awaitable[T]) -> T:
-        async with concurrency_limiter:
-            await rate_limiter.wait()
-            return await f
 
-    return await asyncio.gather(*(run_task(f) for f in fs))
+# like LLM calls, gauges are kept per thread as each node runs its tasks on its own thread and event loop
+_gauges = _Gauges()
+
+
+def reset_gauges() -> None:
+    """Starts measuring the tasks of a new node on this thread."""
+    _gauges.queued = 0
+    _gauges.in_flight = 0
+    _gauges.peak_queued = 0
+    _gauges.peak_in_flight = 0
+
+
+def peak_gauges() -> tuple[int, int]:
+    """Returns the most tasks waiting on a limit and the most tasks in flight on this thread since the last reset."""
+    return _gauges.peak_queued, _gauges.peak_in_flight
+
+
+class TaskLimiter:
+    """Runs tasks at most rate_limit per minute with at most max_concurrency of them in flight at once."""
+
+    def __init__(self, rate_limit: int, max_concurrency: int):
+        self.rate_limiter = Limiter(rate_limit / 60)  # ops/sec
+        self.concurrency_limiter = asyncio.Semaphore(max_concurrency)
+
+    async def run(self, f: Awaitable[T]) -> T:
+        _gauges.queued += 1
+        _gauges.peak_queued = max(_gauges.peak_queued, _gauges.queued)
+
+        async with self.concurrency_limiter:
+            await self.rate_limiter.wait()
+            _gauges.queued -= 1
+            _gauges.in_flight += 1
+            _gauges.peak_in_flight = max(_gauges.peak_in_flight, _gauges.in_flight)
+            try:
+                return await f
+            finally:
+                _gauges.in_flight -= 1
+
+
+async def gather_with_limit(fs: List[Awaitable[Never]], rate_limit: int, max_concurrency: int) -> List[T]:
+    """Gather async tasks with a rate limit and a limit on how many run at once."""
+    limiter = TaskLimiter(rate_limit, max_concurrency)
+    return await asyncio.gather(*(limiter.run(f) for f in fs))
+
+
+class RateLimiter:
+    """
+    Rate limiter that can be shared across threads and event loops, spacing calls evenly at rate_limit per minute.
+
+    Each node runs its own event loop, so unlike asynciolimiter's Limiter this one is safe to share between nodes and
+    between books running concurrently in the same process.
+    """
+
+    def __init__(self, rate_limit: int):
+        self.interval = 60 / rate_limit
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    async def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
@@ -0,0 +1,53 @@
+import math
+
+from adt_press.models.telemetry import FamilyTelemetry, LLMCall, RunTelemetry
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Returns the nearest rank p-th percentile of values, 0 if there are none."""
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize_calls(calls: list[LLMCall]) -> RunTelemetry:
+    """Rolls the calls of a run up per prompt family."""
+    by_family: dict[str, list[LLMCall]] = {}
+    for call in calls:
+        by_family.setdefault(call.family, []).append(call)
+
+    families = []
+    for family, family_calls in sorted(by_family.items()):
+        # cached calls return immediately, so they'd hide the latency of actual requests
+        latencies = [c.latency_seconds for c in family_calls if not c.cached]
+        costs = [c.cost for c in family_calls if not c.cached and c.attempts]
+
+        families.append(
+            FamilyTelemetry(
+                family=family,
+                calls=len(family_calls),
+                cached=sum(1 for c in family_calls if c.cached),
+                errors=sum(1 for c in family_calls if c.error),
+                p50_seconds=percentile(latencies, 50),
+                p95_seconds=percentile(latencies, 95),
+                p99_seconds=percentile(latencies, 99),
+                prompt_tokens=sum(c.prompt_tokens for c in family_calls),
+                completion_tokens=sum(c.completion_tokens for c in family_calls),
+                cached_tokens=sum(c.cached_tokens for c in family_calls),
+                retries=sum(max(c.attempts - 1, 0) for c in family_calls),
+                validation_errors=sum(len(c.validation_errors) for c in family_calls),
+                cost=None if None in costs else sum(c or 0 for c in costs),
+            )
+        )
+
+    # families we don't know the price of don't hide the cost of the others
+    costs = [f.cost for f in families if f.cost is not None]
+    return RunTelemetry(
+        calls=len(calls),
+        families=families,
+        cost=sum(costs) if costs else None,
+        unpriced_families=[f.family for f in families if f.cost is None],
+    )
@@ -0,0 +1,88 @@
+import asyncio
+import os
+import socket
+import time
+
+import structlog
+
+from adt_press.llm.gateway import gateway, import_response_model, litellm_completion, litellm_speech
+from adt_press.models.queue import Job, JobUsage
+from adt_press.models.telemetry import LLMCall
+from adt_press.utils.queue import FileJobQueue
+
+log = structlog.get_logger()
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+async def execute_job(job: Job) -> tuple[bytes, JobUsage | None]:
+    """
+    Executes a queued LLM request locally, returning the bytes the queuing gateway expects as its result and, for
+    completions, the tokens and cost they used.
+    """
+    # e.g. a fake worker must never answer a real run with made up responses
+    if job.backend != gateway.backend:
+        raise ValueError(f"Job is meant for the {job.backend} backend, this worker uses {gateway.backend}")
+
+    await gateway.wait(job.model)
+
+    if job.kind == "completion":
+        response_model = import_response_model(job.response_model)
+        call = LLMCall(family=job.family, model=job.model, kind=job.kind, started_at=time.time())
+        response = await litellm_completion(job.model, job.max_retries, response_model, job.messages, telemetry=call, **job.kwargs)
+        return response.model_dump_json().encode("utf-8"), JobUsage.model_validate(call.model_dump(include=set(JobUsage.model_fields)))
+    elif job.kind == "speech":
+        # the queuing gateway prices speech itself, from the length of its text
+        return await litellm_speech(job.model, **job.kwargs), None
+
+    raise ValueError(f"Unknown job kind: {job.kind}")
+
+
+async def run_worker(queue: FileJobQueue, concurrency: int = 8, idle_timeout: float = 0, poll_interval: float = 1.0) -> int:
+    """
+    Claims and executes jobs from the queue, committing their results, until the queue has been empty for
+    idle_timeout seconds. An idle_timeout of 0 runs forever. Returns the number of jobs executed.
+    """
+    executed = 0
+    running: set[asyncio.Task] = set()
+    last_active = time.monotonic()
+
+    async def keep_claimed(job: Job) -> None:
+        # jobs retrying for longer than claim_timeout would otherwise be requeued and executed twice
+        while True:
+            await asyncio.sleep(queue.claim_timeout / 3)
+            queue.refresh_claim(job.job_id)
+
+    async def run_job(job: Job) -> None:
+        nonlocal executed
+        log.info("job claimed", job_id=job.job_id, family=job.family, worker=worker_id())
+        claim = asyncio.create_task(keep_claimed(job))
+        try:
+            queue.complete(job.job_id, *await execute_job(job))
+            log.info("job complete", job_id=job.job_id, family=job.family)
+        except Exception as e:
+            log.exception("job failed", job_id=job.job_id, family=job.family)
+            queue.fail(job.job_id, f"{type(e).__name__}: {e}")
+        finally:
+            claim.cancel()
+        executed += 1
+
+    while True:
+        # claim as many jobs as we have capacity for
+        while len(running) < concurrency:
+            job = queue.claim()
+            if job is None:
+                break
+
+            task = asyncio.create_task(run_job(job))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+        if running:
+            last_active = time.monotonic()
+        elif idle_timeout and time.monotonic() - last_active > idle_timeout:
+            return executed
+
+        await asyncio.sleep(poll_interval)
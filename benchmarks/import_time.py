@@ -0,0 +1,88 @@
+"""
+Tracks how long it takes to import adt-press, using `python -X importtime`.
+
+    uv run python benchmarks/import_time.py [runs=5] [threshold=1.25] [update=false]
+
+Each module is imported in a fresh interpreter several times and the fastest run is compared against the baseline in
+benchmarks/baselines/import_time.json, failing if it is more than threshold times slower. Pass update=true to record a
+new baseline. It also fails if any of the slow optional libraries are imported eagerly again.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from omegaconf import OmegaConf
+
+# modules whose import time we track
+MODULES = ["adt_press.pipeline", "adt_press.batch", "adt_press.worker"]
+
+# libraries that must only be imported once they are actually used
+LAZY_MODULES = ["litellm", "instructor", "mlflow", "langfuse", "matplotlib", "cv2", "bs4"]
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "import_time.json")
+
+
+def import_profile(module: str) -> dict[str, int]:
+    """Imports module in a fresh interpreter, returning the cumulative import time of every module in microseconds."""
+    env = {k: v for k, v in os.environ.items() if k not in ("LANGFUSE_HOST", "MLFLOW_TRACKING_URI")}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True, env=env
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main() -> None:
+    cli_config = OmegaConf.from_cli()
+    runs = int(cli_config.get("runs", 5))
+    threshold = float(cli_config.get("threshold", 1.25))
+    update = bool(cli_config.get("update", False))
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    failures = []
+    results = {}
+    for module in MODULES:
+        profiles = [import_profile(module) for _ in range(runs)]
+        fastest = min(profiles, key=lambda p: p[module])
+        results[module] = round(fastest[module] / 1000, 1)
+
+        eager = [m for m in LAZY_MODULES if m in fastest]
+        if eager:
+            failures.append(f"{module} eagerly imports {', '.join(eager)}")
+
+        expected = baseline.get(module)
+        status = ""
+        if expected and results[module] > expected * threshold:
+            status = "REGRESSION"
+            failures.append(f"{module} took {results[module]}ms, baseline is {expected}ms")
+        print(f"{module:<30} {results[module]:>10.1f}ms {'' if expected is None else f'(baseline {expected}ms)':>22} {status}")
+
+        # the slowest top level imports, to help find the culprit of a regression
+        top_level = sorted(((t, m) for m, t in fastest.items() if m != module and "." not in m), reverse=True)[:5]
+        for t, m in top_level:
+            print(f"    {m:<26} {t / 1000:>10.1f}ms")
+
+    if update:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Updated baseline at {BASELINE_PATH}")
+    elif failures:
+        print("\n".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmarks full pipeline runs against the fake LLM backend, so the time measured is spent in adt-press itself.
+
+    uv run python benchmarks/pipeline.py [books=[50,500,2000]] [images_per_page=1] [drawings_per_page=4] [pdfs=[]]
+        [latency=0] [error_rate=0] [threshold=1.25]
+
+A synthetic book is generated for each page count in books (see benchmarks/synthetic.py), pdfs adds real books. Each
+book is converted from scratch in its own process, recording its wall time, the time of each node, the peak memory of
+the pipeline and the pdf extractor, and the size of its outputs. Pass latency to simulate how long requests take and
+error_rate to have some of them fail and be retried.
+
+Results are compared against the median of the last runs of the same book in benchmarks/history/pipeline.json,
+failing if the wall time or peak memory grew more than threshold times. Passing runs are appended to the history.
+"""
+
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from omegaconf import DictConfig, OmegaConf
+from synthetic import synthetic_pdf
+
+from adt_press.models.profile import RunProfile
+from adt_press.pipeline import run_pipeline
+
+HISTORY_PATH = os.path.join(os.path.dirname(__file__), "history", "pipeline.json")
+
+# number of previous runs of a book its results are compared against
+HISTORY_RUNS = 5
+
+
+def output_sizes(run_output_dir: str) -> dict[str, int]:
+    """Returns the bytes written to each top level entry of the run's output directory, leaving out the cache."""
+    sizes = {}
+    for entry in sorted(os.listdir(run_output_dir)):
+        path = os.path.join(run_output_dir, entry)
+        if entry == "cache":
+            continue
+        if os.path.isfile(path):
+            sizes[entry] = os.path.getsize(path)
+            continue
+        sizes[entry] = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+    return sizes
+
+
+def run_book(pdf_path: str, latency: float, error_rate: float) -> dict:
+    """Converts every page of pdf_path with fake LLM responses, returning the measurements of the run."""
+    label = os.path.splitext(os.path.basename(pdf_path))[0]
+    with tempfile.TemporaryDirectory() as output_dir:
+        overrides = dict(
+            label=label,
+            pdf_path=pdf_path,
+            output_dir=output_dir,
+            llm_backend="fake",
+            fake_llm=dict(latency=latency, error_rate=error_rate),
+        )
+        config = DictConfig(OmegaConf.merge(OmegaConf.load("config/config.yaml"), overrides))
+        run_pipeline(config)
+
+        run_output_dir = os.path.join(output_dir, label)
+        with open(os.path.join(run_output_dir, "profile.json")) as f:
+            profile = RunProfile.model_validate_json(f.read())
+        sizes = output_sizes(run_output_dir)
+
+    # ru_maxrss is in kilobytes on linux, the extractor runs as a child process
+    return dict(
+        wall_seconds=round(profile.wall_seconds, 2),
+        peak_rss_bytes=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        extractor_peak_rss_bytes=resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+        output_bytes=sum(sizes.values()),
+        outputs=sizes,
+        stages={n.node_name: round(n.wall_seconds, 3) for n in profile.nodes},
+    )
+
+
+def run_isolated(pdf_path: str, latency: float, error_rate: float) -> dict:
+    """Runs the book in a fresh process, so its peak memory isn't that of a previous book."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(run_book, pdf_path, latency, error_rate).result()
+
+
+def git_commit() -> str:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+def regressions(result: dict, history: list[dict], threshold: float) -> list[str]:
+    """Returns how result is worse than the median of the latest runs of the same book in history."""
+    previous = [h for h in history if h["name"] == result["name"]][-HISTORY_RUNS:]
+    if not previous:
+        return []
+
+    failures = []
+    for metric in ("wall_seconds", "peak_rss_bytes"):
+        expected = statistics.median(h[metric] for h in previous)
+        if expected and result[metric] > expected * threshold:
+            failures.append(f"{result['name']} {metric} was {result[metric]}, median of the last runs is {expected}")
+    return failures
+
+
+def main() -> None:
+    cli_config = OmegaConf.from_cli()
+    books = [int(p) for p in cli_config.get("books", [50, 500, 2000])]
+    images_per_page = int(cli_config.get("images_per_page", 1))
+    drawings_per_page = int(cli_config.get("drawings_per_page", 4))
+    pdfs = [str(p) for p in cli_config.get("pdfs", [])]
+    latency = float(cli_config.get("latency", 0))
+    error_rate = float(cli_config.get("error_rate", 0))
+    threshold = float(cli_config.get("threshold", 1.25))
+
+    history = []
+    if os.path.exists(HISTORY_PATH):
+        with open(HISTORY_PATH) as f:
+            history = json.load(f)
+
+    failures = []
+    results = []
+    with tempfile.TemporaryDirectory() as books_dir:
+        paths = []
+        for pages in books:
+            path = os.path.join(books_dir, f"synthetic_{pages}.pdf")
+            synthetic_pdf(path, pages, images_per_page=images_per_page, drawings_per_page=drawings_per_page)
+            paths.append((f"synthetic pages={pages} images={images_per_page} drawings={drawings_per_page}", path))
+        paths.extend((os.path.basename(p), p) for p in pdfs)
+
+        for name, path in paths:
+            name = f"{name} latency={latency} error_rate={error_rate}"
+            result = dict(name=name, commit=git_commit(), recorded_at=time.time(), **run_isolated(path, latency, error_rate))
+            results.append(result)
+
+            failed = regressions(result, history, threshold)
+            failures.extend(failed)
+            status = "REGRESSION" if failed else ""
+            print(
+                f"{name:<70} {result['wall_seconds']:>8.2f}s {result['peak_rss_bytes'] / 2**20:>8.0f}MB "
+                f"{result['output_bytes'] / 2**20:>8.1f}MB out {status}"
+            )
+
+            # the slowest nodes, to help find the culprit of a regression
+            for node_name, seconds in sorted(result["stages"].items(), key=lambda s: s[1], reverse=True)[:5]:
+                print(f"    {node_name:<66} {seconds:>8.2f}s")
+
+    if failures:
+        print("\n".join(failures))
+        sys.exit(1)
+
+    os.makedirs(os.path.dirname(HISTORY_PATH), exist_ok=True)
+    with open(HISTORY_PATH, "w") as f:
+        json.dump(history + results, f, indent=2)
+    print(f"Recorded results in {HISTORY_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Generates synthetic books to benchmark the pipeline on, with a configurable number of pages, images and drawings.
+
+    uv run python benchmarks/synthetic.py path=book.pdf [pages=50] [images_per_page=1] [drawings_per_page=4] [seed=0]
+
+Every page gets a heading, a few paragraphs, images_per_page distinct raster images and drawings_per_page vector
+shapes, so pages can't be deduplicated and the extractor has to render every drawing.
+"""
+
+import random
+
+import cv2
+import numpy as np
+import pymupdf
+from omegaconf import OmegaConf
+
+WORDS = "the a little fox ran over hill and river under bright moon while children sang songs of morning light".split()
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+MARGIN = 54
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def synthetic_image(rng: random.Random, width: int = 480, height: int = 360) -> bytes:
+    """Returns a png of random shapes on a random background."""
+    image = np.full((height, width, 3), [rng.randint(0, 255) for _ in range(3)], dtype=np.uint8)
+    for _ in range(12):
+        color = [rng.randint(0, 255) for _ in range(3)]
+        center = (rng.randint(0, width), rng.randint(0, height))
+        cv2.circle(image, center, rng.randint(10, height // 3), color, -1)
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+def add_drawing(page: pymupdf.Page, rng: random.Random, area: pymupdf.Rect) -> None:
+    x0, y0 = rng.uniform(area.x0, area.x1 - 60), rng.uniform(area.y0, area.y1 - 60)
+    rect = pymupdf.Rect(x0, y0, x0 + rng.uniform(20, 60), y0 + rng.uniform(20, 60))
+    color = (rng.random(), rng.random(), rng.random())
+
+    shape = rng.choice(["rect", "circle", "curve"])
+    if shape == "rect":
+        page.draw_rect(rect, color=color, fill=color)
+    elif shape == "circle":
+        page.draw_circle(rect.tl + (10, 10), 10, color=color, fill=color)
+    else:
+        page.draw_bezier(rect.tl, rect.tr, rect.bl, rect.br, color=color, width=2)
+
+
+def synthetic_pdf(path: str, pages: int, images_per_page: int = 1, drawings_per_page: int = 4, seed: int = 0) -> None:
+    """Writes a book of the passed in number of pages to path, the same arguments always produce the same book."""
+    rng = random.Random(seed)
+    doc = pymupdf.open()
+    for p in range(pages):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        page.insert_text((MARGIN, MARGIN + 18), f"Chapter {p + 1}: {sentence(rng, 4)}", fontsize=18)
+
+        text = "\n\n".join(sentence(rng, rng.randint(12, 30)) for _ in range(3))
+        page.insert_textbox(pymupdf.Rect(MARGIN, MARGIN + 36, PAGE_WIDTH - MARGIN, PAGE_HEIGHT / 2), text, fontsize=11)
+
+        # images share the bottom half of the page
+        lower = pymupdf.Rect(MARGIN, PAGE_HEIGHT / 2, PAGE_WIDTH - MARGIN, PAGE_HEIGHT - MARGIN)
+        for i in range(images_per_page):
+            width = lower.width / images_per_page
+            page.insert_image(
+                pymupdf.Rect(lower.x0 + i * width, lower.y0, lower.x0 + (i + 1) * width, lower.y1), stream=synthetic_image(rng)
+            )
+
+        for _ in range(drawings_per_page):
+            add_drawing(page, rng, pymupdf.Rect(MARGIN, MARGIN, PAGE_WIDTH - MARGIN, PAGE_HEIGHT - MARGIN))
+
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+
+def main() -> None:
+    cli_config = OmegaConf.from_cli()
+    synthetic_pdf(
+        str(cli_config["path"]),
+        int(cli_config.get("pages", 50)),
+        images_per_page=int(cli_config.get("images_per_page", 1)),
+        drawings_per_page=int(cli_config.get("drawings_per_page", 4)),
+        seed=int(cli_config.get("seed", 0)),
+    )
+
+
+if __name__ == "__main__":
+    main()
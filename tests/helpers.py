@@ -0,0 +1,94 @@
+"""Helpers shared by the tests, e.g. a small Hamilton pipeline captioning words with a fake LLM or pages of images."""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+from hamilton import ad_hoc_utils, driver
+from hamilton.lifecycle import NodeExecutionHook
+from omegaconf import DictConfig
+
+from adt_press.llm.gateway import create_completion
+from adt_press.llm.image_caption import CaptionResponse
+from adt_press.models.config import PromptConfig
+from adt_press.models.pdf import Image, Page
+from adt_press.models.telemetry import LLMCall
+from adt_press.utils.budget import within_budget
+
+PROMPT = PromptConfig(model="gpt-4o", template_path="prompts/image_caption.jinja2", examples=[])
+
+
+def words(count: int) -> list[str]:
+    return [f"word {i}" for i in range(count)]
+
+
+def captions(words: list[str]) -> list[str]:
+    async def caption_all():
+        tasks = [
+            within_budget(create_completion(PROMPT, response_model=CaptionResponse, messages=[{"role": "user", "content": w}]))
+            for w in words
+        ]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    # words stopped by the budget or whose request failed get no caption
+    return [r.caption if isinstance(r, CaptionResponse) else "" for r in asyncio.run(caption_all())]
+
+
+async def fake_completion(model, max_retries, response_model, messages, telemetry: LLMCall | None = None, **kwargs):
+    """Captions each word with itself, each call using 10 prompt tokens and costing $0.10."""
+    if telemetry:
+        telemetry.attempts += 1
+        telemetry.prompt_tokens += 10
+        telemetry.cost = 0.1
+    return response_model(reasoning="", caption=messages[0]["content"])
+
+
+def caption_driver(hook: NodeExecutionHook, cache_path: str | None = None) -> driver.Driver:
+    """Builds a driver captioning words, with results cached at cache_path if given."""
+    builder = driver.Builder().with_modules(ad_hoc_utils.create_temporary_module(words, captions))
+    if cache_path:
+        builder = builder.with_cache(path=cache_path)
+    return builder.with_adapters(hook).build()
+
+
+def run_captions(dr: driver.Driver, count: int, completion=fake_completion) -> list[str]:
+    """Captions count words, answering their requests with completion."""
+    with patch("adt_press.llm.gateway.litellm_completion", completion):
+        return dr.execute(["captions"], inputs={"count": count})["captions"]
+
+
+def page_images(directory: str, page_number: int, count: int, width: int = 400, height: int = 300) -> Page:
+    """Returns a page with count images of random noise, written to directory."""
+    images = []
+    for i in range(count):
+        path = os.path.join(directory, f"img_p{page_number}_r{i}.png")
+        cv2.imwrite(path, np.random.default_rng(i).integers(0, 255, (height, width, 3), dtype=np.uint8))
+        images.append(
+            Image(
+                image_id=f"img_p{page_number}_r{i}",
+                image_path=path,
+                chart_path=path,
+                page_id=f"p{page_number}",
+                index=i,
+                width=width,
+                height=height,
+                image_type="png",
+            )
+        )
+    return Page(page_id=f"p{page_number}", page_number=page_number, page_image_path=images[0].image_path, text="", images=images)
+
+
+class RunTestCase(unittest.TestCase):
+    """Gives each test an empty run_output_dir, removed once it is done."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.config = DictConfig({"run_output_dir": self.temp_dir})
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from omegaconf import DictConfig
+
+from adt_press.batch import run_batch
+from adt_press.llm.gateway import (
+    ResponseCache,
+    configure_backend,
+    configure_queue,
+    create_completion,
+    gateway,
+    request_key,
+)
+from adt_press.llm.image_caption import CaptionResponse
+from adt_press.models.batch import BatchManifest
+from adt_press.models.config import PromptConfig
+from adt_press.pipeline import build_driver, node_hook
+from adt_press.utils.config import load_run_config
+from adt_press.utils.sync import RateLimiter
+
+PROMPT = PromptConfig(model="gpt-4o", template_path="prompts/image_caption.jinja2", examples=[], max_retries=0)
+MESSAGES = [{"role": "user", "content": [{"type": "text", "text": "This is the image, width: 400px, height: 200px:"}]}]
+
+
+class TestBatch(unittest.TestCase):
+    """Test running several books through the batch runner."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        gateway.configure()
+        configure_queue("")
+        configure_backend("litellm")
+
+    def fake_pipeline(self, config: DictConfig, shared_gateway: bool = False):
+        # books must use the gateway configured by the batch
+        self.assertTrue(shared_gateway)
+        if config["label"] == "broken":
+            raise RuntimeError("extraction failed")
+
+        # write an extraction result so the runner can count pages
+        extract_dir = os.path.join(config["run_output_dir"], "extract")
+        os.makedirs(extract_dir, exist_ok=True)
+        with open(os.path.join(extract_dir, "pdf_extract.json"), "w") as f:
+            json.dump({"pages": [{} for _ in range(config["page_range"]["end"])]}, f)
+
+    def test_run_batch_reports_per_book_and_total_throughput(self):
+        manifest = BatchManifest(
+            workers=2,
+            rate_limits={"gpt-5": 600},
+            books=[
+                dict(label="raven", pdf_path="assets/raven.pdf", page_range=dict(start=0, end=3)),
+                dict(label="momo", pdf_path="assets/momo.pdf", page_range=dict(start=0, end=5)),
+                dict(label="broken", pdf_path="assets/broken.pdf"),
+            ],
+        )
+
+        with patch("adt_press.batch.run_pipeline", side_effect=self.fake_pipeline) as mock_pipeline:
+            result = run_batch(manifest, DictConfig({"output_dir": self.temp_dir}))
+
+        self.assertEqual(mock_pipeline.call_count, 3)
+        self.assertEqual([b.label for b in result.books], ["raven", "momo", "broken"])
+        self.assertEqual([b.pages for b in result.books], [3, 5, 0])
+        self.assertEqual([b.success for b in result.books], [True, True, False])
+        self.assertIn("extraction failed", result.books[2].error)
+        self.assertEqual(result.pages, 8)
+
+        # each book gets its own run directory and config file
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, "raven", "config.yaml")))
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, "momo", "config.yaml")))
+
+        # the gateway is configured for the whole batch
+        self.assertIn("gpt-5", gateway.rate_limiters)
+        self.assertIsNotNone(gateway.response_cache)
+
+    def test_books_share_the_batch_gateway(self):
+        manifest = BatchManifest(books=[dict(label="raven", pdf_path="assets/raven.pdf")])
+        with patch("adt_press.batch.run_pipeline"):
+            run_batch(manifest, DictConfig({"output_dir": self.temp_dir, "llm_backend": "fake"}))
+        response_cache, fake_backend = gateway.response_cache, gateway.fake_backend
+        self.assertIsNotNone(fake_backend)
+
+        # a book starting later doesn't swap out the gateway used by books already running
+        config = load_run_config(DictConfig({"output_dir": self.temp_dir, "label": "momo", "pdf_path": "assets/momo.pdf"}))
+        build_driver(config, node_hook(config), shared_gateway=True)
+        self.assertIs(gateway.response_cache, response_cache)
+        self.assertIs(gateway.fake_backend, fake_backend)
+
+        # so books can't override the settings it is configured with
+        for override in (dict(llm_backend="fake"), dict(queue_dir="queue"), dict(cache=dict(responses=True))):
+            with self.assertRaises(ValueError):
+                BatchManifest(books=[dict(label="raven", pdf_path="assets/raven.pdf", **override)])
+        BatchManifest(books=[dict(label="raven", pdf_path="assets/raven.pdf", cache=dict(max_bytes=100))])
+
+    def test_fake_batch_leaves_real_cache_untouched(self):
+        response_cache_path = os.path.join(self.temp_dir, "responses")
+        manifest = BatchManifest(response_cache_path=response_cache_path, books=[dict(label="raven", pdf_path="assets/raven.pdf")])
+
+        def fake_pipeline(config: DictConfig, shared_gateway: bool = False):
+            asyncio.run(create_completion(PROMPT, response_model=CaptionResponse, messages=MESSAGES))
+
+        with patch("adt_press.batch.run_pipeline", side_effect=fake_pipeline):
+            run_batch(manifest, DictConfig({"output_dir": self.temp_dir, "llm_backend": "fake"}))
+
+        # the made up response is cached, but never served to the same request made by a real batch
+        cached = [name for _, _, names in os.walk(response_cache_path) for name in names]
+        self.assertEqual(len(cached), 1)
+
+        configure_backend("litellm")
+        key = request_key(PROMPT.model, CaptionResponse, MESSAGES)
+        self.assertIsNone(ResponseCache(response_cache_path).get(key))
+
+    def test_rate_limiter_is_shared_across_event_loops(self):
+        limiter = RateLimiter(1200)  # one call every 50ms
+
+        start = time.monotonic()
+        for _ in range(3):
+            asyncio.run(limiter.wait())
+        elapsed = time.monotonic() - start
+
+        self.assertGreaterEqual(elapsed, 0.09)
+
+    def test_response_cache_persists_to_disk(self):
+        cache = ResponseCache(self.temp_dir)
+        cache.set("abcdef", b"response")
+
+        self.assertEqual(cache.get("abcdef"), b"response")
+        self.assertEqual(ResponseCache(self.temp_dir).get("abcdef"), b"response")
+        self.assertIsNone(ResponseCache(self.temp_dir).get("missing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
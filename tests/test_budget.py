@@ -0,0 +1,62 @@
+import os
+import time
+
+from omegaconf import DictConfig
+
+from adt_press.models.config import BudgetConfig, BudgetLimits
+from adt_press.models.profile import RunProfile
+from adt_press.pipeline import NodeHook, forget_budget_stops, node_hook, write_profile
+from adt_press.utils.budget import Budget
+from tests.helpers import RunTestCase, caption_driver, run_captions
+
+
+class TestBudget(RunTestCase):
+    """Test stopping LLM requests once the budget of a run or node is used up."""
+
+    def test_budget_limits(self):
+        budget = Budget(BudgetConfig(run=BudgetLimits(max_cost=1.0), node=BudgetLimits(max_tokens=100)))
+        now = time.monotonic()
+        self.assertIsNone(budget.exceeded(0, 0, now))
+        self.assertEqual(budget.exceeded(100, 0, now), "node budget of 100 tokens reached")
+
+        budget.add(50, 1.5)
+        self.assertEqual(budget.exceeded(0, 0, now), "run budget of $1.00 reached")
+
+        budget = Budget(BudgetConfig(node=BudgetLimits(max_seconds=10)))
+        self.assertEqual(budget.exceeded(0, 0, now - 11), "node budget of 10 seconds reached")
+
+    def test_node_hook_budget(self):
+        self.assertIsNone(node_hook(DictConfig({})).budget)
+        hook = node_hook(DictConfig({"budget": {"run": {"max_tokens": 0}, "node": {"max_cost": 2.5}}}))
+        self.assertEqual(hook.budget.config.node.max_cost, 2.5)
+
+    def run_budgeted(self, budget: BudgetConfig) -> tuple[list[str], RunProfile]:
+        hook = NodeHook(budget=Budget(budget))
+        dr = caption_driver(hook, os.path.join(self.temp_dir, "cache"))
+        captions = run_captions(dr, 5)
+
+        forget_budget_stops(dr, hook)
+        write_profile(dr, hook, self.config)
+        return captions, RunProfile.model_validate_json(open(os.path.join(self.temp_dir, "profile.json")).read())
+
+    def test_node_budget(self):
+        captions, profile = self.run_budgeted(BudgetConfig(node=BudgetLimits(max_tokens=25)))
+
+        # requests stop once the node has used 25 tokens, the rest fall back to no caption
+        self.assertEqual(captions, ["word 0", "word 1", "word 2", "", ""])
+        nodes = {n.node_name: n for n in profile.nodes}
+        self.assertEqual(nodes["captions"].budget_stop, "2 LLM calls skipped, node budget of 25 tokens reached")
+        self.assertIsNone(nodes["words"].budget_stop)
+
+        with open(os.path.join(self.temp_dir, "profile.html")) as f:
+            self.assertIn("node budget of 25 tokens reached", f.read())
+
+        # the cut short result isn't reused, so a run with a larger budget completes it
+        captions, profile = self.run_budgeted(BudgetConfig(node=BudgetLimits(max_tokens=100)))
+        self.assertEqual(captions, [f"word {i}" for i in range(5)])
+        self.assertEqual({n.node_name: n.cache for n in profile.nodes}, {"words": "hit", "captions": "miss"})
+
+    def test_run_budget(self):
+        captions, profile = self.run_budgeted(BudgetConfig(run=BudgetLimits(max_cost=0.2)))
+        self.assertEqual(captions, ["word 0", "word 1", "", "", ""])
+        self.assertEqual(profile.nodes[-1].budget_stop, "3 LLM calls skipped, run budget of $0.20 reached")
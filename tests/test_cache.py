@@ -0,0 +1,150 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from hamilton import ad_hoc_utils, driver
+from hamilton.caching.adapter import CachingEventType
+from hamilton.caching.stores.sqlite import SQLiteMetadataStore
+from omegaconf import DictConfig
+
+from adt_press.llm.gateway import ResponseCache, configure_queue, gateway
+from adt_press.models.config import CacheConfig
+from adt_press.pipeline import configure_process
+from adt_press.utils.cache import cache_usage, collect_garbage, record_run
+from adt_press.utils.cache_store import FsspecMetadataStore, FsspecResultStore, remove_cache
+
+
+def numbers(count: int) -> list[int]:
+    return list(range(count))
+
+
+def total(numbers: list[int]) -> int:
+    return sum(numbers)
+
+
+class TestCache(unittest.TestCase):
+    """Test limiting the size of the Hamilton cache."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.temp_dir, "cache")
+        self.dr = (
+            driver.Builder().with_modules(ad_hoc_utils.create_temporary_module(numbers, total)).with_cache(path=self.cache_path).build()
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        gateway.configure()
+        configure_queue("")
+
+    def run_count(self, count: int) -> dict[str, str]:
+        self.dr.execute(["total"], inputs={"count": count})
+        run_id = self.dr.cache.last_run_id
+        record_run(self.cache_path, run_id, self.dr.cache.data_versions[run_id])
+        return self.dr.cache.data_versions[run_id]
+
+    def test_usage_per_node(self):
+        self.run_count(10)
+        self.run_count(1000)
+
+        usage = {u.node_name: u for u in cache_usage(self.cache_path)}
+        self.assertEqual(usage["numbers"].entries, 2)
+        self.assertEqual(usage["total"].entries, 2)
+        self.assertGreater(usage["numbers"].bytes, usage["total"].bytes)
+
+    def test_keep_runs(self):
+        self.run_count(10)
+        metadata_store = SQLiteMetadataStore(self.cache_path)
+        first_keys = [node["cache_key"] for node in metadata_store.get_run(self.dr.cache.last_run_id)]
+        self.run_count(20)
+        latest = self.run_count(30)
+
+        collection = collect_garbage(self.cache_path, CacheConfig(keep_runs=1))
+        self.assertEqual(collection.removed_entries, 4)
+
+        # only the latest run's results remain and they are still served from the cache
+        self.assertEqual({u.entries for u in cache_usage(self.cache_path)}, {1})
+        self.assertEqual(self.run_count(30), latest)
+        self.assertTrue(all(e.msg == "hit" for events in self.dr.cache.logs(self.dr.cache.last_run_id).values() for e in events))
+
+        # Hamilton's own metadata store forgets the removed results, so they are computed again
+        self.assertEqual([metadata_store.get(key) for key in first_keys], [None, None])
+        self.run_count(10)
+        events = self.dr.cache.logs(self.dr.cache.last_run_id)
+        self.assertEqual({e.event_type for e in events["total"]}, {CachingEventType.EXECUTE_NODE})
+
+    def test_max_bytes_evicts_least_recently_used(self):
+        self.run_count(1000)
+        time.sleep(0.01)
+        self.run_count(2000)
+        time.sleep(0.01)
+
+        # reading the first run back from the cache makes it the most recently used
+        first = self.run_count(1000)
+
+        sizes = {u.node_name: u.bytes for u in cache_usage(self.cache_path)}
+        first_size = sum(os.path.getsize(os.path.join(self.cache_path, first[n])) for n in ("numbers", "total"))
+        collection = collect_garbage(self.cache_path, CacheConfig(max_bytes=first_size))
+
+        self.assertEqual(collection.removed_bytes, sum(sizes.values()) - first_size)
+        self.assertEqual(collection.remaining_bytes, first_size)
+        self.assertTrue(os.path.exists(os.path.join(self.cache_path, first["numbers"])))
+
+    def test_max_bytes_evicts_responses(self):
+        responses = ResponseCache(os.path.join(self.cache_path, "responses"))
+        for key in ("aa01", "bb02"):
+            responses.set(key, b"x" * 1000)
+        time.sleep(0.01)
+
+        results = self.run_count(1000)
+        result_size = sum(os.path.getsize(os.path.join(self.cache_path, results[n])) for n in ("numbers", "total"))
+        time.sleep(0.01)
+
+        usage = {u.node_name: u for u in cache_usage(self.cache_path)}
+        self.assertEqual((usage["responses"].entries, usage["responses"].bytes), (2, 2000))
+
+        # reading a response back makes it more recently used than the results, so only the other one is evicted
+        ResponseCache(os.path.join(self.cache_path, "responses")).get("aa01")
+        collection = collect_garbage(self.cache_path, CacheConfig(max_bytes=result_size + 1000))
+
+        self.assertEqual((collection.removed_entries, collection.removed_bytes), (1, 1000))
+        self.assertIsNotNone(ResponseCache(os.path.join(self.cache_path, "responses")).get("aa01"))
+        self.assertIsNone(ResponseCache(os.path.join(self.cache_path, "responses")).get("bb02"))
+
+    def test_runs_without_response_cache(self):
+        config = DictConfig(dict(run_output_dir=self.temp_dir, cache=dict(dir=self.cache_path, responses=True)))
+        configure_process(config)
+        self.assertEqual(gateway.response_cache.path, f"{self.cache_path}/responses")
+
+        # a later run in the same process without responses doesn't keep using the previous run's
+        config.cache.responses = False
+        configure_process(config)
+        self.assertIsNone(gateway.response_cache)
+
+    def test_fsspec_cache_shared_between_drivers(self):
+        # a file:// url stands in for an object store or shared mount
+        url = f"file://{self.temp_dir}/shared"
+        module = ad_hoc_utils.create_temporary_module(numbers, total)
+
+        def run() -> driver.Driver:
+            dr = (
+                driver.Builder()
+                .with_modules(module)
+                .with_cache(metadata_store=FsspecMetadataStore(url), result_store=FsspecResultStore(url))
+                .build()
+            )  # fmt: off
+            self.assertEqual(dr.execute(["total"], inputs={"count": 10})["total"], 45)
+            return dr
+
+        first = run()
+        self.assertTrue(all(e.msg != "hit" for events in first.cache.logs(first.cache.last_run_id).values() for e in events))
+
+        # a second driver, e.g. another label or machine, reads the results back
+        second = run()
+        hits = [e.node_name for events in second.cache.logs(second.cache.last_run_id).values() for e in events if e.msg == "hit"]
+        self.assertEqual(sorted(hits), ["numbers", "total"])
+
+        remove_cache(url)
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, "shared")))
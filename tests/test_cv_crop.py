@@ -0,0 +1,217 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from adt_press.llm.image_crop import CropResponse, crops_converged, get_image_crop_coordinates
+from adt_press.models.config import CropPromptConfig
+from adt_press.models.image import CropCoordinates, Image
+from adt_press.models.pdf import Page
+from adt_press.nodes.config_nodes import CVCropConfig
+from adt_press.nodes.image_nodes import image_crops__cv, image_crops__hybrid
+from adt_press.utils.cv_crop import content_crop
+from adt_press.utils.image import encode_png
+
+CROP_PROMPT = CropPromptConfig(model="gpt-4o", template_path="prompts/image_crop_storybook.jinja2")
+
+
+def framed_drawing(width: int = 1200, height: int = 900) -> np.ndarray:
+    """A drawing from (300, 200) to (900, 700) on a slightly noisy off white scan."""
+    rng = np.random.default_rng(0)
+    image = np.clip(rng.normal(245, 2, (height, width, 3)), 0, 255).astype(np.uint8)
+    cv2.rectangle(image, (300, 200), (899, 699), (40, 120, 200), -1)
+    cv2.circle(image, (600, 450), 150, (200, 60, 40), -1)
+    return image
+
+
+def crop_completion(answers: list[tuple[int, int, int, int]], requests: list[list[dict]]):
+    """Returns a fake create_completion answering each crop request with the next of answers, recording it in requests."""
+
+    async def completion(config, response_model, messages):
+        requests.append(messages)
+        x0, y0, x1, y1 = answers[len(requests) - 1]
+        return CropResponse(top_left_x=x0, top_left_y=y0, bottom_right_x=x1, bottom_right_y=y1)
+
+    return completion
+
+
+class TestCVCrop(unittest.TestCase):
+    """Test cropping images to their content without an LLM."""
+
+    def test_trims_margins(self):
+        image = framed_drawing()
+
+        # a speck of dust in the margin is ignored
+        image[50:52, 50:52] = 0
+        crop, confidence = content_crop(encode_png(image), 16, 4)
+
+        self.assertAlmostEqual(crop.top_left_x, 296, delta=3)
+        self.assertAlmostEqual(crop.top_left_y, 196, delta=3)
+        self.assertAlmostEqual(crop.bottom_right_x, 904, delta=3)
+        self.assertAlmostEqual(crop.bottom_right_y, 704, delta=3)
+        self.assertGreater(confidence, 0.9)
+
+    def test_uncertain_crops(self):
+        rng = np.random.default_rng(1)
+
+        # a photo without margins is kept whole, but its border isn't uniform
+        photo = cv2.GaussianBlur(rng.integers(0, 255, (600, 800, 3), dtype=np.uint8), (31, 31), 0) * 4
+        crop, confidence = content_crop(encode_png(photo), 16, 4)
+        self.assertEqual(crop, CropCoordinates(top_left_x=0, top_left_y=0, bottom_right_x=800, bottom_right_y=600))
+        self.assertLess(confidence, 0.5)
+
+        # scattered parts, e.g. an illustration with a caption, may need the LLM to pick the right one
+        parts = np.full((600, 800, 3), 255, dtype=np.uint8)
+        cv2.rectangle(parts, (50, 50), (250, 250), (0, 0, 0), -1)
+        cv2.rectangle(parts, (600, 450), (700, 500), (0, 0, 0), -1)
+        _, confidence = content_crop(encode_png(parts), 16, 4)
+        self.assertLess(confidence, 0.5)
+
+        # nothing but background
+        _, confidence = content_crop(encode_png(np.full((300, 300, 3), 255, dtype=np.uint8)), 16, 4)
+        self.assertEqual(confidence, 1)
+
+    def test_image_crops(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            images = []
+            for i in range(10):
+                path = os.path.join(tmp, f"img_p1_r{i}.png")
+                cv2.imwrite(path, framed_drawing())
+                images.append(
+                    Image(
+                        image_id=f"img_p1_r{i}",
+                        image_path=path,
+                        chart_path=path,
+                        page_id="p1",
+                        index=i,
+                        width=1200,
+                        height=900,
+                        image_type="png",
+                    )
+                )
+            page = Page(page_id="p1", page_number=1, page_image_path=images[0].image_path, text="", images=images)
+
+            start = time.monotonic()
+            crops = image_crops__cv([page], {"img_p1_r9"}, CVCropConfig())
+            self.assertLess(time.monotonic() - start, 5)
+
+            self.assertEqual(len(crops), 9)
+            height, width = cv2.imread(crops["img_p1_r0"].image_path).shape[:2]
+            self.assertAlmostEqual(width, 608, delta=6)
+            self.assertAlmostEqual(height, 508, delta=6)
+
+    def test_hybrid_crops(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            parts = np.full((600, 800, 3), 255, dtype=np.uint8)
+            cv2.rectangle(parts, (50, 50), (250, 250), (0, 0, 0), -1)
+            cv2.rectangle(parts, (600, 450), (700, 500), (0, 0, 0), -1)
+
+            images = []
+            for i, image in enumerate([framed_drawing(), parts]):
+                path = os.path.join(tmp, f"img_p1_r{i}.png")
+                cv2.imwrite(path, image)
+                height, width = image.shape[:2]
+                images.append(
+                    Image(
+                        image_id=f"img_p1_r{i}",
+                        image_path=path,
+                        chart_path=path,
+                        page_id="p1",
+                        index=i,
+                        width=width,
+                        height=height,
+                        image_type="png",
+                    )
+                )
+            page = Page(page_id="p1", page_number=1, page_image_path=images[0].image_path, text="", images=images)
+
+            refined = []
+
+            async def crop_coordinates(config, page, image, initial=None):
+                refined.append((image.image_id, initial))
+                return CropCoordinates(top_left_x=40, top_left_y=40, bottom_right_x=260, bottom_right_y=260)
+
+            with patch("adt_press.nodes.image_nodes.get_image_crop_coordinates", crop_coordinates):
+                crops = image_crops__hybrid(CROP_PROMPT, [page], set(), {}, CVCropConfig())
+
+            # only the scattered parts are refined by the LLM, starting from the local proposal
+            proposal, _ = content_crop(encode_png(parts), 16, 4)
+            self.assertEqual(refined, [("img_p1_r1", proposal)])
+            self.assertEqual(crops["img_p1_r1"].crop_coordinates.bottom_right_x, 260)
+            self.assertAlmostEqual(crops["img_p1_r0"].crop_coordinates.top_left_x, 296, delta=3)
+
+    def test_recrop_from_initial(self):
+        # prompts may only render images from within the working directory
+        with tempfile.TemporaryDirectory(dir=".") as tmp:
+            path = os.path.join(tmp, "img_p1_r0.png")
+            cv2.imwrite(path, framed_drawing())
+            image = Image(
+                image_id="img_p1_r0",
+                image_path=path,
+                chart_path=path,
+                page_id="p1",
+                index=0,
+                width=1200,
+                height=900,
+                image_type="png",
+            )
+            page = Page(page_id="p1", page_number=1, page_image_path=path, text="", images=[image])
+
+            requests: list[list[dict]] = []
+            initial = CropCoordinates(top_left_x=296, top_left_y=196, bottom_right_x=904, bottom_right_y=704)
+            config = CROP_PROMPT.model_copy(update={"recrop_template_path": "prompts/image_recrop_storybook.jinja2"})
+            with patch("adt_press.llm.image_crop.create_completion", crop_completion([(1, 2, 3, 4)], requests)):
+                coord = asyncio.run(get_image_crop_coordinates(config, page, image, initial=initial))
+
+            # the initial crop takes the place of the LLM's first answer, so it's corrected in a single request
+            self.assertEqual(coord, CropCoordinates(top_left_x=1, top_left_y=2, bottom_right_x=3, bottom_right_y=4))
+            self.assertEqual(len(requests), 1)
+            assistant = [m for m in requests[0] if m["role"] == "assistant"]
+            self.assertIn("top_left_x: 296", str(assistant[0]["content"]))
+
+    def test_recrop_convergence(self):
+        with tempfile.TemporaryDirectory(dir=".") as tmp:
+            path = os.path.join(tmp, "img_p1_r0.png")
+            cv2.imwrite(path, framed_drawing())
+            image = Image(
+                image_id="img_p1_r0",
+                image_path=path,
+                chart_path=path,
+                page_id="p1",
+                index=0,
+                width=1200,
+                height=900,
+                image_type="png",
+            )
+            page = Page(page_id="p1", page_number=1, page_image_path=path, text="", images=[image])
+            config = CROP_PROMPT.model_copy(update={"recrop_template_path": "prompts/image_recrop_storybook.jinja2", "recrops": 4})
+
+            for answers, expected_requests in [
+                # the second answer barely moves the crop, so there's no third round
+                ([(100, 100, 900, 700), (102, 99, 901, 703)], 2),
+                # the crop keeps moving until we run out of rounds
+                ([(100, 100, 900, 700), (200, 100, 900, 700), (300, 100, 900, 700), (400, 100, 900, 700), (500, 100, 900, 700)], 5),
+            ]:
+                requests: list[list[dict]] = []
+                with patch("adt_press.llm.image_crop.create_completion", crop_completion(answers, requests)):
+                    coord = asyncio.run(get_image_crop_coordinates(config, page, image))
+
+                self.assertEqual(len(requests), expected_requests)
+                self.assertEqual(coord.top_left_x, answers[-1][0])
+
+                # only the latest recrop turn is sent, so the conversation doesn't grow
+                self.assertEqual(len(requests[-1]), len(requests[1]))
+
+    def test_crops_converged(self):
+        crop = CropResponse(top_left_x=0, top_left_y=0, bottom_right_x=1000, bottom_right_y=1000)
+        moved = crop.model_copy(update={"top_left_x": 8})
+        self.assertTrue(crops_converged(crop, crop, 4, 0.98))
+        self.assertFalse(crops_converged(crop, moved, 4, 0.995))
+
+        # moving 8 pixels of a large crop still overlaps it by over 99%
+        self.assertTrue(crops_converged(crop, moved, 4, 0.98))
@@ -0,0 +1,125 @@
+import asyncio
+import unittest
+
+from adt_press.llm import (
+    glossary_translation,
+    image_caption,
+    image_crop,
+    image_meaningfulness,
+    page_sectioning,
+    section_explanations,
+    section_glossary,
+    section_metadata,
+    text_easy_read,
+    text_extraction,
+    text_translation,
+    web_generation_html,
+    web_generation_rows,
+    web_generation_two_column,
+)
+from adt_press.llm.fake import SILENT_MP3_FRAME, FakeBackend, FakeLLMError
+from adt_press.llm.gateway import configure_backend, create_completion, create_speech, gateway, recorded_calls, reset_call_stats
+from adt_press.models.config import FakeLLMConfig, PromptConfig
+
+PROMPT = PromptConfig(model="gpt-4o", template_path="prompts/image_caption.jinja2", examples=[], max_retries=3)
+MESSAGES = [{"role": "user", "content": [{"type": "text", "text": "This is the image, width: 400px, height: 200px:"}]}]
+
+PAGE_CONTEXT = dict(text_ids=["gp1_1", "gp1_2"], image_ids=["img_p1_r0"])
+
+RESPONSE_MODELS = [
+    (text_extraction.TextResponse, {}),
+    (image_meaningfulness.MeaningfulnessResponse, {}),
+    (image_crop.CropResponse, {}),
+    (image_caption.CaptionResponse, {}),
+    (page_sectioning.SectionResponse, PAGE_CONTEXT),
+    (section_metadata.MetadataResponse, dict(layout_types=["mathbook", "other"])),
+    (section_explanations.ExplanationResponse, {}),
+    (section_glossary.GlossaryResponse, {}),
+    (text_easy_read.EasyReadResponse, {}),
+    (text_translation.TranslationResponse, {}),
+    (glossary_translation.TranslationResponse, {}),
+    (web_generation_html.GenerationResponse, PAGE_CONTEXT),
+    (web_generation_rows.GenerationResponse, PAGE_CONTEXT),
+    (web_generation_two_column.GenerationResponse, dict(PAGE_CONTEXT, section_type="text_and_images")),
+    (web_generation_two_column.GenerationResponse, dict(text_ids=["gp1_1"], image_ids=[], section_type="text_only")),
+]
+
+
+class TestFakeBackend(unittest.TestCase):
+    """Test answering requests with made up responses in place of litellm."""
+
+    def tearDown(self):
+        configure_backend("litellm")
+
+    def test_response_models(self):
+        backend = FakeBackend(FakeLLMConfig())
+        for response_model, context in RESPONSE_MODELS:
+            with self.subTest(response_model=f"{response_model.__module__}:{response_model.__qualname__}"):
+                response = asyncio.run(backend.completion("gpt-4o", 0, response_model, MESSAGES, context=context))
+                self.assertIsInstance(response, response_model)
+
+                # the same request always gets the same response
+                again = asyncio.run(backend.completion("gpt-4o", 0, response_model, MESSAGES, context=context))
+                self.assertEqual(response, again)
+
+        crop = asyncio.run(backend.completion("gpt-4o", 0, image_crop.CropResponse, MESSAGES))
+        self.assertEqual((crop.top_left_x, crop.top_left_y, crop.bottom_right_x, crop.bottom_right_y), (20, 10, 380, 190))
+
+    def test_seed(self):
+        responses = [
+            asyncio.run(FakeBackend(FakeLLMConfig(seed=seed)).completion("gpt-4o", 0, image_caption.CaptionResponse, MESSAGES))
+            for seed in (0, 1)
+        ]
+        self.assertNotEqual(responses[0].caption, responses[1].caption)
+
+    def test_gateway(self):
+        configure_backend("fake")
+        reset_call_stats()
+
+        response = asyncio.run(create_completion(PROMPT, response_model=image_caption.CaptionResponse, messages=MESSAGES))
+        self.assertTrue(response.caption)
+
+        audio = asyncio.run(create_speech(PROMPT, voice="alloy", input="one two three four five"))
+        self.assertTrue(audio.startswith(SILENT_MP3_FRAME))
+        self.assertEqual(len(audio) % len(SILENT_MP3_FRAME), 0)
+
+        completion, speech = recorded_calls()
+        self.assertEqual(completion.attempts, 1)
+        self.assertGreater(completion.prompt_tokens, 0)
+        self.assertGreater(completion.completion_tokens, 0)
+        self.assertEqual(speech.kind, "speech")
+
+        configure_backend("litellm")
+        self.assertIsNone(gateway.fake_backend)
+        with self.assertRaises(ValueError):
+            configure_backend("openai")
+
+    def test_errors(self):
+        configure_backend("fake", FakeLLMConfig(error_rate=0.5))
+        reset_call_stats()
+
+        async def caption_all():
+            tasks = [
+                create_completion(
+                    PROMPT,
+                    response_model=image_caption.CaptionResponse,
+                    messages=[{"role": "user", "content": f"word {i}"}],
+                )
+                for i in range(50)
+            ]
+            return await asyncio.gather(*tasks, return_exceptions=True)
+
+        results = asyncio.run(caption_all())
+        calls = recorded_calls()
+
+        # failed attempts are retried, only requests failing every attempt raise
+        retried = [c for c in calls if c.attempts > 1]
+        self.assertTrue(retried)
+        self.assertTrue(all(len(c.validation_errors) == c.attempts - 1 for c in retried if not c.error))
+
+        errors = [r for r in results if isinstance(r, Exception)]
+        self.assertTrue(all(isinstance(e, FakeLLMError) for e in errors))
+        self.assertEqual(len(errors), sum(1 for c in calls if c.attempts == PROMPT.max_retries + 1 and c.error))
+
+        # errors are deterministic as well
+        self.assertEqual([isinstance(r, Exception) for r in asyncio.run(caption_all())], [isinstance(r, Exception) for r in results])
@@ -0,0 +1,69 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from adt_press.utils import file
+from adt_press.utils.file import calculate_file_hash, configure_hash_memo
+
+
+class TestFileHash(unittest.TestCase):
+    """Test streaming file hashes and their memo."""
+
+    def setUp(self):
+        configure_hash_memo("")
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "book.pdf")
+        self.content = os.urandom(file.HASH_CHUNK_SIZE * 2 + 17)
+        with open(self.path, "wb") as f:
+            f.write(self.content)
+        self.age(self.path)
+
+    def age(self, path: str, seconds: float = 60):
+        """Makes a file look like it was last modified seconds ago."""
+        mtime = time.time() - seconds
+        os.utime(path, (mtime, mtime))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        configure_hash_memo("")
+        file._hash_memo.clear()
+
+    def test_hash_matches_whole_file(self):
+        self.assertEqual(calculate_file_hash(self.path), hashlib.sha256(self.content).hexdigest())
+
+    def test_unchanged_files_are_not_read_again(self):
+        configure_hash_memo(os.path.join(self.temp_dir, "hashes.db"))
+
+        with patch("adt_press.utils.file._stream_file_hash", wraps=file._stream_file_hash) as stream:
+            first = calculate_file_hash(self.path)
+            self.assertEqual(calculate_file_hash(self.path), first)
+            self.assertEqual(stream.call_count, 1)
+
+            # a new process only has the persistent memo
+            file._hash_memo.clear()
+            self.assertEqual(calculate_file_hash(self.path), first)
+            self.assertEqual(stream.call_count, 1)
+
+            # changing the file changes its size and mtime, so it is hashed again
+            with open(self.path, "ab") as f:
+                f.write(b"more")
+            self.age(self.path, 30)
+            self.assertEqual(calculate_file_hash(self.path), hashlib.sha256(self.content + b"more").hexdigest())
+            self.assertEqual(stream.call_count, 2)
+
+    def test_recently_modified_files_are_not_memoized(self):
+        with open(self.path, "wb") as f:
+            f.write(self.content)
+        self.assertEqual(calculate_file_hash(self.path), hashlib.sha256(self.content).hexdigest())
+
+        # a rewrite of the same size within the timestamp granularity keeps the mtime, e.g. on NFS, so the hash of a
+        # file modified in the last seconds is never memoized
+        mtime_ns = os.stat(self.path).st_mtime_ns
+        with open(self.path, "wb") as f:
+            f.write(self.content[::-1])
+        os.utime(self.path, ns=(mtime_ns, mtime_ns))
+        self.assertEqual(calculate_file_hash(self.path), hashlib.sha256(self.content[::-1]).hexdigest())
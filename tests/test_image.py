@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+import PIL.Image
+
+from adt_press.models.image import CropCoordinates
+from adt_press.utils.image import (
+    DecodedImageCache,
+    blank_images,
+    crop_image,
+    decode_image,
+    encode_png,
+    is_blank_image,
+    visualize_crop_extents,
+)
+
+
+class TestImage(unittest.TestCase):
+    """Test detecting blank images and working with decoded images."""
+
+    def test_is_blank_image(self):
+        rng = np.random.default_rng(0)
+        self.assertTrue(is_blank_image(encode_png(np.full((300, 400, 3), 255, dtype=np.uint8)), 2))
+        self.assertFalse(is_blank_image(encode_png(rng.integers(0, 255, (300, 400, 3), dtype=np.uint8)), 2))
+
+        # a single line can be skipped when decoding at a reduced size, but the image isn't blank
+        line = np.full((1200, 1600), 255, dtype=np.uint8)
+        line[601, :] = 0
+        self.assertFalse(is_blank_image(encode_png(line), 2))
+
+    def test_decisions_match_full_resolution(self):
+        rng = np.random.default_rng(1)
+        for noise in np.linspace(0, 4, 41):
+            image = np.clip(128 + rng.normal(0, noise, (240, 320)), 0, 255).astype(np.uint8)
+            with self.subTest(noise=noise):
+                self.assertEqual(is_blank_image(encode_png(image), 2), bool(np.std(image) < 2))
+
+    def test_blank_images(self):
+        rng = np.random.default_rng(2)
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for i in range(20):
+                path = os.path.join(tmp, f"img_{i}.png")
+                blank = np.full((200, 200), 40, dtype=np.uint8)
+                cv2.imwrite(path, blank if i % 3 == 0 else rng.integers(0, 255, (200, 200), dtype=np.uint8))
+                paths.append(path)
+
+            self.assertEqual(blank_images(paths, 2), [i % 3 == 0 for i in range(20)])
+
+    def test_decoded_image_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for i in range(3):
+                path = os.path.join(tmp, f"img_{i}.png")
+                cv2.imwrite(path, np.full((100, 100, 3), i, dtype=np.uint8))
+                paths.append(path)
+
+            # room for two images, the least recently used one is evicted
+            cache = DecodedImageCache(2 * 100 * 100 * 3)
+            first = cache.get(paths[0])
+            cache.get(paths[1])
+            self.assertIs(cache.get(paths[0]), first)
+            cache.get(paths[2])
+            self.assertEqual(list(cache.images), [paths[0], paths[2]])
+            self.assertEqual(cache.size, 2 * 100 * 100 * 3)
+
+            # cached pixels are shared, so they can't be changed
+            with self.assertRaises(ValueError):
+                first[0, 0] = 255
+
+    def test_crop_image(self):
+        image = np.zeros((100, 200, 4), dtype=np.uint8)
+        image[20:40, 50:150] = 255
+
+        cropped = decode_image(crop_image(image, CropCoordinates(top_left_x=50, top_left_y=20, bottom_right_x=150, bottom_right_y=40)))
+        self.assertEqual(cropped.shape, (20, 100, 4))
+        self.assertTrue((cropped == 255).all())
+
+        # as with PIL, parts of the crop outside the image are transparent, or black without alpha
+        cropped = decode_image(crop_image(image, CropCoordinates(top_left_x=-10, top_left_y=30, bottom_right_x=210, bottom_right_y=120)))
+        self.assertEqual(cropped.shape, (90, 220, 4))
+        self.assertTrue((cropped[:10, 60:160] == 255).all())
+        self.assertTrue((cropped[70:] == 0).all())
+        self.assertTrue((cropped[:, :10] == 0).all())
+
+        rgb = np.random.default_rng(0).integers(1, 255, (100, 200, 3), dtype=np.uint8)
+        for x0, y0, x1, y1 in [(-10, -20, 50, 60), (150, 80, 260, 130), (250, 150, 300, 200)]:
+            with self.subTest(box=(x0, y0, x1, y1)):
+                crop = CropCoordinates(top_left_x=x0, top_left_y=y0, bottom_right_x=x1, bottom_right_y=y1)
+                expected = np.asarray(PIL.Image.fromarray(rgb).crop((x0, y0, x1, y1)))
+                np.testing.assert_array_equal(decode_image(crop_image(rgb, crop)), expected)
+
+        # an inverted box is cropped as a single pixel
+        cropped = decode_image(crop_image(image, CropCoordinates(top_left_x=60, top_left_y=30, bottom_right_x=10, bottom_right_y=10)))
+        self.assertEqual(cropped.shape, (1, 1, 4))
+
+    def test_visualize_crop_extents(self):
+        for image in (np.full((100, 200), 255, dtype=np.uint8), np.full((100, 200, 3), 255, dtype=np.uint8)):
+            visualized = decode_image(visualize_crop_extents(image, 10, 10, 50, 50))
+            self.assertEqual(visualized.shape, (100, 200, 3))
+            self.assertEqual(visualized[10, 30].tolist(), [0, 0, 255])
+            self.assertEqual(visualized[30, 30].tolist(), [255, 255, 255])
+
+        # the image itself isn't drawn on
+        self.assertTrue((image == 255).all())
@@ -0,0 +1,89 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import cv2
+
+from adt_press.models.config import PromptConfig
+from adt_press.models.image import CropCoordinates, ImageAnalysis, ImageCaption, ImageMeaningfulness
+from adt_press.nodes.config_nodes import HeuristicImageFilterConfig
+from adt_press.nodes.image_nodes import (
+    image_analyses,
+    image_captions_by_id__combined,
+    image_crops__combined,
+    image_meaningfulness__combined,
+)
+from adt_press.utils.budget import BudgetExceeded
+from tests.helpers import page_images
+
+ANALYSIS_PROMPT = PromptConfig(model="gpt-4o", template_path="prompts/image_analysis.jinja2")
+CAPTION_PROMPT = PromptConfig(model="gpt-4o", template_path="prompts/image_caption.jinja2")
+
+
+class TestImageAnalysis(unittest.TestCase):
+    """Test analysing images with a single request each."""
+
+    def test_combined_analysis(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            page = page_images(tmp, 1, 3)
+
+            analysed = []
+
+            async def analysis(config, page, image, language_code):
+                analysed.append(image.image_id)
+                return ImageAnalysis(
+                    image_id=image.image_id,
+                    meaningfulness=ImageMeaningfulness(image_id=image.image_id, is_meaningful=image.index == 0, reasoning="a fox"),
+                    caption=ImageCaption(image_id=image.image_id, caption="A fox in the snow.", reasoning="a fox"),
+                    crop_coordinates=CropCoordinates(top_left_x=10, top_left_y=20, bottom_right_x=110, bottom_right_y=220),
+                )
+
+            # the last image duplicates the first, so only the first two are analysed
+            duplicates = {"img_p1_r2": "img_p1_r0"}
+            with patch("adt_press.nodes.image_nodes.get_image_analysis", analysis):
+                analyses = image_analyses("en", ANALYSIS_PROMPT, [page], {}, {}, {}, duplicates)
+            self.assertEqual(sorted(analysed), ["img_p1_r0", "img_p1_r1"])
+
+            meaningfulness = image_meaningfulness__combined(analyses, {}, HeuristicImageFilterConfig(), duplicates)
+            self.assertEqual(
+                {k: m.is_meaningful for k, m in meaningfulness.items()}, {"img_p1_r0": True, "img_p1_r1": False, "img_p1_r2": True}
+            )
+
+            # images pruned as not meaningful are left without a caption or crop
+            pruned = {"img_p1_r1"}
+            captions = image_captions_by_id__combined("en", CAPTION_PROMPT, [page], pruned, analyses, duplicates)
+            self.assertEqual(sorted(captions), ["img_p1_r0", "img_p1_r2"])
+            self.assertEqual(captions["img_p1_r2"].caption, "A fox in the snow.")
+
+            crops = image_crops__combined([page], pruned, analyses, duplicates)
+            self.assertEqual(sorted(crops), ["img_p1_r0", "img_p1_r2"])
+            self.assertEqual(cv2.imread(crops["img_p1_r2"].image_path).shape[:2], (200, 100))
+
+    def test_budget_stop(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            page = page_images(tmp, 1, 3)
+
+            async def analysis(config, page, image, language_code):
+                if image.index > 0:
+                    raise BudgetExceeded("run cost limit reached")
+                return ImageAnalysis(
+                    image_id=image.image_id,
+                    meaningfulness=ImageMeaningfulness(image_id=image.image_id, is_meaningful=True, reasoning="a fox"),
+                    caption=ImageCaption(image_id=image.image_id, caption="A fox in the snow.", reasoning="a fox"),
+                    crop_coordinates=CropCoordinates(top_left_x=10, top_left_y=20, bottom_right_x=110, bottom_right_y=220),
+                )
+
+            with patch("adt_press.nodes.image_nodes.get_image_analysis", analysis):
+                analyses = image_analyses("en", ANALYSIS_PROMPT, [page], {}, {}, {}, {})
+            self.assertIsNone(analyses["img_p1_r1"])
+
+            # images the budget stopped are kept, without a caption and cropped to the whole image
+            meaningfulness = image_meaningfulness__combined(analyses, {}, HeuristicImageFilterConfig(), {})
+            self.assertTrue(all(m.is_meaningful for m in meaningfulness.values()))
+            self.assertIn("budget", meaningfulness["img_p1_r1"].reasoning)
+
+            captions = image_captions_by_id__combined("en", CAPTION_PROMPT, [page], set(), analyses, {})
+            self.assertEqual([captions[f"img_p1_r{i}"].caption for i in range(3)], ["A fox in the snow.", "", ""])
+
+            crops = image_crops__combined([page], set(), analyses, {})
+            self.assertEqual(crops["img_p1_r1"].image_path, page.images[1].image_path)
@@ -0,0 +1,132 @@
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from omegaconf import DictConfig, OmegaConf
+from pydantic import ValidationError
+
+from adt_press.llm.image_batch import image_batches
+from adt_press.llm.image_caption import BatchCaptionResponse
+from adt_press.llm.image_meaningfulness import BatchMeaningfulnessResponse, get_images_meaningfulness
+from adt_press.models.config import BatchPromptConfig
+from adt_press.models.image import ImageCaption, ImageMeaningfulness
+from adt_press.nodes.config_nodes import HeuristicImageFilterConfig
+from adt_press.nodes.image_nodes import image_captions_by_id__llm, image_meaningfulness__separate
+from adt_press.planner import plan_pages
+from adt_press.utils.budget import BudgetExceeded
+from tests.helpers import page_images
+
+CAPTION_PROMPT = BatchPromptConfig(
+    model="gpt-4o", template_path="prompts/image_caption.jinja2", batch_template_path="prompts/image_caption_batch.jinja2"
+)
+MEANINGFULNESS_PROMPT = BatchPromptConfig(
+    model="gpt-4o", template_path="prompts/image_meaningfulness.jinja2", batch_template_path="prompts/image_meaningfulness_batch.jinja2"
+)
+
+
+class TestImageBatch(unittest.TestCase):
+    """Test asking about all the images of a page in a single request."""
+
+    def test_image_batches(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            images = page_images(tmp, 1, 12).images
+
+            self.assertEqual(image_batches(CAPTION_PROMPT, images[:5]), [images[:5]])
+            self.assertEqual(image_batches(CAPTION_PROMPT, images[:1]), [images[:1]])
+
+            # too many images, too many pixels or no batch template fall back to one image per request
+            unbatched = [[img] for img in images[:5]]
+            self.assertEqual(image_batches(CAPTION_PROMPT, images), [[img] for img in images])
+            self.assertEqual(image_batches(CAPTION_PROMPT.model_copy(update={"max_batch_pixels": 400 * 300 * 4}), images[:5]), unbatched)
+            self.assertEqual(image_batches(CAPTION_PROMPT.model_copy(update={"batch_template_path": None}), images[:5]), unbatched)
+
+    def test_validate_image_ids(self):
+        context = {"image_ids": ["a", "b"]}
+        answer = dict(image_id="a", caption="A fox.", reasoning="a fox")
+        BatchCaptionResponse.model_validate(dict(images=[answer, {**answer, "image_id": "b"}]), context=context)
+
+        for image_ids in (["a"], ["a", "b", "c"], ["a", "a", "b"]):
+            with self.assertRaises(ValidationError):
+                BatchCaptionResponse.model_validate(dict(images=[{**answer, "image_id": i} for i in image_ids]), context=context)
+
+    def test_batched_prompt(self):
+        # prompts may only render images from within the working directory
+        with tempfile.TemporaryDirectory(dir=".") as tmp:
+            page = page_images(tmp, 1, 3)
+            requests = []
+
+            async def completion(config, response_model, messages, context):
+                requests.append(messages)
+                images = [dict(image_id=i, is_meaningful=True, reasoning="a fox") for i in context["image_ids"]]
+                return BatchMeaningfulnessResponse.model_validate(dict(images=images), context=context)
+
+            with patch("adt_press.llm.image_meaningfulness.create_completion", completion):
+                meaningfulness = asyncio.run(get_images_meaningfulness(MEANINGFULNESS_PROMPT, page, page.images))
+
+            self.assertEqual([m.image_id for m in meaningfulness], [img.image_id for img in page.images])
+            self.assertEqual(len(requests), 1)
+
+            # every image is sent once, after its id
+            content = requests[0][-1]["content"]
+            self.assertEqual(sum(1 for block in content if block["type"] == "image_url"), 3)
+            self.assertIn("image id img_p1_r2", str(content))
+
+    def test_batched_captions(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pages = [page_images(tmp, 1, 3), page_images(tmp, 2, 1), page_images(tmp, 3, 12)]
+            batched, single = [], []
+
+            async def captions(config, page, images, language_code):
+                batched.append([img.image_id for img in images])
+                return [ImageCaption(image_id=img.image_id, caption="A fox.", reasoning="a fox") for img in images]
+
+            async def caption(config, page, image, language_code):
+                single.append(image.image_id)
+                return ImageCaption(image_id=image.image_id, caption="A fox.", reasoning="a fox")
+
+            with (
+                patch("adt_press.nodes.image_nodes.get_image_captions", captions),
+                patch("adt_press.nodes.image_nodes.get_image_caption", caption),
+            ):
+                results = image_captions_by_id__llm("en", CAPTION_PROMPT, pages, {"img_p1_r1"}, {})
+
+            # pruned images aren't captioned, pages with a single image or too many are captioned image by image
+            self.assertEqual(batched, [["img_p1_r0", "img_p1_r2"]])
+            self.assertEqual(len(single), 13)
+            self.assertEqual(len(results), 15)
+
+    def test_meaningfulness_budget_stop(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pages = [page_images(tmp, 1, 3), page_images(tmp, 2, 1)]
+
+            async def meaningfulness(config, page, images):
+                return [ImageMeaningfulness(image_id=img.image_id, is_meaningful=False, reasoning="an ornament") for img in images]
+
+            async def stopped(config, page, image):
+                raise BudgetExceeded("run cost limit reached")
+
+            with (
+                patch("adt_press.nodes.image_nodes.get_images_meaningfulness", meaningfulness),
+                patch("adt_press.nodes.image_nodes.get_image_meaningfulness", stopped),
+            ):
+                results = image_meaningfulness__separate(MEANINGFULNESS_PROMPT, pages, {}, {}, {}, {}, HeuristicImageFilterConfig(), {})
+
+            # images the budget didn't allow checking are kept, saying why
+            self.assertEqual(sorted(r.image_id for r in results.values() if not r.is_meaningful), ["img_p1_r0", "img_p1_r1", "img_p1_r2"])
+            self.assertTrue(results["img_p2_r0"].is_meaningful)
+            self.assertIn("budget", results["img_p2_r0"].reasoning)
+
+    def test_plan_batched(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pages = [page_images(tmp, 1, 4), page_images(tmp, 2, 2)]
+            config = DictConfig(OmegaConf.merge(OmegaConf.load("config/config.yaml"), dict(label="plan", pdf_path="book.pdf")))
+            unbatched = {n.node_name: n for n in plan_pages(config, pages, 2).nodes}
+
+            config.prompts.meaningfulness.batch_template_path = MEANINGFULNESS_PROMPT.batch_template_path
+            batched = {n.node_name: n for n in plan_pages(config, pages, 2).nodes}
+
+            # one request per page instead of one per image
+            self.assertEqual(unbatched["image_meaningfulness"].calls, 6)
+            self.assertEqual(batched["image_meaningfulness"].calls, 2)
+            self.assertLess(batched["image_meaningfulness"].prompt_tokens, unbatched["image_meaningfulness"].prompt_tokens)
@@ -0,0 +1,110 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from adt_press.models.config import CropPromptConfig
+from adt_press.models.image import CropCoordinates, Image, ImageMeaningfulness
+from adt_press.models.pdf import Page
+from adt_press.nodes.config_nodes import ImageDedupConfig
+from adt_press.nodes.image_nodes import image_crops__llm, image_duplicates__phash, shared_with_duplicates
+from adt_press.utils.image import encode_png
+from adt_press.utils.image_hash import BKTree, hamming, near_duplicates, phash
+
+CROP_PROMPT = CropPromptConfig(model="gpt-4o", template_path="prompts/image_crop_storybook.jinja2")
+
+
+def drawing(seed: int, width: int = 400, height: int = 300) -> np.ndarray:
+    rng = random.Random(seed)
+    image = np.full((300, 400, 3), 255, dtype=np.uint8)
+    for _ in range(8):
+        color = [rng.randint(0, 255) for _ in range(3)]
+        cv2.circle(image, (rng.randint(0, 400), rng.randint(0, 300)), rng.randint(20, 100), color, -1)
+    return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+
+class TestImageHash(unittest.TestCase):
+    """Test finding near duplicate images by their perceptual hashes."""
+
+    def test_phash(self):
+        original = drawing(0)
+
+        # small differences, compression and scale barely change the hash
+        speckled = original.copy()
+        speckled[10:14, 10:14] = 0
+        jpeg = cv2.imdecode(cv2.imencode(".jpg", original, [cv2.IMWRITE_JPEG_QUALITY, 60])[1], cv2.IMREAD_COLOR)
+        for similar in (speckled, jpeg, drawing(0, 800, 600)):
+            self.assertLessEqual(hamming(phash(encode_png(original)), phash(encode_png(similar))), 4)
+
+        for seed in range(1, 6):
+            self.assertGreater(hamming(phash(encode_png(original)), phash(encode_png(drawing(seed)))), 10)
+
+    def test_bk_tree(self):
+        rng = random.Random(0)
+        hashes = [rng.getrandbits(64) for _ in range(500)]
+        tree: BKTree[int] = BKTree()
+        for i, h in enumerate(hashes):
+            tree.add(h, i)
+
+        # the tree finds exactly the hashes comparing every one would
+        for query in hashes[:20] + [hashes[0] ^ 0b1011]:
+            expected = sorted((hamming(query, h), i) for i, h in enumerate(hashes) if hamming(query, h) <= 28)
+            self.assertEqual(sorted(tree.search(query, 28)), expected)
+
+    def test_near_duplicates(self):
+        base = 0xFFFF0000FFFF0000
+        ids = ["a", "b", "c", "d", "e"]
+        hashes = [base, base ^ 0b1, ~base & (2**64 - 1), base ^ 0b111, base ^ 0b111111]
+
+        # d is closer to b, but b is a duplicate itself, and e is too far from a
+        self.assertEqual(near_duplicates(ids, hashes, 4), {"b": "a", "d": "a"})
+
+    def test_shared_with_duplicates(self):
+        results = {"a": ImageMeaningfulness(image_id="a", is_meaningful=True, reasoning="a fox")}
+        shared = shared_with_duplicates(results, {"b": "a", "c": "missing"})
+        self.assertEqual(shared["b"], ImageMeaningfulness(image_id="b", is_meaningful=True, reasoning="a fox"))
+        self.assertNotIn("c", shared)
+
+    def test_duplicate_crops(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            images = []
+            for i, (seed, width, height) in enumerate([(0, 400, 300), (1, 400, 300), (0, 800, 600)]):
+                path = os.path.join(tmp, f"img_p1_r{i}.png")
+                cv2.imwrite(path, drawing(seed, width, height))
+                images.append(
+                    Image(
+                        image_id=f"img_p1_r{i}",
+                        image_path=path,
+                        chart_path=path,
+                        page_id="p1",
+                        index=i,
+                        width=width,
+                        height=height,
+                        image_type="png",
+                    )
+                )
+            page = Page(page_id="p1", page_number=1, page_image_path=images[0].image_path, text="", images=images)
+
+            duplicates = image_duplicates__phash(images, {}, {}, {}, ImageDedupConfig())
+            self.assertEqual(duplicates, {"img_p1_r2": "img_p1_r0"})
+
+            cropped = []
+
+            async def crop_coordinates(config, page, image):
+                cropped.append(image.image_id)
+                return CropCoordinates(top_left_x=10, top_left_y=20, bottom_right_x=110, bottom_right_y=220)
+
+            with patch("adt_press.nodes.image_nodes.get_image_crop_coordinates", crop_coordinates):
+                crops = image_crops__llm(CROP_PROMPT, [page], set(), duplicates)
+
+            # only the originals are sent to the LLM, the duplicate's crop is scaled to its size
+            self.assertEqual(sorted(cropped), ["img_p1_r0", "img_p1_r1"])
+            self.assertEqual(
+                crops["img_p1_r2"].crop_coordinates,
+                CropCoordinates(top_left_x=20, top_left_y=40, bottom_right_x=220, bottom_right_y=440),
+            )
+            self.assertEqual(cv2.imread(crops["img_p1_r2"].image_path).shape[:2], (400, 200))
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from adt_press.models.config import BatchPromptConfig
+from adt_press.models.image import Image, ImageFilterFailure, ImageMeaningfulness
+from adt_press.models.pdf import Page
+from adt_press.nodes.config_nodes import HeuristicImageFilterConfig
+from adt_press.nodes.image_nodes import image_heuristic_filter_failures, image_heuristic_scores__heuristic, image_meaningfulness__separate
+from adt_press.utils.image import encode_png
+from adt_press.utils.image_heuristics import heuristic_score, image_features
+
+MEANINGFULNESS_PROMPT = BatchPromptConfig(model="gpt-4o", template_path="prompts/image_meaningfulness.jinja2")
+
+
+def gradient() -> np.ndarray:
+    return cv2.cvtColor(np.tile(np.linspace(0, 255, 400).astype(np.uint8), (300, 1)), cv2.COLOR_GRAY2BGR)
+
+
+def rule() -> np.ndarray:
+    image = np.full((40, 1200, 3), 255, dtype=np.uint8)
+    image[18:22] = 0
+    return image
+
+
+def ornament() -> np.ndarray:
+    image = np.full((200, 600, 3), 255, dtype=np.uint8)
+    for i in range(6):
+        cv2.circle(image, (50 + 100 * i, 100), 40, (30, 60, 160), 3, cv2.LINE_AA)
+    return image
+
+
+def photo() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    smooth = cv2.resize(rng.integers(0, 255, (30, 40, 3), dtype=np.uint8), (800, 600), interpolation=cv2.INTER_CUBIC)
+    return np.clip(smooth + rng.normal(0, 12, (600, 800, 3)), 0, 255).astype(np.uint8)
+
+
+class TestImageHeuristics(unittest.TestCase):
+    """Test scoring images locally before asking the LLM if they are meaningful."""
+
+    def test_heuristic_score(self):
+        config = HeuristicImageFilterConfig()
+
+        def score(image: np.ndarray, pages: int = 1) -> float:
+            return heuristic_score(image_features(encode_png(image)), pages, config.strip_aspect, config.repeated_on)[0]
+
+        self.assertLess(score(gradient()), config.prune_below)
+        self.assertLess(score(rule()), config.prune_below)
+        self.assertGreaterEqual(score(photo()), config.accept_above)
+
+        # a single ornament is left to the LLM, but one repeated on every page is a decoration
+        self.assertTrue(config.prune_below <= score(ornament()) < config.accept_above)
+        self.assertLess(score(ornament(), pages=3), config.prune_below)
+
+        _, reasoning = heuristic_score(image_features(encode_png(rule())), 1, config.strip_aspect, config.repeated_on)
+        self.assertIn("thin strip", reasoning)
+
+    def test_meaningfulness_prefilter(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pages = []
+            images = []
+            for page_number, drawings in enumerate([[gradient(), photo(), ornament()], [ornament(), rule()], [ornament()]], 1):
+                page_images = []
+                for i, drawing in enumerate(drawings):
+                    path = os.path.join(tmp, f"img_p{page_number}_r{i}.png")
+                    cv2.imwrite(path, drawing)
+                    height, width = drawing.shape[:2]
+                    page_images.append(
+                        Image(
+                            image_id=f"img_p{page_number}_r{i}",
+                            image_path=path,
+                            chart_path=path,
+                            page_id=f"p{page_number}",
+                            index=i,
+                            width=width,
+                            height=height,
+                            image_type="png",
+                        )
+                    )
+                pages.append(Page(page_id=f"p{page_number}", page_number=page_number, page_image_path=path, text="", images=page_images))
+                images.extend(page_images)
+
+            config = HeuristicImageFilterConfig()
+            too_small = {"img_p3_r0": ImageFilterFailure(image_id="img_p3_r0", filter="size", reasoning="side < 150 pixels")}
+            scores = image_heuristic_scores__heuristic(images, {}, too_small, config)
+            failures = image_heuristic_filter_failures(scores, config)
+
+            # the ornament is only repeated on two pages once the third one is filtered by size
+            self.assertNotIn("img_p3_r0", scores)
+            self.assertEqual(sorted(failures), ["img_p1_r0", "img_p2_r1"])
+            self.assertEqual(failures["img_p2_r1"].filter, "heuristic")
+
+            asked = []
+
+            async def meaningfulness(config, page, image):
+                asked.append(image.image_id)
+                return ImageMeaningfulness(image_id=image.image_id, is_meaningful=False, reasoning="an ornament")
+
+            with patch("adt_press.nodes.image_nodes.get_image_meaningfulness", meaningfulness):
+                results = image_meaningfulness__separate(MEANINGFULNESS_PROMPT, pages, {}, too_small, failures, scores, config, {})
+
+            # only the ambiguous ornaments are sent to the LLM, the photo is accepted without it
+            self.assertEqual(sorted(asked), ["img_p1_r2", "img_p2_r0"])
+            self.assertTrue(results["img_p1_r1"].is_meaningful)
+            self.assertIn("heuristic score", results["img_p1_r1"].reasoning)
+            self.assertEqual(sorted(results), ["img_p1_r1", "img_p1_r2", "img_p2_r0"])
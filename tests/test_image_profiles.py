@@ -0,0 +1,88 @@
+import asyncio
+import base64
+import unittest
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from adt_press.llm import image_caption
+from adt_press.llm.gateway import create_completion
+from adt_press.llm.image_profiles import profiled_messages
+from adt_press.models.config import PromptConfig
+from adt_press.planner import image_tokens
+from adt_press.utils.image import decode_image, downscaled_image
+
+PROMPT = PromptConfig(model="gpt-4o", template_path="prompts/image_caption.jinja2")
+THUMBNAIL_PROMPT = PROMPT.model_copy(update={"max_image_side": 512, "image_format": "jpeg"})
+
+
+def data_url(image: np.ndarray) -> str:
+    return "data:image/png;base64," + base64.b64encode(cv2.imencode(".png", image)[1].tobytes()).decode("ascii")
+
+
+def messages(url: str) -> list[dict]:
+    return [
+        dict(role="system", content="You are an expert in captioning images."),
+        dict(role="user", content=[dict(type="text", text="Caption this image."), dict(type="image_url", image_url=dict(url=url))]),
+    ]
+
+
+class TestImageProfiles(unittest.TestCase):
+    """Test shrinking the images sent with a prompt to what the prompt needs."""
+
+    def test_downscaled_image(self):
+        photo = np.random.default_rng(0).integers(0, 255, (1000, 2000, 3), dtype=np.uint8)
+        original = cv2.imencode(".png", photo)[1].tobytes()
+
+        jpeg = downscaled_image(original, 512, "jpeg", 85)
+        self.assertEqual(decode_image(jpeg).shape, (256, 512, 3))
+        self.assertLess(len(jpeg), len(original) / 10)
+
+        # images are never enlarged, and transparency is flattened onto white for jpeg
+        transparent = np.zeros((100, 100, 4), dtype=np.uint8)
+        flattened = decode_image(downscaled_image(cv2.imencode(".png", transparent)[1].tobytes(), 512, "jpeg", 85))
+        self.assertEqual(flattened.shape, (100, 100, 3))
+        self.assertGreater(flattened.min(), 250)
+
+    def test_profiled_messages(self):
+        url = data_url(np.random.default_rng(1).integers(0, 255, (1000, 800, 3), dtype=np.uint8))
+
+        with patch("adt_press.llm.image_profiles.downscaled_image", wraps=downscaled_image) as downscale:
+            profiled = profiled_messages(messages(url), THUMBNAIL_PROMPT)
+            again = profiled_messages(messages(url), THUMBNAIL_PROMPT)
+
+        # the derived image is made once and reused, everything but the image is kept as is
+        self.assertEqual(downscale.call_count, 1)
+        self.assertEqual(profiled, again)
+        self.assertEqual(profiled[0], messages(url)[0])
+        self.assertEqual(profiled[1]["content"][0], messages(url)[1]["content"][0])
+
+        derived = profiled[1]["content"][1]["image_url"]["url"]
+        self.assertTrue(derived.startswith("data:image/jpeg;base64,"))
+        self.assertEqual(decode_image(base64.b64decode(derived.partition(",")[2])).shape, (512, 410, 3))
+
+        # prompts without a profile, small images already in the right format and remote images are sent as they are
+        small = data_url(np.full((50, 50, 3), 255, dtype=np.uint8))
+        self.assertEqual(profiled_messages(messages(url), PROMPT), messages(url))
+        self.assertEqual(profiled_messages(messages(small), PROMPT.model_copy(update={"max_image_side": 512})), messages(small))
+        remote = "https://example.com/fox.png"
+        self.assertEqual(profiled_messages(messages(remote), THUMBNAIL_PROMPT), messages(remote))
+
+    def test_completion_sends_profiled_images(self):
+        url = data_url(np.random.default_rng(2).integers(0, 255, (1000, 800, 3), dtype=np.uint8))
+        sent = []
+
+        async def completion(model, max_retries, response_model, messages, telemetry=None, **kwargs):
+            sent.append(messages)
+            return image_caption.CaptionResponse(caption="A fox.", reasoning="a fox")
+
+        with patch("adt_press.llm.gateway.litellm_completion", completion):
+            asyncio.run(create_completion(THUMBNAIL_PROMPT, response_model=image_caption.CaptionResponse, messages=messages(url)))
+
+        self.assertTrue(sent[0][1]["content"][1]["image_url"]["url"].startswith("data:image/jpeg;base64,"))
+
+    def test_image_tokens(self):
+        self.assertEqual(image_tokens(PROMPT), 800)
+        self.assertEqual(image_tokens(THUMBNAIL_PROMPT), 200)
+        self.assertEqual(image_tokens(PROMPT.model_copy(update={"max_image_side": 64})), 85)
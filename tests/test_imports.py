@@ -0,0 +1,16 @@
+import os
+import subprocess
+import sys
+import unittest
+
+
+class TestImports(unittest.TestCase):
+    """Test that slow optional libraries are only imported when used."""
+
+    def test_pipeline_imports_lazily(self):
+        env = {k: v for k, v in os.environ.items() if k not in ("LANGFUSE_HOST", "MLFLOW_TRACKING_URI")}
+        lazy = ["litellm", "instructor", "mlflow", "langfuse", "matplotlib", "cv2", "bs4"]
+        code = f"import sys, adt_press.pipeline; print(','.join(m for m in {lazy!r} if m in sys.modules))"
+
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env)
+        self.assertEqual(result.stdout.strip(), "")
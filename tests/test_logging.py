@@ -0,0 +1,43 @@
+import unittest
+
+from omegaconf import DictConfig
+
+from adt_press.models.text import PageText, PageTextGroup, PageTexts
+from adt_press.utils.logging import summarize_value
+
+
+class TestLogging(unittest.TestCase):
+    """Test summarizing node results for logging."""
+
+    def test_summarize_value(self):
+        texts = {
+            f"p{i}": PageTexts(
+                page_id=f"p{i}",
+                groups=[
+                    PageTextGroup(
+                        group_id="g", group_type="paragraph", texts=[PageText(text_id="t", text="x" * 1000, text_type="section_text")]
+                    )
+                ],
+                reasoning="",
+            )
+            for i in range(100)
+        }
+
+        summary = summarize_value(texts)
+        self.assertEqual(summary["type"], "dict[str, PageTexts]")
+        self.assertEqual(summary["count"], 100)
+        self.assertGreater(summary["bytes"], 100_000)
+        self.assertEqual(len(summary["hash"]), 16)
+
+        # the summary itself stays small and identifies the content
+        self.assertLess(len(str(summary)), 200)
+        self.assertEqual(summarize_value(dict(texts))["hash"], summary["hash"])
+        texts["p0"].reasoning = "changed"
+        self.assertNotEqual(summarize_value(texts)["hash"], summary["hash"])
+
+    def test_summarize_other_values(self):
+        self.assertEqual(summarize_value(["a", "b"])["type"], "list[str]")
+        self.assertEqual(summarize_value([])["count"], 0)
+        self.assertNotIn("count", summarize_value(3))
+        self.assertEqual(summarize_value(DictConfig({"label": "raven"}))["type"], "DictConfig")
+        self.assertEqual(summarize_value(None)["type"], "NoneType")
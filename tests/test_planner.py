@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+from omegaconf import DictConfig, OmegaConf
+
+from adt_press.models.image import Image
+from adt_press.models.pdf import Page
+from adt_press.planner import plan_pages, rendered_prompt_tokens, run_dry_run, sample_page_numbers
+
+
+def sample_pages(directory: str, count: int) -> list[Page]:
+    pages = []
+    noise = np.random.default_rng(0).integers(0, 255, (300, 400, 3), dtype=np.uint8)
+    for p in range(1, count + 1):
+        image_path = os.path.join(directory, f"img_p{p}_r0.png")
+        cv2.imwrite(image_path, noise)
+        blank_path = os.path.join(directory, f"img_p{p}_r1.png")
+        cv2.imwrite(blank_path, np.full((300, 400, 3), 255, dtype=np.uint8))
+
+        images = [
+            Image(
+                image_id=f"img_p{p}_r{i}",
+                image_path=path,
+                chart_path=path,
+                page_id=f"p{p}",
+                index=i,
+                width=400,
+                height=300,
+                image_type="png",
+            )
+            for i, path in enumerate([image_path, blank_path])
+        ]
+        pages.append(Page(page_id=f"p{p}", page_number=p, page_image_path=image_path, text="word " * 80, images=images))
+    return pages
+
+
+class TestPlanner(unittest.TestCase):
+    """Test estimating the LLM requests of a run without making them."""
+
+    def config(self, **overrides) -> DictConfig:
+        return DictConfig(OmegaConf.merge(OmegaConf.load("config/config.yaml"), dict(label="plan", pdf_path="book.pdf", **overrides)))
+
+    def test_sample_page_numbers(self):
+        self.assertEqual(sample_page_numbers(1, 5, 0), [1, 2, 3, 4, 5])
+        self.assertEqual(sample_page_numbers(1, 5, 10), [1, 2, 3, 4, 5])
+        self.assertEqual(sample_page_numbers(1, 500, 4), [1, 126, 251, 376])
+
+    def test_rendered_prompt_tokens(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            page = sample_pages(tmp, 1)[0]
+            tokens = rendered_prompt_tokens("prompts/text_extraction_groups.jinja2", dict(page=page))
+            empty = rendered_prompt_tokens("prompts/text_extraction_groups.jinja2", dict(page=page.model_copy(update=dict(text=""))))
+
+            # the page image is counted without reading it and the page text is rendered into the prompt
+            self.assertGreater(empty, 800)
+            self.assertEqual(tokens - empty, len(page.text) // 4)
+
+    def test_plan_pages(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pages = sample_pages(tmp, 2)
+
+            plan = plan_pages(self.config(output_languages=["en", "es"]), pages, 500)
+            nodes = {n.node_name: n for n in plan.nodes}
+
+            self.assertEqual(plan.pages, 500)
+            self.assertEqual(plan.sampled_pages, 2)
+
+            # blank images are filtered before any requests are made
+            self.assertEqual(plan.images, 500)
+            self.assertEqual(nodes["pdf_texts"].calls, 500)
+            self.assertEqual(nodes["image_meaningfulness"].calls, 500)
+
+            # each crop is followed by two recrops
+            self.assertEqual(nodes["image_crops"].calls, 3 * nodes["image_captions_by_id"].calls)
+
+            # text is only translated to languages other than the plate language
+            self.assertEqual(nodes["plate_output_texts_by_id"].calls, 0)
+            self.assertGreater(nodes["plate_translations"].calls, 0)
+            self.assertEqual(nodes["speech_files"].calls, 2 * nodes["plate_translations"].calls)
+
+            self.assertEqual(plan.calls, sum(n.calls for n in plan.nodes))
+            self.assertGreater(nodes["pdf_texts"].prompt_tokens, 500 * 800)
+            self.assertGreater(plan.seconds, 0)
+
+            # disabled strategies don't make requests
+            plan = plan_pages(self.config(caption_strategy="none", speech_strategy="none", crop_strategy="none"), pages, 500)
+            nodes = {n.node_name: n for n in plan.nodes}
+            self.assertNotIn("image_captions_by_id", nodes)
+            self.assertNotIn("image_crops", nodes)
+            self.assertNotIn("speech_files", nodes)
+            self.assertIn("section_glossaries_by_id", nodes)
+
+    def test_plan_combined_image_analysis(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pages = sample_pages(tmp, 2)
+            nodes = {n.node_name: n for n in plan_pages(self.config(image_analysis_strategy="combined"), pages, 500).nodes}
+
+            # one request per image replaces the meaningfulness, caption and crop requests
+            self.assertEqual(nodes["image_analyses"].calls, 500)
+            self.assertNotIn("image_meaningfulness", nodes)
+            self.assertNotIn("image_captions_by_id", nodes)
+            self.assertNotIn("image_crops", nodes)
+
+    def test_dry_run_leaves_output_alone(self):
+        extracted_to = []
+
+        def extract(output_dir, pdf_path, start, end):
+            extracted_to.append(output_dir)
+            os.makedirs(os.path.join(output_dir, "extract"))
+            return sample_pages(os.path.join(output_dir, "extract"), end - start + 1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            config = self.config(run_output_dir=tmp, page_range=dict(start=1, end=3))
+            with patch("adt_press.planner.pages_for_pdf", side_effect=extract):
+                plan = run_dry_run(config)
+
+            # the sample is extracted elsewhere and removed, only the plan is written to the run's output
+            self.assertEqual(plan.sampled_pages, 3)
+            self.assertFalse(extracted_to[0].startswith(tmp))
+            self.assertFalse(os.path.exists(extracted_to[0]))
+            self.assertEqual(os.listdir(tmp), ["plan.json"])
@@ -0,0 +1,39 @@
+import os
+
+from adt_press.models.profile import RunProfile
+from adt_press.pipeline import NodeHook, write_profile
+from tests.helpers import RunTestCase, caption_driver, run_captions
+
+
+class TestProfile(RunTestCase):
+    """Test profiling pipeline nodes."""
+
+    def run_profiled(self) -> RunProfile:
+        hook = NodeHook(trace_memory=True)
+        dr = caption_driver(hook, os.path.join(self.temp_dir, "cache"))
+        run_captions(dr, 3)
+
+        write_profile(dr, hook, self.config)
+        return RunProfile.model_validate_json(open(os.path.join(self.temp_dir, "profile.json")).read())
+
+    def test_profile_nodes(self):
+        profile = self.run_profiled()
+        nodes = {n.node_name: n for n in profile.nodes}
+        self.assertEqual(set(nodes), {"words", "captions"})
+
+        captions = nodes["captions"]
+        self.assertTrue(captions.success)
+        self.assertEqual(captions.cache, "miss")
+        self.assertGreaterEqual(captions.start, nodes["words"].start)
+        self.assertIsNotNone(captions.tracemalloc_peak_bytes)
+        self.assertEqual([(c.family, c.calls) for c in captions.llm_calls], [("image_caption", 3)])
+        self.assertEqual(nodes["words"].llm_calls, [])
+
+        # the timeline is rendered next to the profile
+        with open(os.path.join(self.temp_dir, "profile.html")) as f:
+            self.assertIn("captions", f.read())
+
+        # a second run reads everything from the cache without calling the LLM
+        profile = self.run_profiled()
+        self.assertEqual({n.cache for n in profile.nodes}, {"hit"})
+        self.assertEqual([n.llm_calls for n in profile.nodes], [[], []])
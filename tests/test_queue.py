@@ -0,0 +1,230 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from adt_press.llm.gateway import (
+    configure_backend,
+    configure_queue,
+    create_completion,
+    gateway,
+    import_response_model,
+    queued_result,
+    recorded_calls,
+    request_key,
+    reset_call_stats,
+)
+from adt_press.llm.image_caption import CaptionResponse
+from adt_press.models.config import BudgetConfig, BudgetLimits, PromptConfig
+from adt_press.models.queue import Job
+from adt_press.utils.budget import Budget, within_budget
+from adt_press.utils.queue import FileJobQueue
+from adt_press.worker import run_worker
+
+
+class TestQueue(unittest.TestCase):
+    """Test the file backed job queue and the workers reading from it."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.queue = FileJobQueue(self.temp_dir, claim_timeout=60)
+
+        # requests must reach the queue, not a response cache left by another test
+        gateway.configure()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        configure_queue("")
+        configure_backend("litellm")
+        reset_call_stats()
+        gateway.queue_poll_interval = 1.0
+
+    def test_claim_complete_and_fail(self):
+        self.queue.enqueue(Job(job_id="a", kind="completion", model="gpt-4o"))
+        self.queue.enqueue(Job(job_id="b", kind="completion", model="gpt-4o"))
+
+        # claims are exclusive
+        first = self.queue.claim()
+        second = self.queue.claim()
+        self.assertEqual({first.job_id, second.job_id}, {"a", "b"})
+        self.assertIsNone(self.queue.claim())
+        self.assertEqual(self.queue.counts()["claimed"], 2)
+
+        self.queue.complete("a", b"result")
+        self.queue.fail("b", "boom")
+        self.assertEqual(self.queue.result("a"), b"result")
+        self.assertEqual(self.queue.error("b"), "boom")
+
+        # done jobs are never requeued, failed ones only when retrying the failure seen
+        self.queue.enqueue(Job(job_id="a", kind="completion", model="gpt-4o"))
+        self.queue.enqueue(Job(job_id="b", kind="completion", model="gpt-4o"))
+        self.assertEqual(self.queue.counts(), dict(pending=0, claimed=0, done=1, failed=1))
+        self.queue.enqueue(Job(job_id="b", kind="completion", model="gpt-4o"), retry_failure="boom")
+        self.assertEqual(self.queue.counts(), dict(pending=1, claimed=0, done=1, failed=0))
+
+    def test_requeue_stale(self):
+        self.queue.enqueue(Job(job_id="a", kind="completion", model="gpt-4o"))
+        self.queue.claim()
+
+        self.assertEqual(self.queue.requeue_stale(), 0)
+
+        # pretend the worker claimed it long ago and died
+        claimed = os.path.join(self.temp_dir, "claimed", "a.json")
+        os.utime(claimed, (time.time() - 120, time.time() - 120))
+        self.assertEqual(self.queue.requeue_stale(), 1)
+        self.assertEqual(self.queue.claim().job_id, "a")
+
+    def test_worker_keeps_claim(self):
+        queue = FileJobQueue(self.temp_dir, claim_timeout=0.2)
+        queue.enqueue(Job(job_id="a", kind="speech", model="tts-1"))
+
+        async def slow_speech(model, **kwargs):
+            await asyncio.sleep(0.5)
+            return b"audio"
+
+        async def run():
+            worker = asyncio.create_task(run_worker(queue, idle_timeout=0.05, poll_interval=0.01))
+            requeued = 0
+            for _ in range(10):
+                await asyncio.sleep(0.05)
+                requeued += queue.requeue_stale()
+            return requeued, await worker
+
+        # the job outlasts the claim timeout, but its worker keeps refreshing the claim so it is only executed once
+        with patch("adt_press.worker.litellm_speech", slow_speech):
+            requeued, executed = asyncio.run(run())
+        self.assertEqual(requeued, 0)
+        self.assertEqual(executed, 1)
+        self.assertEqual(queue.result("a"), b"audio")
+
+    def test_queue_timeout(self):
+        configure_queue(self.temp_dir, timeout=0.1)
+        gateway.queue_poll_interval = 0.01
+        job = Job(job_id="a", kind="completion", family="image_caption", model="gpt-4o")
+
+        # without workers the request fails instead of waiting forever, leaving the job queued for a later run
+        with self.assertRaises(TimeoutError):
+            asyncio.run(queued_result(gateway.queue, job))
+        self.assertTrue(self.queue.is_queued("a"))
+
+    def test_failure_while_polling(self):
+        configure_queue(self.temp_dir, timeout=1)
+        gateway.queue_poll_interval = 0.01
+        job = Job(job_id="a", kind="completion", family="image_caption", model="gpt-4o")
+        error = gateway.queue.error
+        failed = False
+
+        def fail_after_looking(job_id):
+            # the worker records its failure right after the waiter looked for one
+            nonlocal failed
+            seen = error(job_id)
+            if gateway.queue.is_queued(job_id) and not failed:
+                gateway.queue.claim()
+                gateway.queue.fail(job_id, "boom")
+                failed = True
+            return seen
+
+        with patch.object(gateway.queue, "error", side_effect=fail_after_looking):
+            with self.assertRaisesRegex(RuntimeError, "boom"):
+                asyncio.run(queued_result(gateway.queue, job))
+
+    def test_lost_job_requeued(self):
+        configure_queue(self.temp_dir, timeout=5)
+        gateway.queue_poll_interval = 0.01
+        job = Job(job_id="a", kind="completion", family="image_caption", model="gpt-4o")
+
+        async def run():
+            waiting = asyncio.create_task(queued_result(gateway.queue, job))
+            await asyncio.sleep(0.05)
+
+            # the job file disappears, e.g. removed by hand, so it is queued again for a worker to answer
+            os.remove(os.path.join(self.temp_dir, "pending", "a.json"))
+            while not self.queue.is_queued("a"):
+                await asyncio.sleep(0.01)
+            self.queue.complete(self.queue.claim().job_id, b"result")
+            return await waiting
+
+        self.assertEqual(asyncio.run(run()), b"result")
+
+    def test_backends_never_share_jobs(self):
+        messages = [{"role": "user", "content": "one"}]
+        real_key = request_key("gpt-4o", CaptionResponse, messages)
+        configure_backend("fake")
+        self.assertNotEqual(request_key("gpt-4o", CaptionResponse, messages), real_key)
+
+        # a fake worker fails jobs queued by a real run instead of answering them with made up responses
+        self.queue.enqueue(
+            Job(job_id=real_key, kind="completion", model="gpt-4o", response_model=f"{CaptionResponse.__module__}:CaptionResponse")
+        )
+        executed = asyncio.run(run_worker(self.queue, idle_timeout=0.05, poll_interval=0.01))
+        self.assertEqual(executed, 1)
+        self.assertIsNone(self.queue.result(real_key))
+        self.assertIn("litellm backend", self.queue.error(real_key))
+
+    def test_worker_usage_counts_against_budget(self):
+        configure_queue(self.temp_dir)
+        gateway.queue_poll_interval = 0.01
+        config = PromptConfig(model="gpt-4o", template_path="prompts/image_caption.jinja2", examples=[])
+
+        async def fake_completion(model, max_retries, response_model, messages, telemetry, **kwargs):
+            telemetry.attempts += 1
+            telemetry.prompt_tokens += 10
+            telemetry.cost = 0.1
+            return response_model(reasoning="worker", caption=messages[0]["content"])
+
+        async def run(contents):
+            worker = asyncio.create_task(run_worker(FileJobQueue(self.temp_dir), idle_timeout=0.1, poll_interval=0.01))
+            responses = []
+            for content in contents:
+                messages = [{"role": "user", "content": content}]
+                responses.append(await within_budget(create_completion(config, response_model=CaptionResponse, messages=messages)))
+            await worker
+            return responses
+
+        # the worker reports the tokens it used, so the budget stops the third request
+        reset_call_stats(Budget(BudgetConfig(node=BudgetLimits(max_tokens=15))))
+        with patch("adt_press.worker.litellm_completion", fake_completion):
+            responses = asyncio.run(run(["one", "two", "three"]))
+        self.assertEqual([r.caption if r else None for r in responses], ["one", "two", None])
+        self.assertEqual([(c.prompt_tokens, c.cost, c.attempts) for c in recorded_calls()], [(10, 0.1, 1), (10, 0.1, 1)])
+
+        # results of earlier runs are free
+        reset_call_stats(Budget(BudgetConfig(node=BudgetLimits(max_tokens=15))))
+        responses = asyncio.run(run(["one", "two"]))
+        self.assertEqual([r.caption for r in responses], ["one", "two"])
+        self.assertEqual([(c.cached, c.prompt_tokens) for c in recorded_calls()], [(True, 0), (True, 0)])
+
+    def test_import_response_model(self):
+        self.assertIs(import_response_model("adt_press.llm.image_caption:CaptionResponse"), CaptionResponse)
+
+        # job files may come from a shared filesystem, so they can't make workers import anything else
+        for path in ("os:system", "adt_pressx.evil:Model", "adt_press.llm.image_caption:get_image_caption", ":CaptionResponse"):
+            with self.subTest(path=path):
+                with self.assertRaises(ValueError):
+                    import_response_model(path)
+
+    def test_gateway_waits_for_worker(self):
+        configure_queue(self.temp_dir)
+        gateway.queue_poll_interval = 0.01
+        config = PromptConfig(model="gpt-4o", template_path="prompts/image_caption.jinja2", examples=[])
+
+        async def fake_completion(model, max_retries, response_model, messages, **kwargs):
+            return response_model(reasoning="worker", caption=messages[0]["content"])
+
+        async def run():
+            worker = asyncio.create_task(run_worker(FileJobQueue(self.temp_dir), idle_timeout=0.2, poll_interval=0.01))
+            responses = await asyncio.gather(
+                create_completion(config, response_model=CaptionResponse, messages=[{"role": "user", "content": "one"}]),
+                create_completion(config, response_model=CaptionResponse, messages=[{"role": "user", "content": "two"}]),
+            )
+            return responses, await worker
+
+        with patch("adt_press.worker.litellm_completion", fake_completion):
+            responses, executed = asyncio.run(run())
+
+        self.assertEqual([r.caption for r in responses], ["one", "two"])
+        self.assertEqual(executed, 2)
+        self.assertEqual(self.queue.counts()["done"], 2)
@@ -0,0 +1,160 @@
+import json
+import os
+import tempfile
+import unittest
+from collections import Counter
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+from omegaconf import DictConfig
+
+from adt_press.llm.gateway import configure_backend, gateway
+from adt_press.models.image import Image
+from adt_press.models.pdf import Page
+from adt_press.models.plate import Plate, PlateGroup, PlateImage, PlateSection, PlateText
+from adt_press.models.section import GlossaryItem, SectionType
+from adt_press.shard import merge_plates, run_merge, run_shard, shard_configs, shard_page_ranges
+from adt_press.utils.config import load_run_config
+
+
+def shard_plate(pages: list[int], words: dict[str, str]) -> Plate:
+    return Plate(
+        title="Book",
+        language_code="en",
+        sections=[
+            PlateSection(
+                section_id=f"sec_p{p}_s0",
+                section_type=SectionType.text_only,
+                page_image_path=f"page_{p}.png",
+                part_ids=[f"grp_p{p}_g0", f"img_p{p}_r0"],
+                explanation_id=None,
+                background_color="#ffffff",
+                text_color="#000000",
+                layout_type="single_column",
+            )
+            for p in pages
+        ],
+        images=[PlateImage(image_id=f"img_p{p}_r0", image_path=f"img_p{p}_r0.png", caption_id=f"img_p{p}_r0") for p in pages],
+        groups=[PlateGroup(group_id=f"grp_p{p}_g0", group_type="paragraph", text_ids=[f"txt_p{p}_g0_t0"]) for p in pages],
+        texts=[PlateText(text_id=f"txt_p{p}_g0_t0", text_type="paragraph", text=f"page {p}") for p in pages],
+        glossary=[GlossaryItem(word=w, variations=[], definition=d, emojis=[]) for w, d in words.items()],
+    )
+
+
+def extracted_pages(output_dir: str, pdf_path: str, start: int, end: int) -> list[Page]:
+    """Stands in for the pdf extractor, returning pages with a paragraph and an image each."""
+    os.makedirs(os.path.join(output_dir, "images"), exist_ok=True)
+    pages = []
+    for p in range(start, end + 1):
+        page_path = os.path.join(output_dir, "images", f"page_{p}.png")
+        cv2.imwrite(page_path, np.full((792, 612, 3), 255, dtype=np.uint8))
+        image_path = os.path.join(output_dir, "images", f"img_p{p}_r0.png")
+        cv2.imwrite(image_path, np.random.default_rng(p).integers(0, 255, (300, 400, 3), dtype=np.uint8))
+
+        image = Image(
+            image_id=f"img_p{p}_r0",
+            image_path=image_path,
+            chart_path=image_path,
+            page_id=f"p{p}",
+            index=0,
+            width=400,
+            height=300,
+            image_type="png",
+        )
+        pages.append(Page(page_id=f"p{p}", page_number=p, page_image_path=page_path, text="The fox ran over the hill.", images=[image]))
+    return pages
+
+
+def calls_by_node(run_output_dir: str) -> Counter:
+    with open(os.path.join(run_output_dir, "telemetry.jsonl")) as f:
+        return Counter(json.loads(line)["node_name"] for line in f)
+
+
+class TestShard(unittest.TestCase):
+    """Test splitting books into page ranges and merging the plates of each shard."""
+
+    def tearDown(self):
+        gateway.configure()
+        configure_backend("litellm")
+
+    def test_shard_page_ranges(self):
+        ranges = shard_page_ranges(0, 600, 4)
+        self.assertEqual([(r.start, r.end) for r in ranges], [(1, 150), (151, 300), (301, 450), (451, 600)])
+
+        ranges = shard_page_ranges(3, 9, 3)
+        self.assertEqual([(r.start, r.end) for r in ranges], [(3, 4), (5, 6), (7, 9)])
+
+        # never more shards than pages
+        self.assertEqual(len(shard_page_ranges(1, 2, 5)), 2)
+
+        with self.assertRaises(ValueError):
+            shard_page_ranges(5, 4, 2)
+
+    def test_merge_plates(self):
+        first = shard_plate([1, 2], {"zebra": "first zebra", "apple": "first apple"})
+        second = shard_plate([3, 4], {"apple": "second apple", "moon": "second moon"})
+
+        merged = merge_plates([first, second])
+        self.assertEqual([s.section_id for s in merged.sections], ["sec_p1_s0", "sec_p2_s0", "sec_p3_s0", "sec_p4_s0"])
+        self.assertEqual([t.text for t in merged.texts], ["page 1", "page 2", "page 3", "page 4"])
+        self.assertEqual(len(merged.images), 4)
+        self.assertEqual(len(merged.groups), 4)
+
+        # first definition wins, sorted by word
+        self.assertEqual(
+            [(g.word, g.definition) for g in merged.glossary],
+            [("apple", "first apple"), ("moon", "second moon"), ("zebra", "first zebra")],
+        )
+
+        # overlapping shards don't duplicate ids and merging is deterministic
+        overlapping = shard_plate([2, 3], {})
+        self.assertEqual(merge_plates([first, overlapping, second]), merge_plates([first, overlapping, second]))
+        self.assertEqual(len(merge_plates([first, overlapping, second]).sections), 4)
+
+        with self.assertRaises(ValueError):
+            merge_plates([])
+
+    def test_shard_and_merge_calls(self):
+        # prompts may only render images from within the working directory
+        with tempfile.TemporaryDirectory(dir=".") as tmp:
+            pdf_path = os.path.join(tmp, "book.pdf")
+            with open(pdf_path, "wb") as f:
+                f.write(b"%PDF")
+
+            cli_config = DictConfig(
+                dict(
+                    label="book",
+                    pdf_path=pdf_path,
+                    output_dir=tmp,
+                    page_range=dict(start=1, end=4),
+                    output_languages=["en", "es"],
+                    llm_backend="fake",
+                    fake_llm=dict(latency=0),
+                )
+            )
+            with (
+                patch("adt_press.nodes.pdf_nodes.pages_for_pdf", extracted_pages),
+                patch("adt_press.nodes.web_nodes.build_web_assets"),
+            ):
+                configs = shard_configs(cli_config, 2)
+                for config in configs:
+                    run_shard(config)
+                plate = run_merge(load_run_config(cli_config), configs)
+
+            shards = [calls_by_node(str(config["run_output_dir"])) for config in configs]
+            merge = calls_by_node(os.path.join(tmp, "book"))
+            self.assertEqual(len(plate.sections), 4)
+
+            # each shard only pays for its own pages, up to its plate
+            for shard in shards:
+                self.assertEqual(shard["pdf_texts"], 2)
+                self.assertEqual(shard["image_captions_by_id"], 2)
+                self.assertEqual(shard["sections_by_page_id"], 2)
+
+            # translations, speech and web pages are only requested once, by the merge
+            stages = ["plate_translations", "plate_glossary_translations", "speech_files", "web_pages"]
+            for stage in stages:
+                self.assertEqual(sum(shard[stage] for shard in shards), 0, stage)
+                self.assertGreater(merge[stage], 0, stage)
+            self.assertEqual(set(merge), set(stages))
@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+
+from hamilton import ad_hoc_utils, driver
+
+from adt_press.pipeline import NodeHook
+from adt_press.utils.sync import TaskLimiter, gather_with_limit, peak_gauges, reset_gauges
+
+
+def items(count: int) -> list[int]:
+    return list(range(count))
+
+
+def doubled(items: list[int]) -> list[int]:
+    async def double(i: int) -> int:
+        await asyncio.sleep(0.01)
+        return i * 2
+
+    return asyncio.run(gather_with_limit([double(i) for i in items], 60000, 3))
+
+
+class TestSync(unittest.TestCase):
+    """Test limiting how many tasks run at once and measuring how many wait."""
+
+    def test_max_concurrency(self):
+        reset_gauges()
+        running = 0
+        most_running = 0
+
+        async def task(i: int) -> int:
+            nonlocal running, most_running
+            running += 1
+            most_running = max(most_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return i
+
+        async def run_all():
+            return await gather_with_limit([task(i) for i in range(20)], 60000, 4)
+
+        self.assertEqual(asyncio.run(run_all()), list(range(20)))
+        self.assertEqual(most_running, 4)
+
+        # tasks that start before the limit is reached never wait
+        peak_queued, peak_in_flight = peak_gauges()
+        self.assertGreaterEqual(peak_queued, 16)
+        self.assertEqual(peak_in_flight, 4)
+
+        reset_gauges()
+        self.assertEqual(peak_gauges(), (0, 0))
+
+    def test_limiters_are_separate(self):
+        reset_gauges()
+
+        async def task() -> None:
+            await asyncio.sleep(0.01)
+
+        async def run_all():
+            slow, fast = TaskLimiter(60000, 1), TaskLimiter(60000, 5)
+            await asyncio.gather(*[slow.run(task()) for _ in range(5)], *[fast.run(task()) for _ in range(5)])
+
+        asyncio.run(run_all())
+
+        # both limiters' tasks are counted, but the slow one only ever has one in flight
+        peak_queued, peak_in_flight = peak_gauges()
+        self.assertGreaterEqual(peak_queued, 4)
+        self.assertEqual(peak_in_flight, 6)
+
+    def test_node_hook_gauges(self):
+        hook = NodeHook()
+        dr = driver.Builder().with_modules(ad_hoc_utils.create_temporary_module(items, doubled)).with_adapters(hook).build()
+        self.assertEqual(dr.execute(["doubled"], inputs={"count": 10})["doubled"], [i * 2 for i in range(10)])
+
+        nodes = {n.node_name: n for n in hook.nodes}
+        self.assertGreaterEqual(nodes["doubled"].peak_queued, 7)
+        self.assertEqual(nodes["doubled"].peak_in_flight, 3)
+        self.assertEqual((nodes["items"].peak_queued, nodes["items"].peak_in_flight), (0, 0))
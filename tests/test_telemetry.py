@@ -0,0 +1,105 @@
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from adt_press.llm.gateway import create_speech, recorded_calls, reset_call_stats, telemetry_hooks
+from adt_press.models.telemetry import LLMCall
+from adt_press.pipeline import NodeHook, write_telemetry
+from adt_press.utils.telemetry import percentile, summarize_calls
+from tests.helpers import PROMPT, RunTestCase, caption_driver, fake_completion, run_captions
+
+
+def llm_call(family: str, latency: float, **kwargs) -> LLMCall:
+    return LLMCall(family=family, model="gpt-4o", kind="completion", started_at=0, latency_seconds=latency, **kwargs)
+
+
+class TestTelemetry(RunTestCase):
+    """Test recording and summarizing each LLM call of a run."""
+
+    def test_percentile(self):
+        values = [float(i) for i in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3.0], 99), 3)
+        self.assertEqual(percentile([], 50), 0)
+
+    def test_summarize_calls(self):
+        calls = [llm_call("image_caption", i, prompt_tokens=10, completion_tokens=2, attempts=1, cost=0.5) for i in range(1, 11)]
+        calls.append(llm_call("image_caption", 0.001, cached=True))
+        calls.append(llm_call("image_caption", 20, attempts=3, validation_errors=["a", "b"], cost=1))
+        calls.append(llm_call("speech_generation", 2, attempts=1, error="RateLimitError: slow down"))
+
+        telemetry = summarize_calls(calls)
+        self.assertEqual(telemetry.calls, 13)
+        caption, speech = telemetry.families
+
+        self.assertEqual(caption.family, "image_caption")
+        self.assertEqual(caption.calls, 12)
+        self.assertEqual(caption.cached, 1)
+        self.assertEqual(caption.p50_seconds, 6)
+        self.assertEqual(caption.p99_seconds, 20)
+        self.assertEqual(caption.prompt_tokens, 100)
+        self.assertEqual(caption.retries, 2)
+        self.assertEqual(caption.validation_errors, 2)
+        self.assertEqual(caption.cost, 6)
+
+        # speech has no known cost, the run's cost is that of the other families
+        self.assertEqual(speech.errors, 1)
+        self.assertIsNone(speech.cost)
+        self.assertEqual(telemetry.cost, 6)
+        self.assertEqual(telemetry.unpriced_families, ["speech_generation"])
+        self.assertIsNone(summarize_calls([llm_call("speech_generation", 2, attempts=1)]).cost)
+
+    def test_speech_cost(self):
+        async def fake_speech(model, **kwargs):
+            return b"audio"
+
+        with (
+            patch("adt_press.llm.gateway.litellm_speech", fake_speech),
+            patch("adt_press.llm.gateway.speech_cost", return_value=0.125) as cost,
+        ):
+            reset_call_stats()
+            asyncio.run(create_speech(PROMPT.model_copy(update={"model": "tts-1"}), voice="alloy", input="The fox ran."))
+
+        cost.assert_called_once_with("tts-1", "The fox ran.")
+        self.assertEqual(recorded_calls()[0].cost, 0.125)
+
+    def test_telemetry_hooks(self):
+        call = llm_call("image_caption", 0)
+        hooks = telemetry_hooks(call)
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=20, prompt_tokens_details=SimpleNamespace(cached_tokens=64))
+
+        with patch("adt_press.llm.gateway.response_cost", return_value=0.25):
+            hooks.emit_completion_response(SimpleNamespace(usage=usage))
+            hooks.emit_parse_error(ValueError("caption missing"))
+            hooks.emit_completion_response(SimpleNamespace(usage=usage))
+
+        self.assertEqual(call.attempts, 2)
+        self.assertEqual(call.prompt_tokens, 200)
+        self.assertEqual(call.completion_tokens, 40)
+        self.assertEqual(call.cached_tokens, 128)
+        self.assertEqual(call.validation_errors, ["ValueError: caption missing"])
+        self.assertEqual(call.cost, 0.5)
+
+    def test_write_telemetry(self):
+        async def rate_limited(model, max_retries, response_model, messages, **kwargs):
+            if messages[0]["content"] == "word 2":
+                raise RuntimeError("rate limited")
+            return await fake_completion(model, max_retries, response_model, messages, **kwargs)
+
+        hook = NodeHook()
+        run_captions(caption_driver(hook), 3, rate_limited)
+
+        write_telemetry(hook, self.config)
+
+        with open(os.path.join(self.temp_dir, "telemetry.jsonl")) as f:
+            calls = [LLMCall.model_validate(json.loads(line)) for line in f]
+
+        self.assertEqual(len(calls), 3)
+        self.assertEqual({c.node_name for c in calls}, {"captions"})
+        self.assertEqual(sum(c.prompt_tokens for c in calls), 20)
+        self.assertEqual([c.error for c in calls if c.error], ["RuntimeError: rate limited"])
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, "telemetry.html")))